@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+
+class Identity(NamedTuple):
+    """Korumalı uçların ihtiyaç duyduğu kadar kullanıcı bilgisi"""
+    user_id: int
+    username: str
+    is_active: bool
+
+
+class AuthCache:
+    """Doğrulanmış token içeriklerini ve kullanıcı kimliklerini bellekte tutar.
+
+    Token içeriği (TokenData) token'ın süresi dolana kadar, en fazla
+    `max_tokens` token için saklanır; aynı token ile gelen isteklerde imza
+    yeniden doğrulanmaz. Kimlikler kullanıcı kimliğiyle `identity_ttl` saniye,
+    en fazla `max_identities` kullanıcı için saklanır; iki tablo da en az
+    kullanılan kayıttan başlayarak boşaltılır. Kullanıcı pasifleştirildiğinde
+    kimliği ve token'ları birlikte hemen silinir, diğer API süreçlerinde ise
+    en geç `identity_ttl` sonunda yenilenir.
+    """
+
+    def __init__(self, max_tokens=10000, identity_ttl=60, max_identities=10000):
+        self.max_tokens = max_tokens
+        self.max_identities = max_identities
+        self.identity_ttl = identity_ttl
+        self._lock = threading.Lock()
+        self._tokens = OrderedDict()
+        self._identities = OrderedDict()
+        # Kullanıcı kimliği → önbellekteki token'ları; invalidate_user tüm tabloyu taramaz
+        self._user_tokens = {}
+        self.token_hits = 0
+        self.token_misses = 0
+        self.identity_hits = 0
+        self.identity_misses = 0
+        self.evictions = 0
+
+    def _bind_token(self, token, token_data):
+        if token_data.user_id is not None:
+            self._user_tokens.setdefault(token_data.user_id, set()).add(token)
+
+    def _drop_token(self, token):
+        token_data = self._tokens.pop(token)
+        tokens = self._user_tokens.get(token_data.user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._user_tokens[token_data.user_id]
+
+    def token(self, token):
+        """Token'ın önbellekteki içeriği; yoksa ya da süresi dolduysa None"""
+        with self._lock:
+            token_data = self._tokens.get(token)
+            if token_data is not None and token_data.expires_at <= time.time():
+                self._drop_token(token)
+                token_data = None
+            if token_data is None:
+                self.token_misses += 1
+                return None
+            self._tokens.move_to_end(token)
+            # user_id taşımayan eski token'lar kimlik çözüldükten sonra kullanıcıya bağlanır
+            self._bind_token(token, token_data)
+            self.token_hits += 1
+            return token_data
+
+    def add_token(self, token, token_data):
+        with self._lock:
+            if token in self._tokens:
+                self._drop_token(token)
+            self._tokens[token] = token_data
+            self._bind_token(token, token_data)
+            while len(self._tokens) > self.max_tokens:
+                self._drop_token(next(iter(self._tokens)))
+                self.evictions += 1
+
+    def identity(self, user_id):
+        """Kullanıcının önbellekteki kimliği; yoksa ya da süresi dolduysa None"""
+        with self._lock:
+            entry = self._identities.get(user_id)
+            if entry is None or entry[0] <= time.monotonic():
+                self._identities.pop(user_id, None)
+                self.identity_misses += 1
+                return None
+            self._identities.move_to_end(user_id)
+            self.identity_hits += 1
+            return entry[1]
+
+    def add_identity(self, identity):
+        with self._lock:
+            self._identities[identity.user_id] = (time.monotonic() + self.identity_ttl, identity)
+            self._identities.move_to_end(identity.user_id)
+            while len(self._identities) > self.max_identities:
+                self._identities.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        """Kullanıcının kimliğini ve ona ait tüm token'ları sil (pasifleştirme, şifre değişikliği)"""
+        with self._lock:
+            self._identities.pop(user_id, None)
+            for token in list(self._user_tokens.get(user_id, ())):
+                self._drop_token(token)
+
+    def stats(self):
+        return {
+            "tokens": len(self._tokens),
+            "max_tokens": self.max_tokens,
+            "identities": len(self._identities),
+            "max_identities": self.max_identities,
+            "token_hits": self.token_hits,
+            "token_misses": self.token_misses,
+            "identity_hits": self.identity_hits,
+            "identity_misses": self.identity_misses,
+            "evictions": self.evictions,
+        }
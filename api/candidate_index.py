@@ -0,0 +1,240 @@
+import heapq
+import logging
+import sys
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import func, or_
+
+from database.database import Genre, Movie
+from database.genres import genre_ids_of
+
+# Türünden bağımsız tüm kataloğun sıralı dizisinin anahtarı (geçmişi olmayan kullanıcılar)
+ALL_MOVIES = None
+
+
+class CandidateIndex:
+    """Film kataloğunu tür bazında, puana göre sıralı dizilerde bellekte tutar.
+
+    Her tür için film kimlikleri (int32) ve puanlar (float32) azalan puan,
+    eşitlikte artan movie_id sırasında saklanır; birden fazla türü olan film
+    her türün listesinde yer alır, tüm katalog ayrıca `ALL_MOVIES` altında
+    tutulur. Bir tür kümesi için en iyi N film, bu listelerin k-yollu
+    birleştirilmesiyle ve izlenen filmler atlanarak bulunur.
+    """
+
+    def __init__(self, refresh_interval=60):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._genres = {}
+        self._movie_genres = {}
+        self._genre_ids = {}
+        self._rows = {}
+        self._max_movie_id = 0
+        self._watermark = None
+        self._last_refresh = 0.0
+        self.loaded = False
+
+    def load(self, db):
+        """Tüm kataloğu okuyarak indeksi sıfırdan kur"""
+        with self._lock:
+            self._genres = {}
+            self._movie_genres = {}
+            self._genre_ids = {}
+            self._rows = {}
+            self._max_movie_id = 0
+            self._watermark = None
+            movies = db.query(Movie).all()
+            self._apply(movies, (), self._genre_names(db))
+            self._advance_watermark(movies)
+            self._last_refresh = time.monotonic()
+            self.loaded = True
+        logging.info(f"Aday indeksi yüklendi: {len(self._rows)} film, {self.genre_count} tür")
+
+    def refresh(self, db, force=False):
+        """Son yenilemeden bu yana eklenen, değişen ve silinen filmleri indekse yansıt
+
+        Yeni filmler `movie_id`, değişenler `updated_at` su seviyesiyle okunur.
+        Su seviyesindeki filmler her yenilemede yeniden okunur (aynı anda
+        yazılanlar kaçmasın diye); içeriği değişmeyenler atlanır. Silinen
+        filmler yalnızca film sayısı indeksle tutmadığında kimlik taramasıyla bulunur.
+        """
+        if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return 0
+        with self._lock:
+            condition = Movie.movie_id > self._max_movie_id
+            if self._watermark is not None:
+                condition = or_(condition, Movie.updated_at >= self._watermark)
+            genre_names = self._genre_names(db)
+            movies = db.query(Movie).filter(condition).all()
+            changed = [
+                movie for movie in movies
+                if self._row(movie) != self._rows.get(movie.movie_id)
+                or self._names(movie, genre_names) != self._movie_genres.get(movie.movie_id)
+            ]
+
+            removed = []
+            movie_count = db.query(func.count(Movie.movie_id)).scalar()
+            known = len(self._rows) + sum(movie.movie_id not in self._rows for movie in changed)
+            if movie_count != known:
+                existing = {movie_id for movie_id, in db.query(Movie.movie_id)}
+                removed = [movie_id for movie_id in self._rows if movie_id not in existing]
+
+            if changed or removed:
+                self._apply(changed, removed, genre_names)
+            else:
+                self._genre_ids = {name: genre_id for genre_id, name in genre_names.items()}
+            self._advance_watermark(movies)
+            self._last_refresh = time.monotonic()
+        if changed or removed:
+            logging.info(f"Aday indeksi yenilendi: {len(changed)} film eklendi/güncellendi, {len(removed)} film silindi")
+        return len(changed) + len(removed)
+
+    @staticmethod
+    def _genre_names(db):
+        """Tür kimliği → ad eşlemesi; filmlerin türleri bit maskesinden çözülür"""
+        return dict(db.query(Genre.genre_id, Genre.name).all())
+
+    @staticmethod
+    def _row(movie):
+        return {
+            "movie_id": movie.movie_id,
+            "title": movie.title,
+            "genre": movie.genre,
+            "release_year": movie.release_year,
+            "rating": movie.rating,
+            "description": movie.description,
+        }
+
+    @staticmethod
+    def _names(movie, genre_names):
+        return tuple(
+            genre_names[genre_id] for genre_id in genre_ids_of(movie.genre_mask) if genre_id in genre_names
+        )
+
+    def _advance_watermark(self, movies):
+        stamps = [movie.updated_at for movie in movies if movie.updated_at is not None]
+        if stamps and (self._watermark is None or max(stamps) > self._watermark):
+            self._watermark = max(stamps)
+
+    def _apply(self, movies, removed, genre_names):
+        """Filmleri ekle ya da güncelle, silinenleri çıkar; yalnızca etkilenen tür dizileri yeniden yazılır"""
+        rows = dict(self._rows)
+        movie_genres = dict(self._movie_genres)
+        genres = dict(self._genres)
+
+        # Güncellenen ve silinen filmler önce eski türlerinin dizilerinden çıkarılır
+        stale = {}
+        for movie_id in list(removed) + [movie.movie_id for movie in movies if movie.movie_id in rows]:
+            rows.pop(movie_id, None)
+            for name in movie_genres.pop(movie_id, ()) + (ALL_MOVIES,):
+                stale.setdefault(name, []).append(movie_id)
+        for genre, movie_ids in stale.items():
+            ids, ratings = genres[genre]
+            keep = ~np.isin(ids, movie_ids)
+            if keep.any():
+                genres[genre] = (ids[keep], ratings[keep])
+            else:
+                del genres[genre]
+
+        grouped = {}
+        for movie in movies:
+            rows[movie.movie_id] = self._row(movie)
+            names = self._names(movie, genre_names)
+            movie_genres[movie.movie_id] = names
+            rating = movie.rating if movie.rating is not None else -np.inf
+            for name in names + (ALL_MOVIES,):
+                grouped.setdefault(name, []).append((movie.movie_id, rating))
+            self._max_movie_id = max(self._max_movie_id, movie.movie_id)
+
+        for genre, items in grouped.items():
+            new_ids = np.array([movie_id for movie_id, _ in items], dtype=np.int32)
+            new_ratings = np.array([rating for _, rating in items], dtype=np.float32)
+            order = np.lexsort((new_ids, -new_ratings))
+            new_ids, new_ratings = new_ids[order], new_ratings[order]
+            if genre in genres:
+                ids, ratings = genres[genre]
+                # Diziler (puan azalan, movie_id artan) sırasında; yeni filmler önce eşit
+                # puanlı bloklarını, sonra blok içinde kimliğe göre konumlarını bulur
+                starts = np.searchsorted(-ratings, -new_ratings, side="left")
+                ends = np.searchsorted(-ratings, -new_ratings, side="right")
+                positions = starts + np.array([
+                    np.searchsorted(ids[start:end], movie_id)
+                    for start, end, movie_id in zip(starts, ends, new_ids)
+                ], dtype=np.int64)
+                ids = np.insert(ids, positions, new_ids)
+                ratings = np.insert(ratings, positions, new_ratings)
+            else:
+                ids, ratings = new_ids, new_ratings
+            genres[genre] = (ids, ratings)
+
+        # Okuyucular kilitsiz çalıştığı için yapılar tek seferde değiştirilir
+        self._rows = rows
+        self._movie_genres = movie_genres
+        self._genre_ids = {name: genre_id for genre_id, name in genre_names.items()}
+        self._genres = genres
+
+    @property
+    def catalog_version(self):
+        """Veritabanı durumundan türetilen sürüm; aynı katalogu okuyan süreçlerde aynıdır"""
+        watermark = self._watermark.isoformat() if self._watermark is not None else ""
+        return f"{self._max_movie_id}:{len(self._rows)}:{watermark}"
+
+    def movie(self, movie_id):
+        return self._rows.get(movie_id)
+
+    def genres_of(self, movie_id):
+        return self._movie_genres.get(movie_id, ())
+
+    def genre_id(self, name):
+        """Tür adının kimliği; favori tür eşitlikleri kimliğe göre bozulur"""
+        return self._genre_ids.get(name)
+
+    @property
+    def genre_count(self):
+        return len(self._genres) - (ALL_MOVIES in self._genres)
+
+    def top_n(self, genres=None, exclude=(), n=10):
+        """Verilen türlerdeki (None ise tüm katalog) en yüksek puanlı N filmi döndür"""
+        index = self._genres
+        if genres is None:
+            genres = [ALL_MOVIES]
+        exclude = set(exclude)
+
+        def walk(genre, chunk=64):
+            ids, ratings = index[genre]
+            # Diziler parça parça okunur; birleştirme erken bittiğinde kalanına dokunulmaz
+            for start in range(0, len(ids), chunk):
+                end = start + chunk
+                for movie_id, rating in zip(ids[start:end].tolist(), ratings[start:end].tolist()):
+                    yield -rating, movie_id
+
+        streams = [walk(genre) for genre in genres if genre in index]
+        result = []
+        seen = set()
+        for _, movie_id in heapq.merge(*streams):
+            if movie_id in exclude or movie_id in seen:
+                continue
+            seen.add(movie_id)
+            result.append(self._rows[movie_id])
+            if len(result) == n:
+                break
+        return result
+
+    def memory_usage(self):
+        """İndeks dizilerinin ve yanıt satırlarının yaklaşık bellek kullanımı (byte)"""
+        array_bytes = sum(ids.nbytes + ratings.nbytes for ids, ratings in self._genres.values())
+        row_bytes = sum(
+            sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+            for row in self._rows.values()
+        )
+        return {"array_bytes": array_bytes, "row_bytes": row_bytes}
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "movies": len(self._rows),
+            "genres": self.genre_count,
+            "memory": self.memory_usage(),
+        }
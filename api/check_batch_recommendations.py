@@ -0,0 +1,61 @@
+import argparse
+import logging
+import sys
+
+import numpy as np
+from sqlalchemy import select
+
+from api import main as api
+from database.database import SessionLocal, User
+from ml_model.batch_recommend import score_users
+
+
+def endpoint_movie_ids(movies):
+    return [movie["movie_id"] if isinstance(movie, dict) else movie.movie_id for movie in movies]
+
+
+def check_batch_recommendations(db, user_ids, top_n=10):
+    """Toplu önerileri tek kullanıcılık yollarla karşılaştır; uyuşmayan (yol, kullanıcı) çiftlerini döndür"""
+    batch = score_users(db.connection(), user_ids, top_n=top_n)
+    paths = [('veritabanı', api.recommend_from_db)]
+    if api.candidate_index.loaded:
+        paths.append(('aday indeksi', api.recommend_from_index))
+
+    failures = []
+    for name, recommend in paths:
+        mismatched = [
+            user_id for user_id in user_ids
+            if endpoint_movie_ids(recommend(db, user_id, top_n)) != batch[user_id]
+        ]
+        print(f"{name:>14}: {len(user_ids) - len(mismatched)}/{len(user_ids)} kullanıcı aynı")
+        failures.extend((name, user_id) for user_id in mismatched)
+    return failures
+
+
+def main():
+    """Toplu öneri uç noktadan farklı sonuç verirse sıfırdan farklı kodla çık"""
+    parser = argparse.ArgumentParser(description="Toplu önerilerin tek kullanıcılık uçla aynı olduğunu doğrula")
+    parser.add_argument('--sample', type=int, default=300, help="Karşılaştırılacak kullanıcı sayısı")
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-index', action='store_true', help="Aday indeksi yolunu karşılaştırma")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user_ids = [user_id for user_id, in db.execute(select(User.user_id))]
+        rng = np.random.default_rng(args.seed)
+        sample = rng.choice(user_ids, size=min(args.sample, len(user_ids)), replace=False).tolist()
+        if not args.no_index:
+            api.candidate_index.load(db)
+        failures = check_batch_recommendations(db, sample, top_n=args.top_n)
+    finally:
+        db.close()
+    if failures:
+        logging.error(f"Uç noktadan farklı toplu öneriler (ilk 10): {failures[:10]}")
+        sys.exit(1)
+    print("Toplu öneriler uç noktayla aynı")
+
+
+if __name__ == "__main__":
+    main()
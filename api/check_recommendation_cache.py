@@ -0,0 +1,193 @@
+import argparse
+import fnmatch
+import logging
+import sys
+import time
+
+from api.recommendation_cache import MemoryBackend, RecommendationCache, SharedBackend
+
+MOVIES = [{"movie_id": 1}, {"movie_id": 2}]
+VERSION = "cluster:1:10"
+
+
+class LocalClient:
+    """SharedBackend'in kullandığı Redis komutlarını süreç içinde sağlayan istemci"""
+
+    def __init__(self):
+        self._values = {}
+
+    def _live(self, key):
+        value, expires_at = self._values.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    def get(self, key):
+        return self._live(key)
+
+    def mget(self, keys):
+        return [self._live(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self._values[key] = (value, time.monotonic() + ex if ex is not None else None)
+
+    def delete(self, *keys):
+        for key in keys:
+            self._values.pop(key, None)
+
+    def incr(self, key):
+        value = int(self._live(key) or 0) + 1
+        self._values[key] = (str(value).encode(), self._values.get(key, (None, None))[1])
+        return value
+
+    def expire(self, key, seconds):
+        if key in self._values:
+            self._values[key] = (self._values[key][0], time.monotonic() + seconds)
+
+    def scan_iter(self, match):
+        return [key for key in list(self._values) if fnmatch.fnmatchcase(key, match)]
+
+
+def expect(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+
+def check_ttl(make_backend):
+    cache = RecommendationCache(make_backend(ttl=0.2))
+    cache.set(1, VERSION, MOVIES, cache.generation(1))
+    expect(cache.get(1, VERSION) == MOVIES, "yeni kayıt okunamadı")
+    time.sleep(0.3)
+    expect(cache.get(1, VERSION) is None, "süresi dolan kayıt döndü")
+
+
+def check_version(make_backend):
+    cache = RecommendationCache(make_backend(ttl=60))
+    cache.set(1, VERSION, MOVIES, cache.generation(1))
+    expect(cache.get(1, "cluster:2:10") is None, "başka sürümle hesaplanmış kayıt döndü")
+    expect(cache.get(1, VERSION) == MOVIES, "aynı sürümdeki kayıt okunamadı")
+
+
+def check_invalidate(make_backend):
+    cache = RecommendationCache(make_backend(ttl=60))
+    for user_id in (1, 2):
+        cache.set(user_id, VERSION, MOVIES, cache.generation(user_id))
+    cache.invalidate(1)
+    expect(cache.get(1, VERSION) is None, "geçersizleştirilen kayıt döndü")
+    expect(cache.get(2, VERSION) == MOVIES, "başka kullanıcının kaydı silindi")
+    cache.set(1, VERSION, MOVIES, cache.generation(1))
+    expect(cache.get(1, VERSION) == MOVIES, "geçersizleştirmeden sonra yeni kayıt yazılamadı")
+    cache.clear()
+    expect(cache.get(2, VERSION) is None, "temizlemeden sonra kayıt kaldı")
+
+
+def check_stale_write(make_backend):
+    cache = RecommendationCache(make_backend(ttl=60))
+    # Hesaplama nesli okuduktan sonra kullanıcı puan verir
+    generation = cache.generation(1)
+    cache.invalidate(1)
+    cache.set(1, VERSION, MOVIES, generation)
+    expect(cache.get(1, VERSION) is None, "geçersizleştirmeden önce hesaplanan sonuç yazıldı")
+    expect(cache.stale_writes == 1, f"eski yazım sayılmadı: {cache.stale_writes}")
+
+
+def check_stale_write_after_check(make_backend):
+    """Yazma öncesi kontrol ile yazma arasına giren geçersizleştirme (yalnızca paylaşılan depo)"""
+    backend = make_backend(ttl=60)
+    generation = backend.generation("1")
+    original_set = backend.client.set
+
+    def racing_set(key, value, ex=None):
+        backend.delete("1")
+        original_set(key, value, ex=ex)
+
+    backend.client.set = racing_set
+    backend.set("1", {"version": VERSION, "movies": MOVIES}, generation)
+    backend.client.set = original_set
+    expect(backend.get("1") is None, "kontrolden sonra yazılan eski kayıt okundu")
+
+
+def check_lru():
+    cache = RecommendationCache(MemoryBackend(ttl=60, max_entries=2))
+    for user_id in (1, 2):
+        cache.set(user_id, VERSION, MOVIES, cache.generation(user_id))
+    cache.get(1, VERSION)
+    cache.set(3, VERSION, MOVIES, cache.generation(3))
+    expect(cache.get(2, VERSION) is None, "en az kullanılan kayıt çıkarılmadı")
+    expect(cache.get(1, VERSION) == MOVIES and cache.get(3, VERSION) == MOVIES, "yeni kayıtlar çıkarıldı")
+    expect(cache.backend.evictions == 1, f"çıkarma sayısı hatalı: {cache.backend.evictions}")
+
+
+def check_generation_eviction():
+    # Nesil tablosundan çıkarılan anahtara da eski nesille yazılamaz
+    cache = RecommendationCache(MemoryBackend(ttl=60, max_entries=1))
+    generation = cache.generation(1)
+    cache.invalidate(1)
+    cache.invalidate(2)
+    cache.set(1, VERSION, MOVIES, generation)
+    expect(cache.get(1, VERSION) is None, "çıkarılan neslin eski yazımı kabul edildi")
+    cache.set(1, VERSION, MOVIES, cache.generation(1))
+    expect(cache.get(1, VERSION) == MOVIES, "güncel nesille yazılamadı")
+
+
+def check_clear_in_flight():
+    cache = RecommendationCache(MemoryBackend(ttl=60))
+    generation = cache.generation(1)
+    cache.clear()
+    cache.set(1, VERSION, MOVIES, generation)
+    expect(cache.get(1, VERSION) is None, "temizlemeden önce başlayan hesaplama yazıldı")
+
+
+def checks(redis_url=None):
+    if redis_url:
+        import redis
+        client = redis.Redis.from_url(redis_url)
+    else:
+        client = None
+
+    def memory(ttl):
+        return MemoryBackend(ttl=ttl)
+
+    def shared(ttl):
+        return SharedBackend(client or LocalClient(), ttl=ttl,
+                             prefix="check-recommendations:", generation_prefix="check-recommendation-generations:")
+
+    return [
+        ('bellek: TTL', lambda: check_ttl(memory)),
+        ('bellek: sürüm', lambda: check_version(memory)),
+        ('bellek: geçersizleştirme', lambda: check_invalidate(memory)),
+        ('bellek: eski yazım', lambda: check_stale_write(memory)),
+        ('bellek: LRU', check_lru),
+        ('bellek: nesil çıkarma', check_generation_eviction),
+        ('bellek: temizleme yarışı', check_clear_in_flight),
+        ('paylaşılan: TTL', lambda: check_ttl(shared)),
+        ('paylaşılan: sürüm', lambda: check_version(shared)),
+        ('paylaşılan: geçersizleştirme', lambda: check_invalidate(shared)),
+        ('paylaşılan: eski yazım', lambda: check_stale_write(shared)),
+        ('paylaşılan: kontrol sonrası yazım', lambda: check_stale_write_after_check(shared)),
+    ]
+
+
+def main():
+    """Önbellek davranışlarından biri bozulursa sıfırdan farklı kodla çık"""
+    parser = argparse.ArgumentParser(description="Öneri önbelleğinin TTL, LRU ve geçersizleştirme davranışını doğrula")
+    parser.add_argument('--redis-url', help="Verilirse paylaşılan depo yerel istemci yerine bu sunucuda denenir")
+    args = parser.parse_args()
+
+    failures = []
+    for name, check in checks(args.redis_url):
+        try:
+            check()
+            print(f"{name:>34}: tamam")
+        except AssertionError as e:
+            print(f"{name:>34}: HATA ({e})")
+            failures.append(name)
+    if failures:
+        logging.error(f"Başarısız önbellek kontrolleri: {failures}")
+        sys.exit(1)
+    print("Tüm önbellek kontrolleri geçti")
+
+
+if __name__ == "__main__":
+    main()
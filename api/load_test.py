@@ -0,0 +1,114 @@
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+
+import numpy as np
+
+
+def request(base_url, method, path, params=None, body=None):
+    """İsteği gönder; (durum kodu, gövde, süre sn)"""
+    url = base_url + path + ("?" + urllib.parse.urlencode(params) if params else "")
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req) as response:
+            payload = response.read()
+            code = response.status
+    except urllib.error.HTTPError as e:
+        payload = e.read()
+        code = e.code
+    return code, payload, time.perf_counter() - started
+
+
+def login_token(base_url, username, password):
+    """Test kullanıcısını (yoksa) oluşturup token al"""
+    request(base_url, "POST", "/api/users/register", body={
+        "username": username, "email": f"{username}@loadtest.local", "password": password
+    })
+    code, payload, _ = request(base_url, "POST", "/api/users/login", body={
+        "username": username, "password": password
+    })
+    if code != 200:
+        raise RuntimeError(f"Giriş başarısız: {code} {payload[:200]}")
+    return json.loads(payload)["access_token"]
+
+
+def worker_threads(count, worker, duration):
+    """`worker`ı `duration` saniye boyunca döngüde çağıracak `count` iş parçacığı"""
+    deadline = time.monotonic() + duration
+
+    def loop():
+        while time.monotonic() < deadline:
+            worker()
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(count)]
+    return threads
+
+
+def run_phase(base_url, token, credentials, duration, readers, login_workers):
+    """Öneri isteklerini (ve varsa eşzamanlı girişleri) çalıştırıp ölçümleri döndür"""
+    latencies, statuses, login_statuses = [], Counter(), Counter()
+    lock = threading.Lock()
+
+    def recommend():
+        code, _, elapsed = request(base_url, "GET", "/api/movies/recommendations", {"token": token})
+        with lock:
+            latencies.append(elapsed)
+            statuses[code] += 1
+
+    def login():
+        code, _, _ = request(base_url, "POST", "/api/users/login", body=credentials)
+        with lock:
+            login_statuses[code] += 1
+
+    threads = worker_threads(readers, recommend, duration) + worker_threads(login_workers, login, duration)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+        "statuses": dict(statuses),
+        "logins": dict(login_statuses),
+    }
+
+
+def main():
+    """Giriş fırtınası sırasında öneri gecikmesinin (p99) değişmediğini ölç"""
+    parser = argparse.ArgumentParser(description="Giriş fırtınası altında öneri gecikmesi yük testi")
+    parser.add_argument('--base-url', default="http://localhost:8001")
+    parser.add_argument('--duration', type=float, default=20, help="Her aşamanın süresi (sn)")
+    parser.add_argument('--readers', type=int, default=8, help="Eşzamanlı öneri istemcisi")
+    parser.add_argument('--logins', type=int, default=64, help="Fırtına aşamasında eşzamanlı giriş istemcisi")
+    parser.add_argument('--username', default="loadtest")
+    parser.add_argument('--password', default="loadtest-password")
+    args = parser.parse_args()
+
+    credentials = {"username": args.username, "password": args.password}
+    token = login_token(args.base_url, args.username, args.password)
+
+    results = {
+        "baseline": run_phase(args.base_url, token, credentials, args.duration, args.readers, 0),
+        "login_storm": run_phase(args.base_url, token, credentials, args.duration, args.readers, args.logins),
+    }
+    for phase, result in results.items():
+        print(f"{phase:>12}: {result['requests']} öneri, p50 {result['p50_ms']:.1f} ms, "
+              f"p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+              f"durumlar {result['statuses']}, girişler {result['logins']}")
+    ratio = results["login_storm"]["p99_ms"] / results["baseline"]["p99_ms"]
+    print(f"p99 oranı (fırtına / temel): {ratio:.2f}")
+
+
+if __name__ == "__main__":
+    main()
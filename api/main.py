@@ -1,18 +1,36 @@
-from fastapi import FastAPI, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Match
+from sqlalchemy import case, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
 from datetime import datetime, timedelta
 from typing import List, Optional
 import joblib
 import pandas as pd
 import numpy as np
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import jwt
 from jose import jwt
-from passlib.context import CryptContext
-from database.database import SessionLocal, engine, Base
-from database.database import User, Movie, WatchHistory, UserPreferences
+from database.database import SessionLocal, AsyncSessionLocal, engine, async_engine, Base, get_db, get_async_db, pool_status
+from database.database import User, Movie, WatchHistory, UserPreferences, UserFeatureStats, Genre, movie_genres
+from database.genres import top_genres
+from api.candidate_index import CandidateIndex
+from api import metrics
+from api.auth_cache import AuthCache, Identity
+from api.metrics import stage
+from api.password_hashing import PasswordHasher, PasswordHasherBusy
+from api.recommendation_cache import MemoryBackend, RecommendationCache, SharedBackend
+from api.pagination import HISTORY_ORDER, NEXT_CURSOR_HEADER, after_history, after_movie, history_cursor, movie_cursor
+from ml_model.cluster_recommender import ClusterRecommender
+from ml_model.batch_recommend import score_users
+from ml_model.item_similarity import ItemNeighborIndex
+from ml_model.ann_index import load_ann_index
+import json
 import logging
 import os
+import time
 
 # Logging ayarları
 logging.basicConfig(
@@ -27,12 +45,146 @@ app = FastAPI(title="Netflix Benzeri Öneri Sistemi API")
 # Veritabanı modellerini oluştur
 Base.metadata.create_all(bind=engine)
 
+# Bu süreyi aşan istekler aşama ve sorgu dökümüyle loglanır
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+
+# Her sorgu süre histogramına ve etkin isteğin sorgu sayacına yazılır
+metrics.instrument_engine(engine, "sync")
+metrics.instrument_engine(async_engine.sync_engine, "async")
+
+def route_path(request: Request):
+    """İsteğin eşleştiği uç şablonu (/api/users/{id} gibi); etiket sayısı sınırlı kalır"""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+# Gövdesi call_next döndükten sonra üretilen akış uçları; metrikleri gövde bittiğinde yazılır
+STREAMING_PATHS = {"/api/history/export"}
+
+def record_request(request: Request, path: str, status_code: int, started: float, stats):
+    """Tamamlanan isteği sayaç ve histogramlara yaz, yavaşsa logla; geçen süreyi döndür"""
+    elapsed = time.perf_counter() - started
+    metrics.http_requests.inc(method=request.method, path=path, status=status_code)
+    metrics.http_request_seconds.observe(elapsed, method=request.method, path=path)
+    metrics.db_queries_per_request.observe(stats.queries, path=path)
+    metrics.db_seconds_per_request.observe(stats.query_seconds, path=path)
+    if elapsed >= SLOW_REQUEST_SECONDS:
+        logging.warning(
+            f"Yavaş istek {request.method} {path}: {elapsed * 1000:.0f} ms, "
+            f"{stats.queries} sorgu ({stats.query_seconds * 1000:.0f} ms), aşamalar: "
+            + ", ".join(f"{name}={seconds * 1000:.0f} ms" for name, seconds in stats.stages.items())
+        )
+    return elapsed
+
+async def record_after_body(body, request: Request, path: str, status_code: int, started: float, stats):
+    """Akış gövdesini aynen ilet; gövde bittiğinde (ya da istemci koptuğunda) isteği kaydet"""
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        record_request(request, path, status_code, started, stats)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    stats = metrics.RequestStats()
+    token = metrics.current_request.set(stats)
+    started = time.perf_counter()
+    path = route_path(request)
+    try:
+        response = await call_next(request)
+    except Exception:
+        record_request(request, path, 500, started, stats)
+        raise
+    finally:
+        metrics.current_request.reset(token)
+    if path in STREAMING_PATHS:
+        # Uç gövdeyi üreten görevde çalışır ve aynı RequestStats nesnesine yazar; sorgular
+        # gövde akarken yapıldığından kayıt sona ertelenir. Server-Timing başlığı gövdeden
+        # önce gönderildiği için bu uçlarda eklenmez
+        response.body_iterator = record_after_body(
+            response.body_iterator, request, path, response.status_code, started, stats
+        )
+        return response
+    elapsed = record_request(request, path, response.status_code, started, stats)
+    response.headers["Server-Timing"] = metrics.server_timing(stats, elapsed)
+    return response
+
 # Güvenlik ayarları
 SECRET_KEY = "your-secret-key-here"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Şifre hash'leme ayarları; BCRYPT_ROUNDS değişirse eski hash'ler girişte yeniden hesaplanır
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+
+password_hasher = PasswordHasher(
+    rounds=BCRYPT_ROUNDS,
+    workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_MAX_PENDING,
+    executor=PASSWORD_HASH_EXECUTOR
+)
+
+# Doğrulanmış token ve kullanıcı kimliği önbelleği
+AUTH_CACHE_MAX_TOKENS = int(os.getenv("AUTH_CACHE_MAX_TOKENS", "10000"))
+AUTH_CACHE_MAX_IDENTITIES = int(os.getenv("AUTH_CACHE_MAX_IDENTITIES", "10000"))
+AUTH_IDENTITY_TTL_SECONDS = int(os.getenv("AUTH_IDENTITY_TTL_SECONDS", "60"))
+
+auth_cache = AuthCache(
+    max_tokens=AUTH_CACHE_MAX_TOKENS,
+    max_identities=AUTH_CACHE_MAX_IDENTITIES,
+    identity_ttl=AUTH_IDENTITY_TTL_SECONDS
+)
+
+# Öneri aday indeksi ayarları
+USE_CANDIDATE_INDEX = os.getenv("USE_CANDIDATE_INDEX", "1") == "1"
+CANDIDATE_INDEX_REFRESH_SECONDS = int(os.getenv("CANDIDATE_INDEX_REFRESH_SECONDS", "60"))
+
+candidate_index = CandidateIndex(refresh_interval=CANDIDATE_INDEX_REFRESH_SECONDS)
+
+# Öneri sonucu önbelleği; RECOMMENDATION_CACHE_URL verilirse süreçler arası paylaşılan depo kullanılır
+USE_RECOMMENDATION_CACHE = os.getenv("USE_RECOMMENDATION_CACHE", "1") == "1"
+RECOMMENDATION_CACHE_URL = os.getenv("RECOMMENDATION_CACHE_URL")
+RECOMMENDATION_CACHE_TTL_SECONDS = int(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", "300"))
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "10000"))
+
+recommendation_cache = RecommendationCache(
+    SharedBackend.from_url(RECOMMENDATION_CACHE_URL, ttl=RECOMMENDATION_CACHE_TTL_SECONDS)
+    if RECOMMENDATION_CACHE_URL else
+    MemoryBackend(ttl=RECOMMENDATION_CACHE_TTL_SECONDS, max_entries=RECOMMENDATION_CACHE_MAX_ENTRIES)
+)
+
+# Öneri modu: "genre" (tür bazlı), "cluster" (eğitilmiş KMeans kümeleri),
+# "item" (film-film komşu tablosu) veya "neighbors" (benzer kullanıcılar)
+RECOMMENDATION_MODE = os.getenv("RECOMMENDATION_MODE", "genre")
+MODEL_RELOAD_SECONDS = int(os.getenv("MODEL_RELOAD_SECONDS", "30"))
+
+# Yeni model devreye alındığında eski sürümle hesaplanmış öneriler silinir
+cluster_recommender = ClusterRecommender(
+    reload_interval=MODEL_RELOAD_SECONDS, on_reload=recommendation_cache.clear
+)
+item_neighbors = ItemNeighborIndex()
+
+# Benzer kullanıcı (ANN) ayarları
+ANN_NEIGHBORS = int(os.getenv("ANN_NEIGHBORS", "20"))
+ANN_PROBES = int(os.getenv("ANN_PROBES", "2"))
+user_index = None
+
+# Toplu öneri isteğinde kabul edilen en fazla kullanıcı ve kullanıcı başına film sayısı
+MAX_BATCH_USERS = int(os.getenv("MAX_BATCH_USERS", "10000"))
+MAX_BATCH_TOP_N = int(os.getenv("MAX_BATCH_TOP_N", "100"))
+# Toplu öneriyi başka kullanıcılar için isteyebilen servis hesapları (virgülle ayrılmış kullanıcı adları)
+BATCH_SERVICE_USERNAMES = {
+    name.strip() for name in os.getenv("BATCH_SERVICE_USERNAMES", "").split(",") if name.strip()
+}
+
+# Sayfalı listelemelerde tek sayfada dönen en fazla satır ve dışa aktarımın parça boyutu
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+HISTORY_EXPORT_CHUNK_SIZE = int(os.getenv("HISTORY_EXPORT_CHUNK_SIZE", "1000"))
 
 # Pydantic modelleri
 class UserCreate(BaseModel):
@@ -50,6 +202,8 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[int] = None
+    expires_at: float = 0
 
 class UserResponse(BaseModel):
     user_id: int
@@ -65,6 +219,14 @@ class MovieResponse(BaseModel):
     rating: float
     description: str
 
+class BatchRecommendationRequest(BaseModel):
+    user_ids: List[int]
+    top_n: int = Field(10, ge=1, le=MAX_BATCH_TOP_N)
+
+class BatchRecommendationResponse(BaseModel):
+    user_id: int
+    movie_ids: List[int]
+
 class WatchHistoryCreate(BaseModel):
     movie_id: int
     rating: int
@@ -75,20 +237,75 @@ class UserPreferencesCreate(BaseModel):
     preferred_actors: str
     watch_time_preference: str
 
-# Veritabanı bağlantısı
-def get_db():
+@app.on_event("startup")
+def load_candidate_index():
+    if not USE_CANDIDATE_INDEX:
+        return
     db = SessionLocal()
     try:
-        yield db
+        candidate_index.load(db)
+    except Exception as e:
+        # İndeks yüklenemezse öneriler veritabanı yolundan sunulur
+        logging.error(f"Aday indeksi yükleme hatası: {str(e)}")
     finally:
         db.close()
 
+@app.on_event("startup")
+def load_cluster_model():
+    if RECOMMENDATION_MODE != "cluster":
+        return
+    db = SessionLocal()
+    try:
+        cluster_recommender.load(db)
+    except Exception as e:
+        # Model yüklenemezse tür bazlı önerilere dönülür
+        logging.error(f"Küme modeli yükleme hatası: {str(e)}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def load_item_neighbors():
+    if RECOMMENDATION_MODE != "item":
+        return
+    try:
+        item_neighbors.load()
+    except Exception as e:
+        # Komşu tablosu yüklenemezse tür bazlı önerilere dönülür
+        logging.error(f"Film komşu tablosu yükleme hatası: {str(e)}")
+
+@app.on_event("startup")
+def load_user_index():
+    global user_index
+    if RECOMMENDATION_MODE != "neighbors":
+        return
+    try:
+        user_index = load_ann_index(n_probe=ANN_PROBES)
+        logging.info(f"Kullanıcı ANN indeksi yüklendi: {len(user_index.ids)} kullanıcı")
+    except Exception as e:
+        # İndeks yüklenemezse tür bazlı önerilere dönülür
+        logging.error(f"Kullanıcı ANN indeksi yükleme hatası: {str(e)}")
+
 # Yardımcı fonksiyonlar
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    """Şifreyi hash havuzunda doğrula; (doğru mu, maliyet değiştiyse yeni hash)"""
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        raise password_hasher_busy()
+
+async def get_password_hash(password):
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise password_hasher_busy()
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def password_hasher_busy():
+    logging.error(f"Şifre hash kuyruğu dolu: {password_hasher.pending} bekleyen iş")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, try again later",
+        headers={"Retry-After": "1"}
+    )
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -97,65 +314,166 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str, db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials"
     )
+
+def decode_token(token: str):
+    """Token'ı doğrulayıp içindeki kullanıcı bilgisini döndür; sonuç token süresince önbellekte tutulur"""
+    token_data = auth_cache.token(token)
+    if token_data is not None:
+        return token_data
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
+            raise credentials_exception()
+        token_data = TokenData(
+            username=username,
+            user_id=payload.get("user_id"),
+            expires_at=payload["exp"]
+        )
     except jwt.JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.username == token_data.username).first()
-    if user is None:
-        raise credentials_exception
-    return user
+        raise credentials_exception()
+    auth_cache.add_token(token, token_data)
+    return token_data
+
+def identity_query(token_data: TokenData):
+    """Kimlik için yalnızca gereken sütunları okuyan sorgu"""
+    query = select(User.user_id, User.username, User.is_active)
+    # user_id taşımayan eski token'lar kullanıcı adıyla çözülür
+    if token_data.user_id is not None:
+        return query.where(User.user_id == token_data.user_id)
+    return query.where(User.username == token_data.username)
+
+def resolve_identity(token_data: TokenData, row):
+    """Sorgu satırını kimliğe çevirip önbelleğe al; pasif kullanıcıları reddet"""
+    if row is None:
+        raise credentials_exception()
+    identity = Identity(row.user_id, row.username, row.is_active is not False)
+    auth_cache.add_identity(identity)
+    token_data.user_id = identity.user_id
+    return check_active(identity)
+
+def check_active(identity: Identity):
+    if not identity.is_active:
+        raise credentials_exception()
+    return identity
+
+def get_current_user(token: str, db: Session = Depends(get_db)):
+    """Token'ın kimliği; önbellekteyse kullanıcı tablosu sorgulanmaz"""
+    token_data = decode_token(token)
+    if token_data.user_id is not None:
+        identity = auth_cache.identity(token_data.user_id)
+        if identity is not None:
+            return check_active(identity)
+    return resolve_identity(token_data, db.execute(identity_query(token_data)).first())
+
+async def get_current_user_async(token: str, db: AsyncSession = Depends(get_async_db)):
+    """get_current_user'ın asenkron oturumla çalışan karşılığı"""
+    token_data = decode_token(token)
+    if token_data.user_id is not None:
+        identity = auth_cache.identity(token_data.user_id)
+        if identity is not None:
+            return check_active(identity)
+    result = await db.execute(identity_query(token_data))
+    return resolve_identity(token_data, result.first())
+
+def get_user_feature_stats(db: Session, user_id: int):
+    """Kullanıcının özellik toplamlarını getir; ilk kez gerekiyorsa geçmişten oluştur"""
+    stats = db.query(UserFeatureStats).filter(UserFeatureStats.user_id == user_id).first()
+    if stats is None:
+        rating_sum, rating_count, duration_sum, duration_count = db.query(
+            func.coalesce(func.sum(WatchHistory.rating), 0),
+            func.count(WatchHistory.rating),
+            func.coalesce(func.sum(WatchHistory.watch_duration), 0),
+            func.count(WatchHistory.watch_duration)
+        ).filter(WatchHistory.user_id == user_id).one()
+        stats = UserFeatureStats(
+            user_id=user_id,
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            duration_sum=duration_sum,
+            duration_count=duration_count
+        )
+        db.add(stats)
+    return stats
 
 # API Endpoint'leri
+@app.on_event("shutdown")
+def shutdown_password_hasher():
+    password_hasher.shutdown()
+
 @app.post("/api/users/register", response_model=UserResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Kullanıcı adı ve email kontrolü
-    if db.query(User).filter(User.username == user.username).first():
+    if (await db.execute(select(User.user_id).where(User.username == user.username))).first():
         raise HTTPException(status_code=400, detail="Username already registered")
-    if db.query(User).filter(User.email == user.email).first():
+    if (await db.execute(select(User.user_id).where(User.email == user.email))).first():
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Yeni kullanıcı oluştur
+    # Yeni kullanıcı oluştur; hash sınırlı havuzda hesaplanır
     db_user = User(
         username=user.username,
         email=user.email,
-        password_hash=get_password_hash(user.password)
+        password_hash=await get_password_hash(user.password)
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @app.post("/api/users/login")
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == login_data.username).first()
-    if not user or not verify_password(login_data.password, user.password_hash):
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).where(User.username == login_data.username))
+    user = result.scalars().first()
+    valid, new_hash = await verify_password(login_data.password, user.password_hash) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
         )
+    if user.is_active is False:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+    if new_hash is not None:
+        # Maliyet ayarı değiştiyse hash kullanıcı fark etmeden yenilenir
+        user.password_hash = new_hash
+        await db.commit()
     
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_access_token(data={"sub": user.username, "user_id": user.user_id})
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.get("/api/users/password-hasher")
+def get_password_hasher_stats():
+    return password_hasher.stats()
+
 @app.get("/api/users/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def read_users_me(
+    current_user: Identity = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Kimlik yalnızca doğrulama sütunlarını taşır; profil tam satırdan döner
+    return await db.get(User, current_user.user_id)
+
+@app.delete("/api/users/me")
+def deactivate_user(
+    current_user: Identity = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    db.query(User).filter(User.user_id == current_user.user_id).update({User.is_active: False})
+    db.commit()
+    # Önbellekteki kimlik ve token'lar silinir; sonraki istekler reddedilir
+    auth_cache.invalidate_user(current_user.user_id)
+    recommendation_cache.invalidate(current_user.user_id)
+    logging.info(f"Kullanıcı pasifleştirildi: {current_user.username}")
+    return {"message": "User deactivated successfully"}
 
 @app.put("/api/users/preferences")
 def update_preferences(
     preferences: UserPreferencesCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Identity = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     user_preferences = db.query(UserPreferences).filter(
@@ -176,102 +494,450 @@ def update_preferences(
     db.commit()
     return {"message": "Preferences updated successfully"}
 
+def check_page_size(limit: int):
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit must be between 1 and {MAX_PAGE_SIZE}"
+        )
+
 @app.get("/api/movies", response_model=List[MovieResponse])
-def get_movies(
+async def get_movies(
+    response: Response,
     skip: int = 0,
     limit: int = 10,
     genre: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Movie)
+    check_page_size(limit)
+    query = select(Movie)
     if genre:
-        query = query.filter(Movie.genre.contains(genre))
-    movies = query.offset(skip).limit(limit).all()
+        # Tür adı benzersiz indeksle, filmleri movie_genres indeksiyle bulunur
+        query = query.join(movie_genres, movie_genres.c.movie_id == Movie.movie_id).join(
+            Genre, Genre.genre_id == movie_genres.c.genre_id
+        ).where(Genre.name == genre)
+    if cursor:
+        # İmleç verildiğinde sayfa, önceki sayfalar taranmadan birincil anahtardan aranır;
+        # skip yalnızca eski istemcilerle uyumluluk için vardır
+        query = query.where(after_movie(cursor))
+    elif skip:
+        query = query.offset(skip)
+    result = await db.execute(query.order_by(Movie.movie_id).limit(limit))
+    movies = result.scalars().all()
+    if len(movies) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = movie_cursor(movies[-1])
     return movies
 
+def recommend_from_db(db: Session, user_id: int, limit: int = 10):
+    """Önerileri sabit sayıda veritabanı sorgusuyla hesapla"""
+    # Tür bazında beğeni sayıları tek bir toplu sorguda hesaplanır;
+    # geçmişi olmayan kullanıcı için sorgu hiç satır döndürmez
+    # (birden fazla türü olan film her türüne katkı verir)
+    liked = case((WatchHistory.rating >= 4, 1), else_=0)  # 4 ve üzeri puan verdiği filmler
+    with stage("genre_aggregation"):
+        genre_stats = db.query(
+            Genre.genre_id,
+            Genre.name,
+            func.sum(liked).label("likes")
+        ).select_from(WatchHistory).outerjoin(
+            movie_genres, movie_genres.c.movie_id == WatchHistory.movie_id
+        ).outerjoin(
+            Genre, Genre.genre_id == movie_genres.c.genre_id
+        ).filter(
+            WatchHistory.user_id == user_id
+        ).group_by(Genre.genre_id, Genre.name).all()
+    
+    if not genre_stats:
+        logging.info("Kullanıcının izleme geçmişi yok, rastgele filmler öneriliyor")
+        # İzleme geçmişi yoksa, rastgele filmler öner
+        with stage("candidate_query"):
+            return db.query(Movie).order_by(
+                Movie.rating.desc(), Movie.movie_id
+            ).limit(limit).all()
+    
+    # En çok beğenilen türleri bul (eşitlikte küçük genre_id)
+    favorite_genres = top_genres(genre_stats)
+    top_genre_names = [name for _, name, _ in favorite_genres]
+    
+    logging.info(f"Kullanıcının favori türleri: {top_genre_names}")
+    if not top_genre_names:
+        return []
+    
+    # Bu türlerdeki, kullanıcının henüz izlemediği filmleri öner;
+    # izlenenler listesi belleğe alınmaz, ilişkili NOT EXISTS ile elenir
+    watched = db.query(WatchHistory.history_id).filter(
+        WatchHistory.user_id == user_id,
+        WatchHistory.movie_id == Movie.movie_id
+    ).exists()
+    in_genres = select(movie_genres.c.movie_id).where(
+        movie_genres.c.genre_id.in_([genre_id for genre_id, _, _ in favorite_genres])
+    )
+    # Puan eşitliğinde movie_id sırası; aday indeksi ve toplu öneri aynı sırayı kullanır
+    with stage("candidate_query"):
+        return db.query(Movie).filter(
+            Movie.movie_id.in_(in_genres),
+            ~watched
+        ).order_by(
+            Movie.rating.desc(), Movie.movie_id
+        ).limit(limit).all()
+
+def recommend_from_index(db: Session, user_id: int, limit: int = 10):
+    """Önerileri bellekteki aday indeksinden hesapla (tek veritabanı sorgusu)"""
+    # Yalnızca film kimliği ve puan okunur; türler indeksten çözülür
+    with stage("history_fetch"):
+        user_history = db.query(WatchHistory.movie_id, WatchHistory.rating).filter(
+            WatchHistory.user_id == user_id
+        ).all()
+    
+    if not user_history:
+        logging.info("Kullanıcının izleme geçmişi yok, rastgele filmler öneriliyor")
+        with stage("candidate_query"):
+            return candidate_index.top_n(n=limit)
+    
+    with stage("genre_aggregation"):
+        likes = {}
+        for movie_id, rating in user_history:
+            if rating is None or rating < 4:
+                continue
+            for genre in candidate_index.genres_of(movie_id):
+                likes[genre] = likes.get(genre, 0) + 1
+        
+        # recommend_from_db ile aynı kural: beğeni azalan, eşitlikte genre_id artan
+        favorite_genres = top_genres(
+            (candidate_index.genre_id(genre), genre, count) for genre, count in likes.items()
+        )
+        top_genre_names = [genre for _, genre, _ in favorite_genres]
+    
+    logging.info(f"Kullanıcının favori türleri: {top_genre_names}")
+    if not top_genre_names:
+        return []
+    
+    watched_movie_ids = [movie_id for movie_id, _ in user_history]
+    with stage("candidate_query"):
+        return candidate_index.top_n(top_genre_names, exclude=watched_movie_ids, n=limit)
+
+def recommend_by_genre(db: Session, user_id: int, limit: int = 10):
+    """Tür bazlı önerileri indeks hazırsa indeksten, değilse veritabanından sun"""
+    if candidate_index.loaded:
+        return recommend_from_index(db, user_id, limit)
+    return recommend_from_db(db, user_id, limit)
+
+def load_movies(db: Session, movie_ids):
+    """Film kimliklerini verilen sırayla film satırlarına çevir"""
+    if candidate_index.loaded:
+        movies = [candidate_index.movie(movie_id) for movie_id in movie_ids]
+        if all(movies):
+            return movies
+    movies = {
+        movie.movie_id: movie
+        for movie in db.query(Movie).filter(Movie.movie_id.in_(movie_ids))
+    }
+    return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+
+def recommend_from_clusters(db: Session, user_id: int, limit: int = 10):
+    """Önerileri kullanıcının kümesi için önceden hesaplanmış listeden sun"""
+    with stage("history_fetch"):
+        watched_movie_ids = [movie_id for movie_id, in db.query(WatchHistory.movie_id).filter(
+            WatchHistory.user_id == user_id
+        )]
+    with stage("candidate_query"):
+        movie_ids = cluster_recommender.recommend(user_id, exclude=watched_movie_ids, n=limit)
+        if movie_ids is None:
+            return None
+        
+        logging.info(f"Kullanıcı kümesi: {cluster_recommender.cluster_of(user_id)}")
+        return load_movies(db, movie_ids)
+
+def recommend_from_items(db: Session, user_id: int, limit: int = 10):
+    """Önerileri izlenen filmlerin komşularından (film-film benzerliği) sun"""
+    with stage("history_fetch"):
+        user_history = db.query(WatchHistory.movie_id, WatchHistory.rating).filter(
+            WatchHistory.user_id == user_id
+        ).all()
+    if not user_history:
+        return None
+    
+    with stage("candidate_query"):
+        movie_ids = item_neighbors.recommend(
+            [movie_id for movie_id, _ in user_history],
+            [rating if rating is not None else 0 for _, rating in user_history],
+            n=limit
+        )
+        if not movie_ids:
+            return None
+        return load_movies(db, movie_ids)
+
+def recommend_from_neighbors(db: Session, user_id: int, limit: int = 10):
+    """Önerileri en yakın kullanıcıların yüksek puan verdiği filmlerden sun"""
+    with stage("neighbor_search"):
+        query = user_index.vector(user_id)
+        if query is None:
+            return None
+        neighbor_ids, _ = user_index.search(query, k=ANN_NEIGHBORS, exclude=user_id)
+    if len(neighbor_ids) == 0:
+        return None
+    
+    # Komşuların beğendiği, kullanıcının izlemediği filmler tek sorguda sıralanır
+    own = aliased(WatchHistory)
+    watched = db.query(own.history_id).filter(
+        own.user_id == user_id,
+        own.movie_id == WatchHistory.movie_id
+    ).exists()
+    with stage("candidate_query"):
+        rows = db.query(WatchHistory.movie_id).filter(
+            WatchHistory.user_id.in_(neighbor_ids.tolist()),
+            WatchHistory.rating >= 4,
+            ~watched
+        ).group_by(WatchHistory.movie_id).order_by(
+            func.count(WatchHistory.history_id).desc(),
+            func.avg(WatchHistory.rating).desc()
+        ).limit(limit).all()
+        if not rows:
+            return None
+        return load_movies(db, [movie_id for movie_id, in rows])
+
 @app.get("/api/movies/recommendations", response_model=List[MovieResponse])
 def get_recommendations(
     token: str,
     db: Session = Depends(get_db)
 ):
+    # Öneri yolları senkron ORM kodu ve CPU işidir (indeks birleştirme, küme araması,
+    # önbellek); senkron uç olarak iş parçacığı havuzunda çalışır ve olay döngüsünü bloke etmez
+    return compute_recommendations(db, token)
+
+def recommendation_version():
+    """Önbellekteki önerilerin geçerli olduğu model ve katalog sürümü"""
+    return f"{RECOMMENDATION_MODE}:{cluster_recommender.model_version}:{candidate_index.catalog_version}"
+
+def movie_row(movie):
+    """Film satırını önbelleğe yazılabilir yanıt sözlüğüne çevir"""
+    if isinstance(movie, dict):
+        return movie
+    return {field: getattr(movie, field) for field in MovieResponse.__fields__}
+
+def compute_recommendations(db: Session, token: str):
     try:
         logging.info("Öneri isteği başladı")
-        current_user = get_current_user(token, db)
+        with stage("auth"):
+            current_user = get_current_user(token, db)
         logging.info(f"Kullanıcı doğrulandı: {current_user.username}")
         
-        # Kullanıcının izleme geçmişini al
-        user_history = db.query(WatchHistory).filter(
-            WatchHistory.user_id == current_user.user_id
-        ).all()
-        
-        if not user_history:
-            logging.info("Kullanıcının izleme geçmişi yok, rastgele filmler öneriliyor")
-            # İzleme geçmişi yoksa, rastgele filmler öner
-            recommended_movies = db.query(Movie).order_by(
-                Movie.rating.desc()
-            ).limit(10).all()
-            return recommended_movies
+        # Yeni model arka planda kendi oturumuyla yüklenir; bu istek eski modelden sunulur.
+        # Yeni filmler önbellek sürümü hesaplanmadan önce indekse eklenir
+        if RECOMMENDATION_MODE == "cluster" and cluster_recommender.loaded:
+            cluster_recommender.maybe_reload(SessionLocal)
+        if candidate_index.loaded:
+            candidate_index.refresh(db)
         
-        # Kullanıcının beğendiği film türlerini bul
-        favorite_genres = {}
-        for history in user_history:
-            if history.rating >= 4:  # 4 ve üzeri puan verdiği filmler
-                movie = db.query(Movie).filter(
-                    Movie.movie_id == history.movie_id
-                ).first()
-                if movie and movie.genre:
-                    favorite_genres[movie.genre] = favorite_genres.get(movie.genre, 0) + 1
+        version = recommendation_version()
+        if USE_RECOMMENDATION_CACHE:
+            with stage("cache"):
+                # Nesil hesaplamadan önce okunur; arada gelen puanlama eski sonucun yazılmasını engeller
+                generation = recommendation_cache.generation(current_user.user_id)
+                cached = recommendation_cache.get(current_user.user_id, version)
+            if cached is not None:
+                logging.info(f"{len(cached)} film önerisi önbellekten sunuldu")
+                return cached
         
-        # En çok beğenilen türleri bul
-        top_genres = sorted(favorite_genres.items(), key=lambda x: x[1], reverse=True)[:3]
-        top_genre_names = [genre for genre, _ in top_genres]
+        recommended_movies = None
+        if RECOMMENDATION_MODE == "cluster" and cluster_recommender.loaded:
+            recommended_movies = recommend_from_clusters(db, current_user.user_id)
+        elif RECOMMENDATION_MODE == "item" and item_neighbors.loaded:
+            recommended_movies = recommend_from_items(db, current_user.user_id)
+        elif RECOMMENDATION_MODE == "neighbors" and user_index is not None:
+            recommended_movies = recommend_from_neighbors(db, current_user.user_id)
         
-        logging.info(f"Kullanıcının favori türleri: {top_genre_names}")
-        
-        # Bu türlerdeki, kullanıcının henüz izlemediği filmleri öner
-        watched_movie_ids = [history.movie_id for history in user_history]
-        recommended_movies = db.query(Movie).filter(
-            Movie.genre.in_(top_genre_names),
-            ~Movie.movie_id.in_(watched_movie_ids)
-        ).order_by(
-            Movie.rating.desc()
-        ).limit(10).all()
+        # Kümesi ya da komşusu bulunamayan kullanıcılar tür bazlı yoldan önerilir
+        if recommended_movies is None:
+            recommended_movies = recommend_by_genre(db, current_user.user_id)
         
+        with stage("serialization"):
+            recommended_movies = [movie_row(movie) for movie in recommended_movies]
+        if USE_RECOMMENDATION_CACHE:
+            with stage("cache"):
+                recommendation_cache.set(current_user.user_id, version, recommended_movies, generation)
         logging.info(f"{len(recommended_movies)} film önerisi bulundu")
         return recommended_movies
     
+    except HTTPException:
+        # Doğrulama hataları (401) olduğu gibi döner
+        raise
     except Exception as e:
         logging.error(f"Öneri hatası: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Recommendation error: {str(e)}")
 
+@app.post("/api/movies/recommendations/batch", response_model=List[BatchRecommendationResponse])
+def get_batch_recommendations(
+    request: BatchRecommendationRequest,
+    token: str,
+    db: Session = Depends(get_db)
+):
+    current_user = get_current_user(token, db)
+    if len(request.user_ids) > MAX_BATCH_USERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_USERS} user ids per request"
+        )
+    # Servis hesapları dışındaki kullanıcılar yalnızca kendi önerilerini isteyebilir
+    if current_user.username not in BATCH_SERVICE_USERNAMES and any(
+        user_id != current_user.user_id for user_id in request.user_ids
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to request recommendations for other users"
+        )
+    try:
+        results = score_users(db.connection(), request.user_ids, top_n=request.top_n)
+        logging.info(f"{len(results)} kullanıcı için toplu öneri hesaplandı")
+        return [
+            {"user_id": user_id, "movie_ids": movie_ids}
+            for user_id, movie_ids in results.items()
+        ]
+    
+    except Exception as e:
+        logging.error(f"Toplu öneri hatası: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Recommendation error: {str(e)}")
+
+@app.get("/api/movies/recommendations/index")
+def get_candidate_index_stats():
+    return candidate_index.stats()
+
+@app.get("/api/movies/recommendations/cache")
+def get_recommendation_cache_stats():
+    return recommendation_cache.stats()
+
+@app.get("/api/users/auth-cache")
+def get_auth_cache_stats():
+    return auth_cache.stats()
+
+@app.get("/api/db/pool")
+def get_pool_status():
+    return pool_status()
+
+@app.get("/metrics")
+def get_metrics():
+    """İstek/aşama/sorgu histogramları ile havuz, önbellek ve indeks durumları (Prometheus metin biçimi)"""
+    lines = []
+    for metric in metrics.REQUEST_METRICS:
+        lines.extend(metric.render())
+    pools = pool_status()
+    lines.extend(metrics.render_gauges("db_pool_sync", pools["sync"]))
+    lines.extend(metrics.render_gauges("db_pool_async", pools["async"]))
+    lines.extend(metrics.render_gauges("recommendation_cache", recommendation_cache.stats()))
+    lines.extend(metrics.render_gauges("candidate_index", candidate_index.stats()))
+    lines.extend(metrics.render_gauges("auth_cache", auth_cache.stats()))
+    lines.extend(metrics.render_gauges("password_hasher", password_hasher.stats()))
+    return PlainTextResponse("\n".join(lines) + "\n", media_type=metrics.CONTENT_TYPE)
+
+def upsert_watch_history(db: Session, user_id: int, watch_data: WatchHistoryCreate):
+    """İzleme kaydını ekle ya da güncelle; özellik toplamlarını farkla güncelle"""
+    # Toplamlar kayıt değişmeden önce okunur (ilk kez gerekiyorsa geçmişten oluşturulur)
+    stats = get_user_feature_stats(db, user_id)
+    watch_history = db.query(WatchHistory).filter(
+        WatchHistory.user_id == user_id,
+        WatchHistory.movie_id == watch_data.movie_id
+    ).with_for_update().first()
+    
+    if watch_history is None:
+        watch_history = WatchHistory(
+            user_id=user_id,
+            movie_id=watch_data.movie_id,
+            rating=watch_data.rating,
+            watch_duration=watch_data.watch_duration
+        )
+        db.add(watch_history)
+    else:
+        stats.remove(watch_history.rating, watch_history.watch_duration)
+        watch_history.rating = watch_data.rating
+        watch_history.watch_duration = (watch_history.watch_duration or 0) + watch_data.watch_duration
+        watch_history.watch_date = datetime.utcnow()
+    
+    # Kullanıcının özellik toplamlarını O(1) ile güncelle ve kümesini yeniden ata
+    stats.add(watch_history.rating, watch_history.watch_duration)
+    if cluster_recommender.can_assign:
+        stats.cluster = cluster_recommender.assign(user_id, stats.features())
+        logging.info(f"Kullanıcı {user_id} kümeye atandı: {stats.cluster}")
+    return watch_history
+
 @app.post("/api/movies/rate")
 def rate_movie(
     watch_data: WatchHistoryCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Identity = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # İzleme kaydı oluştur
-    watch_history = WatchHistory(
-        user_id=current_user.user_id,
-        movie_id=watch_data.movie_id,
-        rating=watch_data.rating,
-        watch_duration=watch_data.watch_duration
-    )
-    db.add(watch_history)
-    db.commit()
+    # Kullanıcı başına film tek kayıttır: yeniden puanlamada puan değişir,
+    # izleme süreleri toplanır. Aynı anda gelen iki ilk kayıttan biri benzersiz
+    # indekse takılırsa işlem güncelleme olarak bir kez daha denenir.
+    for attempt in range(2):
+        try:
+            upsert_watch_history(db, current_user.user_id, watch_data)
+            db.commit()
+            break
+        except IntegrityError:
+            db.rollback()
+            if attempt == 1:
+                raise
     
+    # Kullanıcının önerileri yeni puanla yeniden hesaplanmalıdır
+    recommendation_cache.invalidate(current_user.user_id)
     return {"message": "Rating added successfully"}
 
 @app.get("/api/history", response_model=List[WatchHistoryCreate])
-def get_watch_history(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_watch_history(
+    response: Response,
+    limit: int = MAX_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    current_user: Identity = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    history = db.query(WatchHistory).filter(
-        WatchHistory.user_id == current_user.user_id
-    ).all()
+    check_page_size(limit)
+    query = select(WatchHistory).where(WatchHistory.user_id == current_user.user_id)
+    if cursor:
+        query = query.where(after_history(cursor))
+    # (watch_date, history_id) sırası (user_id, watch_date) indeksinden okunur; tarihsiz kayıtlar en sonda
+    result = await db.execute(query.order_by(*HISTORY_ORDER).limit(limit))
+    history = result.scalars().all()
+    if len(history) == limit:
+        last = history[-1]
+        response.headers[NEXT_CURSOR_HEADER] = history_cursor(last.watch_date, last.history_id)
     return history
 
+async def stream_history_rows(user_id: int):
+    """Kullanıcının tüm geçmişini sunucu tarafı imleçten NDJSON satırları olarak üret"""
+    # Yanıt akarken bağlantı açık kalmalıdır; oturum bağımlılık yerine burada açılır
+    async with AsyncSessionLocal() as db:
+        try:
+            result = await db.stream(select(
+                WatchHistory.movie_id,
+                WatchHistory.rating,
+                WatchHistory.watch_duration,
+                WatchHistory.watch_date
+            ).where(
+                WatchHistory.user_id == user_id
+            ).order_by(*HISTORY_ORDER).execution_options(yield_per=HISTORY_EXPORT_CHUNK_SIZE))
+            # ORM nesnesi oluşturulmaz; her parça satır demetlerinden tek dizgeye yazılır
+            async for rows in result.partitions():
+                yield "".join(
+                    json.dumps({
+                        "movie_id": movie_id,
+                        "rating": rating,
+                        "watch_duration": watch_duration,
+                        "watch_date": watch_date.isoformat() if watch_date else None
+                    }) + "\n"
+                    for movie_id, rating, watch_duration, watch_date in rows
+                )
+        except Exception as e:
+            logging.error(f"Geçmiş dışa aktarma hatası: {str(e)}")
+            raise
+
+@app.get("/api/history/export")
+async def export_watch_history(current_user: Identity = Depends(get_current_user_async)):
+    return StreamingResponse(
+        stream_history_rows(current_user.user_id),
+        media_type="application/x-ndjson"
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001) 
\ No newline at end of file
@@ -0,0 +1,178 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+# İstek süreleri için saniye cinsinden histogram sınırları
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# İstek başına sorgu sayısı sınırları (N+1 artışlarını yakalamak için)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """Etiketli, yalnızca artan sayaç"""
+
+    def __init__(self, name, description, label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Etiketli, sabit sınırlı histogram (Prometheus metin biçiminde)"""
+
+    def __init__(self, name, description, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ("le",)
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{format_labels(names, key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{format_labels(names, key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+def render_gauges(name, stats):
+    """Sayısal durum sözlüğünü gauge satırlarına çevir; iç içe sözlükler ad ile birleştirilir"""
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            lines.extend(render_gauges(f"{name}_{key}", value))
+        elif isinstance(value, (bool, int, float)):
+            lines.append(f"# TYPE {name}_{key} gauge")
+            lines.append(f"{name}_{key} {float(value)}")
+    return lines
+
+
+class RequestStats:
+    """Tek isteğin aşama süreleri ve veritabanı sorgu sayısı/süresi"""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.stages = {}
+
+
+current_request = ContextVar("current_request", default=None)
+
+http_requests = Counter(
+    "http_requests_total", "Tamamlanan HTTP istekleri", ("method", "path", "status")
+)
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Uç bazında istek süresi", ("method", "path")
+)
+stage_seconds = Histogram(
+    "request_stage_duration_seconds", "İstek içindeki aşamaların süresi", ("stage",)
+)
+db_query_seconds = Histogram(
+    "db_query_duration_seconds", "Veritabanı sorgusu süresi", ("engine",)
+)
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "İstek başına veritabanı sorgusu sayısı", ("path",), QUERY_COUNT_BUCKETS
+)
+db_seconds_per_request = Histogram(
+    "db_duration_per_request_seconds", "İstek başına toplam veritabanı süresi", ("path",)
+)
+
+REQUEST_METRICS = (
+    http_requests, http_request_seconds, stage_seconds,
+    db_query_seconds, db_queries_per_request, db_seconds_per_request,
+)
+
+
+@contextmanager
+def stage(name):
+    """Bloğun süresini aşama histogramına ve (varsa) isteğin aşama dökümüne yaz"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.stages[name] = stats.stages.get(name, 0.0) + elapsed
+
+
+def instrument_engine(engine, name):
+    """Motorun her sorgusunu süre histogramına ve etkin isteğin sayaçlarına ekle"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_query_seconds.observe(elapsed, engine=name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # Hata veren sorgu after_cursor_execute'a ulaşmaz; başlangıç zamanı atılır
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+
+def server_timing(stats, total):
+    """İsteğin süre dökümü (Server-Timing başlığı, milisaniye)"""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stats.stages.items()]
+    parts.append(f'db;dur={stats.query_seconds * 1000:.1f};desc="{stats.queries} queries"')
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
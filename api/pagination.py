@@ -0,0 +1,79 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+from database.database import Movie, WatchHistory
+
+# Sayfalama yanıtlarında sonraki sayfanın imlecini taşıyan başlık
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values):
+    """Son satırın sıralama anahtarını istemciye opak bir dizge olarak ver"""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, keys):
+    """İmleci çöz; biçimi bozuk ya da beklenen anahtarları içermiyorsa 400 döndür"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, dict) or set(values) != set(keys):
+            raise ValueError(cursor)
+        return values
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def movie_cursor(movie):
+    return encode_cursor({"m": movie.movie_id})
+
+
+def cursor_int(value):
+    """İmleçteki tam sayı alanı; bool ve kesirli değerler de bozuk sayılır"""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(value)
+    return int(value)
+
+
+def after_movie(cursor):
+    """(movie_id) anahtarında imleçten sonraki filmler"""
+    values = decode_cursor(cursor, ("m",))
+    try:
+        movie_id = cursor_int(values["m"])
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return Movie.movie_id > movie_id
+
+
+# İzleme geçmişi sırası: tarihi olmayan kayıtlar en sonda, eşitlikler history_id ile bozulur
+HISTORY_ORDER = (WatchHistory.watch_date.asc().nulls_last(), WatchHistory.history_id)
+
+
+def history_cursor(watch_date, history_id):
+    # Tarihi olmayan kayıt imlece açıkça null olarak yazılır
+    return encode_cursor({"d": watch_date.isoformat() if watch_date else None, "h": history_id})
+
+
+def after_history(cursor):
+    """HISTORY_ORDER sırasında imleçten sonraki izleme kayıtları"""
+    values = decode_cursor(cursor, ("d", "h"))
+    try:
+        watch_date = datetime.fromisoformat(values["d"]) if values["d"] is not None else None
+        history_id = cursor_int(values["h"])
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if watch_date is None:
+        # Sıranın sonundaki tarihsiz kayıtlar arasında yalnızca history_id ilerler
+        return and_(WatchHistory.watch_date.is_(None), WatchHistory.history_id > history_id)
+    # Satır değeri karşılaştırması açık yazılır; (user_id, watch_date) indeksiyle aranır
+    return or_(
+        WatchHistory.watch_date > watch_date,
+        and_(WatchHistory.watch_date == watch_date, WatchHistory.history_id > history_id),
+        WatchHistory.watch_date.is_(None)
+    )
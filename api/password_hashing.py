@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+from passlib.context import CryptContext
+
+
+@lru_cache(maxsize=None)
+def password_context(rounds):
+    """Verilen maliyetle bcrypt bağlamı; farklı maliyetli hash'ler güncellenmeli sayılır"""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds
+    )
+
+
+def hash_password(rounds, password):
+    return password_context(rounds).hash(password)
+
+
+def verify_and_update_password(rounds, password, password_hash):
+    """(doğru mu, maliyet değiştiyse yeni hash ya da None)"""
+    return password_context(rounds).verify_and_update(password, password_hash)
+
+
+class PasswordHasherBusy(Exception):
+    """Bekleyen hash işi sınırı aşıldı; istek kuyruğa alınmadan reddedilir"""
+
+
+class PasswordHasher:
+    """bcrypt işlerini istek işleyen iş parçacıklarından ayrı, sınırlı bir havuzda çalıştırır.
+
+    Aynı anda en fazla `workers` hash hesaplanır; çalışan ve bekleyen iş
+    sayısı `max_pending` değerine ulaştığında yeni işler kabul edilmez.
+    Böylece giriş fırtınası öneri isteklerine ayrılan CPU'yu tüketemez.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_pending=32, executor="thread"):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        pool = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        self._executor = pool(max_workers=workers)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    async def _submit(self, function, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, function, self.rounds, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    async def hash(self, password):
+        return await self._submit(hash_password, password)
+
+    async def verify_and_update(self, password, password_hash):
+        valid, new_hash = await self._submit(verify_and_update_password, password, password_hash)
+        if new_hash is not None:
+            self.rehashed += 1
+            logging.info(f"Şifre hash'i yeni maliyetle ({self.rounds}) güncellenecek")
+        return valid, new_hash
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+        }
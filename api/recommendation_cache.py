@@ -0,0 +1,227 @@
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    """Süre (TTL) ve boyut (LRU) sınırlı, süreç içi önbellek deposu
+
+    Her anahtarın bir nesli vardır; `delete` ve `clear` nesli ilerletir ve
+    `set` yalnızca hesaplamadan önce okunan nesil hâlâ geçerliyse yazar.
+    Nesiller de en fazla `max_entries` anahtar için tutulur; çıkarılan
+    anahtarlar çıkarılanların en büyük nesline düşer, böylece geçersizleştirilmiş
+    bir anahtara eski nesille yazılamaz.
+    """
+
+    def __init__(self, ttl=300, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = OrderedDict()
+        self._next_generation = itertools.count(1)
+        self._generation_floor = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _generation(self, key):
+        return self._generations.get(key, self._generation_floor)
+
+    def generation(self, key):
+        with self._lock:
+            return self._generation(key)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation):
+        """Nesil okunduğundan beri değişmediyse yaz; yazıldıysa True"""
+        with self._lock:
+            if self._generation(key) != generation:
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = next(self._next_generation)
+            self._generations.move_to_end(key)
+            while len(self._generations) > self.max_entries:
+                _, evicted = self._generations.popitem(last=False)
+                self._generation_floor = max(self._generation_floor, evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            # Temizlemeden önce okunan hiçbir nesil artık geçerli değildir
+            self._generations.clear()
+            self._generation_floor = next(self._next_generation)
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SharedBackend:
+    """API süreçleri arasında paylaşılan önbellek deposu (Redis istemci arayüzü)
+
+    İstemciden yalnızca get, mget, set(ex=...), delete, incr, expire ve
+    scan_iter(match=...) beklenir; testlerde aynı arayüzü sağlayan yerel bir
+    nesne verilebilir. Süre dolumu TTL ile, boyut sınırı sunucunun LRU çıkarma
+    politikasıyla (ör. maxmemory-policy allkeys-lru) sağlanır.
+
+    Anahtarın nesli ayrı bir sayaçta tutulur ve `delete` ile artırılır. Kayıt
+    yazıldığı nesille saklanır; okurken nesil değişmişse kayıt yok sayılır.
+    Böylece yazma öncesi kontrol ile yazma arasına giren bir geçersizleştirme
+    de eski kaydı geri getiremez. Nesil sayaçları `generation_ttl` saniye
+    (kayıt TTL'sinden uzun olmalı) sonra düşer.
+    """
+
+    def __init__(self, client, ttl=300, prefix="recommendations:",
+                 generation_prefix="recommendation-generations:", generation_ttl=86400):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.generation_prefix = generation_prefix
+        self.generation_ttl = generation_ttl
+
+    @classmethod
+    def from_url(cls, url, ttl=300):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Paylaşılan öneri önbelleği (RECOMMENDATION_CACHE_URL) için redis paketi gerekli")
+        return cls(redis.Redis.from_url(url), ttl=ttl)
+
+    def generation(self, key):
+        raw = self.client.get(self.generation_prefix + key)
+        return int(raw) if raw is not None else 0
+
+    def get(self, key):
+        # Kayıt ve nesil tek istekte okunur
+        raw, generation = self.client.mget([self.prefix + key, self.generation_prefix + key])
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if entry["generation"] != (int(generation) if generation is not None else 0):
+            return None
+        return entry["value"]
+
+    def set(self, key, value, generation):
+        """Nesil okunduğundan beri değişmediyse yaz; yazıldıysa True"""
+        if self.generation(key) != generation:
+            return False
+        self.client.set(self.prefix + key, json.dumps({"generation": generation, "value": value}), ex=self.ttl)
+        return True
+
+    def delete(self, key):
+        generation_key = self.generation_prefix + key
+        self.client.incr(generation_key)
+        self.client.expire(generation_key, self.generation_ttl)
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        return {"backend": "shared"}
+
+
+class RecommendationCache:
+    """Kullanıcı başına öneri sonuçlarını model sürümüyle birlikte saklar.
+
+    Kayıt kullanıcı kimliğiyle tutulur ve hesaplandığı model/katalog
+    sürümünü taşır; sürüm değiştiğinde kayıt isabet saymaz. Kullanıcı
+    puan verdiğinde yalnızca onun kaydı, yeni model yüklendiğinde tümü silinir.
+    Hesaplamaya başlamadan önce `generation()` okunur ve `set()`e verilir;
+    arada kullanıcının kaydı geçersizleştirildiyse eski sonuç yazılmaz.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+
+    def generation(self, user_id):
+        """Kullanıcı kaydının nesli; okunamazsa None (sonuç önbelleğe yazılmaz)"""
+        try:
+            return self.backend.generation(str(user_id))
+        except Exception as e:
+            logging.error(f"Öneri önbelleği nesil okuma hatası: {str(e)}")
+            return None
+
+    def get(self, user_id, version):
+        try:
+            entry = self.backend.get(str(user_id))
+        except Exception as e:
+            # Paylaşılan depo erişilemezse öneriler önbelleksiz hesaplanır
+            logging.error(f"Öneri önbelleği okuma hatası: {str(e)}")
+            entry = None
+        if entry is None or entry["version"] != version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["movies"]
+
+    def set(self, user_id, version, movies, generation):
+        if generation is None:
+            return
+        try:
+            if not self.backend.set(str(user_id), {"version": version, "movies": movies}, generation):
+                # Hesaplama sürerken kayıt geçersizleştirildi; sonuç eski verilere dayanır
+                self.stale_writes += 1
+        except Exception as e:
+            logging.error(f"Öneri önbelleği yazma hatası: {str(e)}")
+
+    def invalidate(self, user_id):
+        try:
+            self.backend.delete(str(user_id))
+            self.invalidations += 1
+        except Exception as e:
+            # Silinemeyen kayıt en geç TTL sonunda düşer
+            logging.error(f"Öneri önbelleği silme hatası: {str(e)}")
+
+    def clear(self):
+        try:
+            self.backend.clear()
+            self.invalidations += 1
+        except Exception as e:
+            logging.error(f"Öneri önbelleği temizleme hatası: {str(e)}")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            **self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations,
+            "stale_writes": self.stale_writes,
+        }
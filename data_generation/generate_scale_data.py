@@ -0,0 +1,388 @@
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Film türleri
+GENRES = [
+    "Aksiyon", "Macera", "Animasyon", "Komedi", "Suç", "Belgesel",
+    "Drama", "Aile", "Fantastik", "Korku", "Müzikal", "Gizem",
+    "Romantik", "Bilim Kurgu", "Gerilim", "Savaş", "Western"
+]
+WATCH_TIME_PREFERENCES = np.array(["morning", "afternoon", "evening", "night"])
+N_ACTORS = 5000
+
+# Tabloların yazılma sırası; izleme geçmişi yabancı anahtarlar nedeniyle en son yazılır.
+# Tür tablosu bunlardan önce tek parça yazılır, movie_genres film parçalarıyla birlikte yazılır.
+TABLES = ('users', 'movies', 'user_preferences', 'watch_history')
+
+# Üretilen kullanıcıların ortak şifresi (yük testlerinde giriş için)
+DEFAULT_PASSWORD = 'sifre123'
+
+START_DATE = np.datetime64('2023-01-01T00:00:00')
+HISTORY_SECONDS = 365 * 24 * 3600
+
+
+def chunk_rng(seed, table, chunk_index):
+    """Her (tablo, parça) için bağımsız ve işçi sayısından bağımsız üreteç"""
+    return np.random.default_rng([seed, TABLES.index(table), chunk_index])
+
+
+def user_event_counts(n_users, n_movies, events, skew, seed):
+    """Kullanıcı etkinliği log-normal dağılır; olaylar bu ağırlıklarla kullanıcılara bölüştürülür
+
+    Olay sayısı yetiyorsa her kullanıcıya önce bir olay verilir, böylece
+    geçmişi olmayan kullanıcı kalmaz. Kullanıcı başına film tek kayıt
+    olduğundan bir kullanıcının olay sayısı film sayısını aşamaz; sınırı
+    aşan olaylar sınırın altındaki kullanıcılara yeniden dağıtılır.
+    """
+    rng = np.random.default_rng([seed, 100])
+    weights = rng.lognormal(0.0, skew, size=n_users)
+    events = min(events, n_users * n_movies)
+    counts = np.ones(n_users, dtype=np.int64) if events >= n_users else np.zeros(n_users, dtype=np.int64)
+    remaining = events - int(counts.sum())
+    while remaining:
+        open_users = counts < n_movies
+        share = np.where(open_users, weights, 0.0)
+        counts += rng.multinomial(remaining, share / share.sum())
+        remaining = int(np.maximum(counts - n_movies, 0).sum())
+        counts = np.minimum(counts, n_movies)
+    return counts
+
+
+# Dağılım tabloları her işçi süreci içinde bir kez hesaplanıp önbelleğe alınır
+@lru_cache(maxsize=1)
+def movie_popularity(n_movies, exponent, seed):
+    """Zipf popülerliği: sıra → film eşlemesi rastgeledir, böylece popüler filmler kimliğe bağlı değildir"""
+    rng = np.random.default_rng([seed, 101])
+    weights = 1.0 / np.arange(1, n_movies + 1) ** exponent
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1], rng.permutation(n_movies)
+
+
+@lru_cache(maxsize=1)
+def movie_quality(n_movies, seed):
+    """Filmlerin 1-10 arası puanı; izleme puanları bu puana göre üretilir"""
+    rng = np.random.default_rng([seed, 102])
+    return np.round(np.clip(rng.normal(6.5, 1.5, size=n_movies), 1, 10), 1)
+
+
+def generate_users(start, stop, rng, password_hash):
+    ids = np.arange(start + 1, stop + 1, dtype=np.int64)
+    names = pd.Series(ids).astype(str)
+    return pd.DataFrame({
+        'user_id': ids,
+        'username': 'kullanici_' + names,
+        'email': 'kullanici_' + names + '@example.com',
+        'password_hash': password_hash,
+        'created_at': START_DATE - rng.integers(0, HISTORY_SECONDS, size=len(ids)).astype('timedelta64[s]'),
+        'is_active': rng.random(len(ids)) < 0.97,
+    })
+
+
+def generate_genres():
+    """Tür kimliği, genre_mask içindeki bit konumudur (1 << (genre_id - 1))"""
+    return pd.DataFrame({'genre_id': np.arange(1, len(GENRES) + 1, dtype=np.int64), 'name': GENRES})
+
+
+def generate_movies(start, stop, rng, quality):
+    """Filmler ve film-tür ilişkileri; her film 1-3 farklı türe sahiptir"""
+    ids = np.arange(start + 1, stop + 1, dtype=np.int64)
+    n = len(ids)
+    n_genres = rng.integers(1, 4, size=n)
+    order = np.argsort(rng.random((n, len(GENRES))), axis=1)
+    chosen = np.arange(len(GENRES))[None, :] < n_genres[:, None]
+    rows, slots = np.nonzero(chosen)
+    genre_ids = order[rows, slots] + 1
+    masks = np.zeros(n, dtype=np.int64)
+    np.bitwise_or.at(masks, rows, np.left_shift(1, genre_ids - 1).astype(np.int64))
+    labels = pd.Series(np.array(GENRES, dtype=object)[genre_ids - 1]).groupby(rows).agg(','.join)
+    movies = pd.DataFrame({
+        'movie_id': ids,
+        'title': 'Film ' + pd.Series(ids).astype(str),
+        'genre': labels.to_numpy(),
+        'genre_mask': masks,
+        'release_year': rng.integers(1980, 2024, size=n),
+        'rating': quality[start:stop],
+        'description': '',
+        'created_at': START_DATE,
+    })
+    movie_genres = pd.DataFrame({'movie_id': ids[rows], 'genre_id': genre_ids.astype(np.int64)})
+    return movies, movie_genres
+
+
+def generate_user_preferences(start, stop, rng):
+    ids = np.arange(start + 1, stop + 1, dtype=np.int64)
+    # Her kullanıcı için birbirinden farklı 3 tür
+    genres = np.argsort(rng.random((len(ids), len(GENRES))), axis=1)[:, :3]
+    genre_names = [pd.Series(np.array(GENRES)[genres[:, i]]) for i in range(3)]
+    actors = [
+        'Oyuncu ' + pd.Series(rng.integers(1, N_ACTORS + 1, size=len(ids))).astype(str)
+        for _ in range(3)
+    ]
+    return pd.DataFrame({
+        'preference_id': ids,
+        'user_id': ids,
+        'favorite_genres': genre_names[0].str.cat(genre_names[1:], sep=','),
+        'preferred_actors': actors[0].str.cat(actors[1:], sep=','),
+        'watch_time_preference': WATCH_TIME_PREFERENCES[rng.integers(0, 4, size=len(ids))],
+    })
+
+
+def unique_sorted(values):
+    """Sıralı tekil değerler; np.unique'in karma tabanlı yolundan hızlıdır"""
+    if len(values) == 0:
+        return values
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+
+def sample_movies(counts, rng, movie_cdf, movie_order, max_rounds=20):
+    """Her kullanıcıya Zipf popülerliğiyle, yerine koymadan `counts` kadar farklı film çek
+
+    Yinelenen çekilişler atılıp eksik kalan sayı kadar yeniden çekilir; her
+    turda yalnızca eksiği olan kullanıcıların kayıtları işlenir. Çok etkin
+    kullanıcılarda popüler olmayan filmlere ulaşmak uzun sürebileceği için
+    `max_rounds` turdan sonra kalan eksik, izlenmemiş filmlerden eşit
+    olasılıkla tamamlanır. Sonuç kullanıcıya, sonra filme göre sıralıdır.
+    """
+    n_movies = len(movie_order)
+    user_ids = np.arange(len(counts), dtype=np.int64)
+    done, keys = [], np.empty(0, dtype=np.int64)
+    need = counts.astype(np.int64)
+    active = need > 0
+    for _ in range(max_rounds):
+        if not need.any():
+            break
+        users = np.repeat(user_ids, need)
+        movies = movie_order[np.searchsorted(movie_cdf, rng.random(len(users)), side='right')]
+        keys = unique_sorted(np.concatenate([keys, users * n_movies + movies]))
+        need = np.where(active, counts - np.bincount(keys // n_movies, minlength=len(counts)), 0)
+        # Tamamlanan kullanıcıların kayıtları sonraki turlarda yeniden sıralanmaz
+        active = need > 0
+        short = active[keys // n_movies]
+        done.append(keys[~short])
+        keys = keys[short]
+    for user in np.nonzero(need)[0]:
+        watched = keys[keys // n_movies == user] % n_movies
+        keys = np.concatenate([keys, user * n_movies + rng.choice(
+            np.setdiff1d(np.arange(n_movies), watched), need[user], replace=False
+        )])
+    keys = np.sort(np.concatenate(done + [keys]))
+    return keys // n_movies, keys % n_movies
+
+
+def generate_watch_history(start, counts, offset, rng, movie_cdf, movie_order, quality):
+    """`start`'tan başlayan kullanıcılar için izleme kayıtları üret
+
+    Her kullanıcı için tam olarak `counts` kadar farklı film yazılır;
+    history_id değerleri `offset`'ten itibaren boşluksuzdur.
+    """
+    users, movies = sample_movies(counts, rng, movie_cdf, movie_order)
+    users += start
+    n = len(users)
+    # İzleme puanı filmin puanı etrafında dağılır
+    ratings = np.clip(np.rint(quality[movies] / 2 + rng.normal(0, 1, size=n)), 1, 5)
+    return pd.DataFrame({
+        'history_id': offset + np.arange(1, n + 1, dtype=np.int64),
+        'user_id': users + 1,
+        'movie_id': movies + 1,
+        'watch_date': START_DATE + rng.integers(0, HISTORY_SECONDS, size=n).astype('timedelta64[s]'),
+        'rating': ratings.astype(np.int64),
+        'watch_duration': rng.integers(5, 181, size=n),
+    })
+
+
+_worker_engine = None
+
+
+def _engine(db_url):
+    """Her işçi süreci tek bir veritabanı motoru kullanır"""
+    global _worker_engine
+    if _worker_engine is None:
+        from sqlalchemy import create_engine
+        _worker_engine = create_engine(db_url)
+    return _worker_engine
+
+
+def write_parquet(df, output, table, chunk_index):
+    directory = os.path.join(output, table)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'part-{chunk_index:05d}.parquet')
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, compression='zstd')
+
+
+def write_database(df, db_url, table):
+    """PostgreSQL'de COPY, diğer veritabanlarında executemany ile toplu yaz"""
+    engine = _engine(db_url)
+    if engine.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        connection = engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {table} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+                )
+            connection.commit()
+        finally:
+            connection.close()
+    else:
+        from database.database import Base
+        with engine.begin() as connection:
+            connection.execute(Base.metadata.tables[table].insert(), df.to_dict('records'))
+
+
+def write_table(df, config, table, chunk_index):
+    if config['output']:
+        write_parquet(df, config['output'], table, chunk_index)
+    else:
+        write_database(df, config['db_url'], table)
+
+
+def generate_chunk(task):
+    """Tek bir parçayı üret ve yaz; yazılan satır sayısını döndür"""
+    table, chunk_index, start, stop, config = task[:5]
+    rng = chunk_rng(config['seed'], table, chunk_index)
+    if table == 'users':
+        df = generate_users(start, stop, rng, config['password_hash'])
+    elif table == 'movies':
+        df, movie_genres = generate_movies(start, stop, rng, movie_quality(config['movies'], config['seed']))
+    elif table == 'user_preferences':
+        df = generate_user_preferences(start, stop, rng)
+    else:
+        # İzleme geçmişi parçaları kullanıcı aralıklarıdır; olay sayıları ve kimlik ofseti görevle gelir
+        counts, offset = task[5:]
+        movie_cdf, movie_order = movie_popularity(config['movies'], config['zipf_exponent'], config['seed'])
+        df = generate_watch_history(
+            start, counts, offset, rng, movie_cdf, movie_order,
+            movie_quality(config['movies'], config['seed'])
+        )
+    write_table(df, config, table, chunk_index)
+    if table == 'movies':
+        write_table(movie_genres, config, 'movie_genres', chunk_index)
+    return len(df)
+
+
+def chunk_tasks(table, total, chunk_size, config):
+    return [
+        (table, index, start, min(start + chunk_size, total), config)
+        for index, start in enumerate(range(0, total, chunk_size))
+    ]
+
+
+def watch_history_tasks(counts, chunk_size, config):
+    """Kullanıcıları, her parçaya yaklaşık `chunk_size` olay düşecek aralıklara böl"""
+    ends = np.cumsum(counts)
+    cuts = np.searchsorted(ends, np.arange(chunk_size, ends[-1], chunk_size), side='left') + 1
+    bounds = np.unique(np.concatenate([[0], cuts, [len(counts)]]))
+    return [
+        ('watch_history', index, int(start), int(stop), config,
+         counts[start:stop], int(ends[start - 1]) if start else 0)
+        for index, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:]))
+    ]
+
+
+def prepare_database(db_url):
+    """Tabloları oluştur (varsa dokunma)"""
+    from sqlalchemy import create_engine
+    from database.database import Base
+    engine = create_engine(db_url)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def reset_sequences(engine, sizes):
+    """PostgreSQL'de açık kimliklerle yazılan tabloların serial dizilerini ilerlet"""
+    from sqlalchemy import text
+    if engine.dialect.name != 'postgresql':
+        return
+    keys = {'users': 'user_id', 'movies': 'movie_id', 'user_preferences': 'preference_id',
+            'watch_history': 'history_id'}
+    with engine.begin() as connection:
+        for table, size in sizes.items():
+            if size:
+                connection.execute(
+                    text(f"SELECT setval(pg_get_serial_sequence('{table}', '{keys[table]}'), :value)"),
+                    {'value': size}
+                )
+
+
+def hash_password(password):
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto").hash(password)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Yük ve ölçek testleri için toplu sentetik veri üret")
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--movies', type=int, default=10000)
+    parser.add_argument('--events', type=int, default=10000000, help="İzleme kaydı sayısı")
+    parser.add_argument('--chunk-size', type=int, default=1000000, help="Parça başına satır")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--zipf-exponent', type=float, default=1.0, help="Film popülerliği Zipf üssü")
+    parser.add_argument('--activity-skew', type=float, default=1.0, help="Kullanıcı etkinliği log-normal sigma")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--output', help="Parquet çıktı klasörü (tablo başına alt klasör)")
+    target.add_argument('--db-url', help="Doğrudan yazılacak veritabanı (varsayılan: DATABASE_URL)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.output and not args.db_url:
+        from database.database import SQLALCHEMY_DATABASE_URL
+        args.db_url = SQLALCHEMY_DATABASE_URL
+    config = {
+        'seed': args.seed,
+        'users': args.users,
+        'movies': args.movies,
+        'zipf_exponent': args.zipf_exponent,
+        'activity_skew': args.activity_skew,
+        'output': args.output,
+        'db_url': args.db_url,
+        'password_hash': hash_password(DEFAULT_PASSWORD),
+    }
+    counts = user_event_counts(args.users, args.movies, args.events, args.activity_skew, args.seed)
+    sizes = {'users': args.users, 'movies': args.movies, 'user_preferences': args.users,
+             'watch_history': int(counts.sum())}
+
+    engine = prepare_database(args.db_url) if args.db_url else None
+
+    print("Ölçek verisi üretme başlıyor...")
+    started_all = time.perf_counter()
+    # Film parçaları movie_genres ile türlere başvurduğu için tür tablosu önce yazılır
+    write_table(generate_genres(), config, 'genres', 0)
+
+    written = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # Kullanıcılar ve filmler izleme geçmişinden önce tamamlanmalı
+        for table in TABLES:
+            if table == 'watch_history':
+                tasks = watch_history_tasks(counts, args.chunk_size, config)
+            else:
+                tasks = chunk_tasks(table, sizes[table], args.chunk_size, config)
+            started = time.perf_counter()
+            written[table] = rows = sum(executor.map(generate_chunk, tasks))
+            elapsed = time.perf_counter() - started
+            print(f"{table:>17}: {rows:>13,} satır {elapsed:>8.2f} sn {rows / max(elapsed, 1e-9):>13,.0f} satır/sn")
+
+    if engine is not None:
+        reset_sequences(engine, sizes)
+
+    elapsed = time.perf_counter() - started_all
+    total = sum(written.values())
+    print(f"Toplam: {total:,} satır, {elapsed:.2f} sn, {total / elapsed:,.0f} satır/sn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MANIFEST_NAME = 'manifest.json'
+COMPRESSION = 'zstd'
+
+
+def _manifest_path(path):
+    return os.path.join(os.path.dirname(path) or '.', MANIFEST_NAME)
+
+
+def read_manifest(directory):
+    """Bir yapıt klasörünün manifest dosyasını oku"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def record_artifact(path, schema, rows):
+    """Yapıtın şemasını ve satır sayısını klasör manifestine yaz"""
+    manifest_path = _manifest_path(path)
+    manifest = read_manifest(os.path.dirname(manifest_path))
+    manifest[os.path.basename(path)] = {
+        'rows': int(rows),
+        'columns': {field.name: str(field.type) for field in schema},
+        'compression': COMPRESSION,
+        'written_at': datetime.utcnow().isoformat(),
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+
+def write_table(df, path, export_csv=False):
+    """DataFrame'i sıkıştırılmış Parquet olarak yaz, manifesti güncelle"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, path, compression=COMPRESSION)
+    record_artifact(path, table.schema, table.num_rows)
+    if export_csv:
+        df.to_csv(os.path.splitext(path)[0] + '.csv', index=False)
+
+
+def read_table(path, columns=None):
+    """Parquet yapıtını (isteğe bağlı sütun seçimiyle) bellek eşlemeli oku
+
+    Parquet dosyası yoksa eski sürümlerin yazdığı aynı adlı CSV okunur.
+    """
+    if not os.path.exists(path):
+        csv_path = os.path.splitext(path)[0] + '.csv'
+        if os.path.exists(csv_path):
+            logging.warning(f"{path} bulunamadı, CSV yapıtı okunuyor: {csv_path}")
+            return pd.read_csv(csv_path, usecols=columns)
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+class TableWriter:
+    """Parquet yapıtını parça parça yazar; kapanışta manifesti günceller"""
+
+    def __init__(self, path, export_csv=False):
+        self.path = path
+        self.export_csv = export_csv
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema, compression=COMPRESSION)
+        self._writer.write_table(table)
+        if self.export_csv:
+            df.to_csv(os.path.splitext(self.path)[0] + '.csv', mode='w' if self.rows == 0 else 'a',
+                      header=self.rows == 0, index=False)
+        self.rows += table.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            schema = self._writer.schema
+            self._writer.close()
+            record_artifact(self.path, schema, self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,87 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from data_processing.process_data import aggregate_shard, aggregate_watch_history_sharded, in_range, user_id_ranges
+
+
+def synthetic_database(path, n_users, n_rows, n_movies=10000, seed=42):
+    """Kullanıcı etkinliği çarpık sentetik bir izleme geçmişi veritabanı oluştur"""
+    rng = np.random.default_rng(seed)
+    activity = rng.pareto(1.5, size=n_users) + 1
+    activity /= activity.sum()
+    watch_history = pd.DataFrame({
+        'history_id': np.arange(1, n_rows + 1),
+        'user_id': rng.choice(n_users, size=n_rows, p=activity) + 1,
+        'movie_id': rng.integers(1, n_movies + 1, size=n_rows),
+        'watch_date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365 * 86400, size=n_rows), unit='s'),
+        'rating': rng.integers(1, 6, size=n_rows),
+        'watch_duration': rng.integers(5, 180, size=n_rows),
+    })
+    users = pd.DataFrame({
+        'user_id': np.arange(1, n_users + 1),
+        'created_at': pd.Timestamp('2023-01-01'),
+    })
+    engine = create_engine(f'sqlite:///{path}')
+    users.to_sql('users', engine, index=False)
+    watch_history.to_sql('watch_history', engine, index=False, chunksize=100000)
+    # Parçaların aralık taraması şemadaki kapsayan user_id indeksini kullanır
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            'CREATE INDEX ix_watch_history_user_id_watch_date_cover ON watch_history '
+            '(user_id, watch_date, history_id, movie_id, rating, watch_duration)'
+        )
+    engine.dispose()
+    return users
+
+
+def shard_seconds(db_url, users, n_workers, chunk_size):
+    """Parçaları tek tek (sırayla) çalıştırıp sürelerini ölç
+
+    Yeterli çekirdekli makinede duvar saati en uzun parçanın süresine yaklaşır;
+    parça süreleri toplamı ise parçaların toplam okuduğu veriyi gösterir.
+    """
+    seconds = []
+    for shard in user_id_ranges(users['user_id'], n_workers):
+        started = time.perf_counter()
+        aggregate_shard(db_url, shard, users.loc[in_range(users['user_id'], shard), ['user_id']],
+                        chunk_size, build_interactions=False)
+        seconds.append(time.perf_counter() - started)
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parçalı özellik toplamanın işçi sayısına göre verimi")
+    parser.add_argument('--workers', default='1,2,4,8', help="Virgülle ayrılmış işçi sayıları")
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.db')
+        users = synthetic_database(path, args.users, args.rows)
+
+        db_url = f'sqlite:///{path}'
+        print(f"{'işçi':>6} {'süre (sn)':>10} {'satır/sn':>12} {'hızlanma':>9} "
+              f"{'en uzun parça':>14} {'parça toplamı':>14}")
+        baseline = None
+        for n_workers in [int(count) for count in args.workers.split(',')]:
+            started = time.perf_counter()
+            aggregate_watch_history_sharded(
+                users, n_workers, args.chunk_size, build_interactions=False, db_url=db_url
+            )
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            shards = shard_seconds(db_url, users, n_workers, args.chunk_size)
+            print(f"{n_workers:>6} {elapsed:>10.2f} {args.rows / elapsed:>12,.0f} {baseline / elapsed:>8.2f}x "
+                  f"{max(shards):>14.2f} {sum(shards):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from data_processing.artifacts import read_table, write_table
+
+STATS_PATH = 'processed_data/user_watch_stats.parquet'
+STATE_PATH = 'processed_data/pipeline_state.json'
+
+STAT_COLUMNS = ['event_count', 'rating_sum', 'rating_count', 'duration_sum', 'duration_count']
+
+
+def load_feature_state(stats_path=STATS_PATH, state_path=STATE_PATH):
+    """Önceki çalıştırmanın kullanıcı toplamlarını ve su seviyesini oku; yoksa None"""
+    if not (os.path.exists(stats_path) and os.path.exists(state_path)):
+        return None
+    with open(state_path) as f:
+        state = json.load(f)
+    state['stats'] = read_table(stats_path)
+    return state
+
+
+def save_feature_state(watch_stats, watermark, scaler_sums, has_interactions,
+                       stats_path=STATS_PATH, state_path=STATE_PATH):
+    """Kullanıcı toplamlarını, su seviyesini ve ölçekleyici toplamlarını kaydet
+
+    Durum dosyası en son yazılır; yarıda kalan bir çalıştırma önceki su
+    seviyesini bozmaz ve bir sonraki çalıştırma aynı kayıtları yeniden işler.
+    """
+    write_table(watch_stats, stats_path)
+    state = {
+        'watermark': watermark,
+        'scaler': {key: np.asarray(value).tolist() for key, value in scaler_sums.items()},
+        'has_interactions': has_interactions,
+        'updated_at': datetime.utcnow().isoformat(),
+    }
+    with open(state_path, 'w') as f:
+        json.dump(state, f, indent=2)
+
+
+def merge_watch_stats(previous, delta):
+    """Yeniden okunan kullanıcıların toplamlarını önceki toplamların yerine koy
+
+    Artımlı çalıştırmada kaydı değişen kullanıcıların tüm geçmişi okunduğu için
+    `delta` içinde kaydı olan kullanıcıların toplamları eksiksizdir; diğerleri
+    önceki çalıştırmadan aynen alınır. Sonuç `delta` içindeki (güncel)
+    kullanıcı kümesini içerir; önceki çalıştırmada olmayan kullanıcılar sıfırdan başlar.
+    """
+    previous = previous.set_index('user_id')[STAT_COLUMNS].reindex(delta['user_id']).fillna(0)
+    reread = delta['event_count'].to_numpy() > 0
+    merged = delta.copy()
+    for column in STAT_COLUMNS:
+        merged[column] = np.where(
+            reread, merged[column].to_numpy(), previous[column].to_numpy()
+        ).astype(delta[column].dtype)
+    return merged
+
+
+def advance_watermark(watermark, seen):
+    """Su seviyesini yeni görülen en büyük history_id ve watch_date değerine ilerlet"""
+    if watermark is None:
+        return seen
+    return {
+        'history_id': max(watermark['history_id'], seen['history_id']),
+        'watch_date': max(filter(None, [watermark['watch_date'], seen['watch_date']]), default=None),
+    }
+
+
+def column_sums(values):
+    """Ölçekleyici için sütun bazında sayı, toplam ve kareler toplamı (NaN'lar atlanır)"""
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    return {
+        'count': present.sum(axis=0).astype(np.float64),
+        'sum': np.where(present, values, 0).sum(axis=0),
+        'sum_sq': np.where(present, values ** 2, 0).sum(axis=0),
+    }
+
+
+def update_column_sums(sums, removed, added):
+    """Çıkan satırların katkısını düş, gelen satırlarınkini ekle"""
+    removed, added = column_sums(removed), column_sums(added)
+    return {key: np.asarray(sums[key]) - removed[key] + added[key] for key in sums}
+
+
+def scaler_from_sums(sums):
+    """Sütun toplamlarından StandardScaler ile aynı ortalama/ölçeği kur"""
+    count = np.asarray(sums['count'], dtype=np.float64)
+    safe_count = np.maximum(count, 1)
+    mean = np.asarray(sums['sum']) / safe_count
+    var = np.maximum(np.asarray(sums['sum_sq']) / safe_count - mean ** 2, 0)
+    scale = np.sqrt(var)
+    scale[scale == 0] = 1.0
+
+    scaler = StandardScaler()
+    scaler.mean_ = mean
+    scaler.var_ = var
+    scaler.scale_ = scale
+    scaler.n_samples_seen_ = count.astype(np.int64)
+    scaler.n_features_in_ = len(mean)
+    return scaler
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+INTERACTIONS_PATH = 'processed_data/interactions.npz'
+
+
+def build_interaction_matrix(watch_history_df, user_ids, movie_ids):
+    """Kullanıcı×film puan ve izleme süresi matrislerini CSR olarak oluştur
+
+    Satırlar sıralı `user_ids`, sütunlar sıralı `movie_ids` dizisine göre
+    indekslenir; böylece kimlik↔indeks eşlemesi çalıştırmalar arasında
+    kararlıdır. Aynı film birden fazla kez izlendiyse en son puan tutulur,
+    süreler toplanır. İki matris aynı seyreklik yapısını paylaşır.
+    """
+    user_ids = np.unique(np.asarray(user_ids, dtype=np.int64))
+    movie_ids = np.unique(np.asarray(movie_ids, dtype=np.int64))
+
+    history = watch_history_df[['user_id', 'movie_id', 'watch_date', 'rating', 'watch_duration']]
+    history = history.dropna(subset=['user_id', 'movie_id'])
+    history = history[
+        history['user_id'].isin(user_ids) & history['movie_id'].isin(movie_ids)
+    ].sort_values('watch_date', kind='stable')
+
+    grouped = history.groupby(['user_id', 'movie_id'], sort=True).agg(
+        rating=('rating', 'last'),
+        watch_duration=('watch_duration', 'sum')
+    ).reset_index()
+
+    rows = np.searchsorted(user_ids, grouped['user_id'].to_numpy(dtype=np.int64))
+    cols = np.searchsorted(movie_ids, grouped['movie_id'].to_numpy(dtype=np.int64)).astype(np.int32)
+    indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+    np.add.at(indptr, rows + 1, 1)
+    indptr = np.cumsum(indptr)
+
+    shape = (len(user_ids), len(movie_ids))
+    rating = grouped['rating'].fillna(0).to_numpy(dtype=np.float32)
+    duration = grouped['watch_duration'].fillna(0).to_numpy(dtype=np.float32)
+    return {
+        'user_ids': user_ids,
+        'movie_ids': movie_ids,
+        'rating': sparse.csr_matrix((rating, cols, indptr), shape=shape),
+        'duration': sparse.csr_matrix((duration, cols, indptr), shape=shape),
+    }
+
+
+def merge_interactions(interactions, watch_history_df, user_ids, movie_ids):
+    """Mevcut etkileşim matrisinde yeniden okunan kullanıcıların satırlarını değiştir
+
+    `watch_history_df` kaydı değişen kullanıcıların tüm geçmişini içerir; bu
+    kullanıcıların önceki çiftleri atılır, diğerleri aynen korunur. Sonuç, tüm
+    geçmişten `build_interaction_matrix` ile oluşturulan matrisle aynıdır.
+    """
+    rating = interactions['rating'].tocoo()
+    duration = interactions['duration'].tocoo()
+    previous = pd.DataFrame({
+        'user_id': interactions['user_ids'][rating.row],
+        'movie_id': interactions['movie_ids'][rating.col],
+        'watch_date': pd.Timestamp.min,
+        'rating': rating.data,
+        'watch_duration': duration.data,
+    })
+    previous = previous[~previous['user_id'].isin(watch_history_df['user_id'].unique())]
+    history = pd.concat([previous, watch_history_df], ignore_index=True)
+    return build_interaction_matrix(history, user_ids, movie_ids)
+
+
+class InteractionAccumulator:
+    """İzleme geçmişi parçalarından etkileşim matrisi için sayısal dizileri biriktirir
+
+    Parçaların tamamı DataFrame olarak tutulmaz; yalnızca matrisin ihtiyaç
+    duyduğu sütunlar sıkıştırılmış NumPy dizileri olarak saklanır.
+    """
+
+    def __init__(self):
+        self._parts = []
+
+    def add(self, chunk):
+        self._parts.append((
+            chunk['user_id'].to_numpy(dtype=np.int64),
+            chunk['movie_id'].to_numpy(dtype=np.int64),
+            chunk['watch_date'].to_numpy(dtype='datetime64[ns]'),
+            chunk['rating'].to_numpy(dtype=np.float32),
+            chunk['watch_duration'].to_numpy(dtype=np.float32),
+        ))
+
+    def extend(self, other):
+        """Başka bir biriktiricinin (örneğin bir parçanın) dizilerini ekle"""
+        self._parts.extend(other._parts)
+
+    def to_frame(self):
+        columns = ['user_id', 'movie_id', 'watch_date', 'rating', 'watch_duration']
+        if not self._parts:
+            return pd.DataFrame({column: [] for column in columns})
+        return pd.DataFrame({
+            column: np.concatenate([part[i] for part in self._parts])
+            for i, column in enumerate(columns)
+        })
+
+
+def save_interactions(interactions, path=INTERACTIONS_PATH):
+    """Etkileşim matrislerini tek bir .npz dosyasına kaydet"""
+    rating = interactions['rating']
+    np.savez(
+        path,
+        user_ids=interactions['user_ids'],
+        movie_ids=interactions['movie_ids'],
+        indptr=rating.indptr,
+        indices=rating.indices,
+        rating=rating.data,
+        duration=interactions['duration'].data,
+    )
+
+
+def load_interactions(path=INTERACTIONS_PATH):
+    """Kaydedilmiş etkileşim matrislerini yükle"""
+    with np.load(path) as data:
+        user_ids = data['user_ids']
+        movie_ids = data['movie_ids']
+        shape = (len(user_ids), len(movie_ids))
+        structure = (data['indices'], data['indptr'])
+        return {
+            'user_ids': user_ids,
+            'movie_ids': movie_ids,
+            'rating': sparse.csr_matrix((data['rating'], *structure), shape=shape),
+            'duration': sparse.csr_matrix((data['duration'], *structure), shape=shape),
+        }
+
+
+def interactions_to_history(interactions, user_ids=None):
+    """Etkileşim matrisinin satırlarını (user_id, movie_id, rating) tablosuna çevir"""
+    rating = interactions['rating']
+    if user_ids is not None:
+        # Artefaktta bulunmayan kullanıcı kimlikleri atlanır
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        positions = np.searchsorted(interactions['user_ids'], user_ids)
+        found = positions < len(interactions['user_ids'])
+        found[found] = interactions['user_ids'][positions[found]] == user_ids[found]
+        positions = positions[found]
+        rating = rating[positions]
+        row_users = interactions['user_ids'][positions]
+    else:
+        row_users = interactions['user_ids']
+    coo = rating.tocoo()
+    return pd.DataFrame({
+        'user_id': row_users[coo.row],
+        'movie_id': interactions['movie_ids'][coo.col],
+        'rating': coo.data,
+    })
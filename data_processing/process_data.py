@@ -1,12 +1,29 @@
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
+from sqlalchemy import DateTime, bindparam, create_engine, text
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
+import argparse
 import logging
 from datetime import datetime
 import os
+import joblib
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from database import analytics
+from database.database import engine
+from database.genres import genre_flags
+from data_processing.artifacts import write_table
+from data_processing.profiling import REPORT_DIR, RunProfiler, frame_rows
+from data_processing.interactions import (
+    INTERACTIONS_PATH, InteractionAccumulator, build_interaction_matrix, load_interactions,
+    merge_interactions, save_interactions
+)
+from data_processing.feature_state import (
+    advance_watermark, column_sums, load_feature_state, merge_watch_stats, save_feature_state,
+    scaler_from_sums, update_column_sums
+)
 
 # Logging ayarları
 logging.basicConfig(
@@ -15,38 +32,173 @@ logging.basicConfig(
     filename='data_processing.log'
 )
 
-# Veritabanı bağlantısı
-engine = create_engine('sqlite:///netflix_recommender.db')
+# Özellik hesabında kullanılan sütunlar; şifre, e-posta, açıklama gibi alanlar okunmaz
+USERS_QUERY = 'SELECT user_id, created_at FROM users'
+MOVIES_QUERY = 'SELECT movie_id, genre_mask, release_year, rating FROM movies'
+GENRES_QUERY = 'SELECT genre_id, name FROM genres'
+WATCH_HISTORY_QUERY = 'SELECT history_id, user_id, movie_id, watch_date, rating, watch_duration FROM watch_history'
+PREFERENCES_QUERY = (
+    'SELECT user_id, favorite_genres, preferred_actors, watch_time_preference FROM user_preferences'
+)
+
+WATCH_HISTORY_DTYPES = {
+    'history_id': 'int64',
+    'user_id': 'Int64',
+    'movie_id': 'Int64',
+    'rating': 'float32',
+    'watch_duration': 'float32'
+}
+
+# Analitik arka uçta kullanıcı toplamları doğrudan SQL ile hesaplanır
+WATCH_HISTORY_AGGREGATE_QUERY = """
+    SELECT user_id,
+           COUNT(*) AS event_count,
+           COALESCE(SUM(rating), 0) AS rating_sum,
+           COUNT(rating) AS rating_count,
+           COALESCE(SUM(watch_duration), 0) AS duration_sum,
+           COUNT(watch_duration) AS duration_count
+    FROM watch_history
+    WHERE user_id IS NOT NULL AND movie_id IS NOT NULL{condition}
+    GROUP BY user_id
+"""
+WATCH_HISTORY_WATERMARK_QUERY = """
+    SELECT MAX(history_id) AS history_id, MAX(watch_date) AS watch_date
+    FROM watch_history
+    WHERE user_id IS NOT NULL AND movie_id IS NOT NULL{condition}
+"""
 
-def load_data():
-    """Veritabanından verileri yükle"""
+# Artımlı çalıştırmada su seviyesinden sonra eklenen ya da güncellenen (watch_date'i
+# ilerleyen) kaydı olan kullanıcıların tüm geçmişi yeniden okunur
+CHANGED_USERS_CONDITION = (
+    'user_id IN (SELECT user_id FROM watch_history '
+    'WHERE history_id > {history_id} OR watch_date > {watch_date})'
+)
+
+# İzleme geçmişi bu kadar satırlık parçalar halinde okunur
+DEFAULT_CHUNK_SIZE = 100000
+
+USER_NUMERIC_COLUMNS = ['avg_rating', 'watch_count', 'avg_duration', 'total_duration']
+
+def watermark_params(watermark):
+    """Su seviyesini sorgu parametrelerine çevir; tarih yoksa tüm tarihli kayıtlar değişmiş sayılır"""
+    watch_date = pd.Timestamp(watermark['watch_date']) if watermark.get('watch_date') else pd.Timestamp.min
+    return int(watermark['history_id']), watch_date.to_pydatetime()
+
+def stream_watch_history(chunk_size=DEFAULT_CHUNK_SIZE, watermark=None, shard=None, bind=None):
+    """İzleme geçmişini sunucu taraflı imleçle parça parça oku
+    
+    `watermark` verilirse yalnızca bu su seviyesinden sonra kaydı eklenen ya da
+    güncellenen kullanıcıların (tüm) geçmişi okunur.
+    `shard` (alt sınır, üst sınır) verilirse yalnızca `alt <= user_id < üst` olan kayıtlar
+    okunur; None sınır açık uçtur. Aralık, okunan sütunları içeren user_id indeksinden taranır.
+    """
+    conditions, params = [], {}
+    if watermark is not None:
+        conditions.append(CHANGED_USERS_CONDITION.format(
+            history_id=':after_history_id', watch_date=':after_watch_date'
+        ))
+        params['after_history_id'], params['after_watch_date'] = watermark_params(watermark)
+    if shard is not None:
+        user_lo, user_hi = shard
+        if user_lo is not None:
+            conditions.append('user_id >= :user_lo')
+            params['user_lo'] = int(user_lo)
+        if user_hi is not None:
+            conditions.append('user_id < :user_hi')
+            params['user_hi'] = int(user_hi)
+    query = WATCH_HISTORY_QUERY
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query = text(query)
+    if watermark is not None:
+        # Tarih, sütunla aynı biçimde karşılaştırılsın diye DateTime olarak bağlanır
+        query = query.bindparams(bindparam('after_watch_date', type_=DateTime))
+    with (bind or engine).connect() as connection:
+        connection = connection.execution_options(stream_results=True)
+        for chunk in pd.read_sql_query(
+            query,
+            connection,
+            params=params or None,
+            chunksize=chunk_size,
+            dtype=WATCH_HISTORY_DTYPES,
+            parse_dates=['watch_date']
+        ):
+            yield chunk
+
+def duckdb_condition(watermark):
+    """DuckDB sorguları için değişen kullanıcı koşulu ve parametreleri"""
+    if watermark is None:
+        return '', []
+    condition = CHANGED_USERS_CONDITION.format(history_id='?', watch_date='?')
+    return condition, list(watermark_params(watermark))
+
+def stream_watch_history_duckdb(chunk_size=DEFAULT_CHUNK_SIZE, watermark=None):
+    """İzleme geçmişini analitik (DuckDB) anlık görüntüden sütunsal parçalar halinde oku"""
+    condition, params = duckdb_condition(watermark)
+    query = WATCH_HISTORY_QUERY + (' WHERE ' + condition if condition else '')
+    for chunk in analytics.iter_frames(query, params, chunk_size):
+        yield chunk.astype(WATCH_HISTORY_DTYPES)
+
+def read_table_query(query, **kwargs):
+    """Boyut tablolarını yapılandırılmış arka uçtan oku"""
+    if analytics.use_duckdb():
+        df = analytics.read_frame(query)
+        dtype = kwargs.get('dtype')
+        return df.astype(dtype) if dtype else df
+    return pd.read_sql_query(query, engine, **kwargs)
+
+def load_data(chunk_size=DEFAULT_CHUNK_SIZE, watermark=None):
+    """Veritabanından verileri yükle
+    
+    Kullanıcı, film ve tercih tabloları yalnızca gerekli sütunlarla okunur.
+    İzleme geçmişi belleğe alınmaz; parça üreten bir akış olarak döndürülür.
+    """
     try:
         # Kullanıcı verilerini yükle
-        users_df = pd.read_sql('SELECT * FROM users', engine)
+        users_df = read_table_query(
+            USERS_QUERY, dtype={'user_id': 'int64'}, parse_dates=['created_at']
+        )
         
-        # Film verilerini yükle
-        movies_df = pd.read_sql('SELECT * FROM movies', engine)
+        # Film verilerini yükle; türler bit maskesi olarak okunur
+        movies_df = read_table_query(
+            MOVIES_QUERY, dtype={'movie_id': 'int64', 'genre_mask': 'int64', 'rating': 'float64'}
+        )
+        # Tür sütunları veritabanının sıralama kuralından bağımsız olarak ada göre sıralanır
+        genres_df = read_table_query(GENRES_QUERY, dtype={'genre_id': 'int64'})
+        genres_df = genres_df.sort_values('name', ignore_index=True)
         
-        # İzleme geçmişini yükle
-        watch_history_df = pd.read_sql('SELECT * FROM watch_history', engine)
+        # İzleme geçmişi akışı
+        if analytics.use_duckdb():
+            watch_history_chunks = stream_watch_history_duckdb(chunk_size, watermark)
+        else:
+            watch_history_chunks = stream_watch_history(chunk_size, watermark)
         
         # Kullanıcı tercihlerini yükle
-        preferences_df = pd.read_sql('SELECT * FROM user_preferences', engine)
+        preferences_df = read_table_query(PREFERENCES_QUERY)
         
         logging.info("Veriler başarıyla yüklendi")
-        return users_df, movies_df, watch_history_df, preferences_df
+        return users_df, movies_df, watch_history_chunks, preferences_df, genres_df
     
     except Exception as e:
         logging.error(f"Veri yükleme hatası: {str(e)}")
         raise
 
-def clean_data(users_df, movies_df, watch_history_df, preferences_df):
+def clean_watch_history(chunks):
+    """İzleme geçmişi parçalarını temizle; eksik değerleri akış sonunda raporla"""
+    missing_values = None
+    for chunk in chunks:
+        chunk_missing = chunk.isnull().sum()
+        missing_values = chunk_missing if missing_values is None else missing_values + chunk_missing
+        yield chunk.dropna(subset=['user_id', 'movie_id'])
+    if missing_values is not None and missing_values.any():
+        logging.warning(f"watch_history tablosunda eksik değerler bulundu:\n{missing_values}")
+
+def clean_data(users_df, movies_df, watch_history_chunks, preferences_df):
     """Verileri temizle ve dönüştür"""
     try:
         # Eksik değerleri kontrol et
         logging.info("Eksik değerler kontrol ediliyor...")
-        for df, name in [(users_df, 'users'), (movies_df, 'movies'), 
-                        (watch_history_df, 'watch_history'), (preferences_df, 'preferences')]:
+        for df, name in [(users_df, 'users'), (movies_df, 'movies'), (preferences_df, 'preferences')]:
             missing_values = df.isnull().sum()
             if missing_values.any():
                 logging.warning(f"{name} tablosunda eksik değerler bulundu:\n{missing_values}")
@@ -58,12 +210,10 @@ def clean_data(users_df, movies_df, watch_history_df, preferences_df):
         # Film verilerini temizle
         movies_df['release_year'] = pd.to_numeric(movies_df['release_year'], errors='coerce')
         movies_df['rating'] = pd.to_numeric(movies_df['rating'], errors='coerce')
-        movies_df['genre'] = movies_df['genre'].fillna('Bilinmiyor')
+        movies_df['genre_mask'] = movies_df['genre_mask'].fillna(0).astype(np.int64)
         
-        # İzleme geçmişini temizle
-        watch_history_df['watch_date'] = pd.to_datetime(watch_history_df['watch_date'])
-        watch_history_df['rating'] = pd.to_numeric(watch_history_df['rating'], errors='coerce')
-        watch_history_df['watch_duration'] = pd.to_numeric(watch_history_df['watch_duration'], errors='coerce')
+        # İzleme geçmişi parçaları okunurken temizlenir
+        watch_history_chunks = clean_watch_history(watch_history_chunks)
         
         # Kullanıcı tercihlerini temizle
         preferences_df['favorite_genres'] = preferences_df['favorite_genres'].fillna('')
@@ -71,28 +221,210 @@ def clean_data(users_df, movies_df, watch_history_df, preferences_df):
         preferences_df['watch_time_preference'] = preferences_df['watch_time_preference'].fillna('evening')
         
         logging.info("Veri temizleme tamamlandı")
-        return users_df, movies_df, watch_history_df, preferences_df
+        return users_df, movies_df, watch_history_chunks, preferences_df
     
     except Exception as e:
         logging.error(f"Veri temizleme hatası: {str(e)}")
         raise
 
-def feature_engineering(users_df, movies_df, watch_history_df, preferences_df):
+def aggregate_watch_history(watch_history_chunks, users_df, build_interactions=True):
+    """İzleme geçmişi parçalarını kullanıcı bazında yürüyen toplamlara katla
+    
+    Bellek kullanımı olay sayısıyla değil kullanıcı sayısıyla orantılıdır.
+    İstenirse etkileşim matrisi için sıkıştırılmış sayısal diziler de biriktirilir.
+    Görülen en büyük history_id ve watch_date su seviyesi olarak döndürülür.
+    """
+    try:
+        user_ids = np.unique(users_df['user_id'].to_numpy(dtype=np.int64))
+        n_users = len(user_ids)
+        event_count = np.zeros(n_users, dtype=np.int64)
+        rating_sum = np.zeros(n_users)
+        rating_count = np.zeros(n_users, dtype=np.int64)
+        duration_sum = np.zeros(n_users)
+        duration_count = np.zeros(n_users, dtype=np.int64)
+        accumulator = InteractionAccumulator() if build_interactions else None
+        n_rows = 0
+        watermark = {'history_id': 0, 'watch_date': None}
+        
+        for chunk in watch_history_chunks:
+            n_rows += len(chunk)
+            if len(chunk):
+                watermark = advance_watermark(watermark, {
+                    'history_id': int(chunk['history_id'].max()),
+                    'watch_date': None if chunk['watch_date'].isna().all()
+                    else chunk['watch_date'].max().isoformat()
+                })
+            if accumulator is not None:
+                accumulator.add(chunk)
+            
+            chunk_users = chunk['user_id'].to_numpy(dtype=np.int64)
+            positions = np.minimum(np.searchsorted(user_ids, chunk_users), max(n_users - 1, 0))
+            # users tablosunda olmayan kullanıcıların kayıtları atlanır
+            known = user_ids[positions] == chunk_users if n_users else np.zeros(len(chunk), dtype=bool)
+            positions = positions[known]
+            ratings = chunk['rating'].to_numpy(dtype=np.float64)[known]
+            durations = chunk['watch_duration'].to_numpy(dtype=np.float64)[known]
+            
+            np.add.at(event_count, positions, 1)
+            has_rating = ~np.isnan(ratings)
+            np.add.at(rating_sum, positions[has_rating], ratings[has_rating])
+            np.add.at(rating_count, positions[has_rating], 1)
+            has_duration = ~np.isnan(durations)
+            np.add.at(duration_sum, positions[has_duration], durations[has_duration])
+            np.add.at(duration_count, positions[has_duration], 1)
+        
+        watch_stats = pd.DataFrame({
+            'user_id': user_ids,
+            'event_count': event_count,
+            'rating_sum': rating_sum,
+            'rating_count': rating_count,
+            'duration_sum': duration_sum,
+            'duration_count': duration_count
+        })
+        logging.info(f"İzleme geçmişi toplandı: {n_rows} kayıt, {n_users} kullanıcı")
+        return watch_stats, accumulator, watermark
+    
+    except Exception as e:
+        logging.error(f"İzleme geçmişi toplama hatası: {str(e)}")
+        raise
+
+def watch_features(watch_stats):
+    """Kullanıcı izleme özelliklerini yürüyen toplamlardan hesapla
+    
+    Hiç izleme kaydı olmayan kullanıcılar sonuçta yer almaz; birleştirmede özellikleri boş kalır.
+    """
+    watched = watch_stats[watch_stats['event_count'] > 0]
+    return pd.DataFrame({
+        'user_id': watched['user_id'],
+        'avg_rating': watched['rating_sum'] / watched['rating_count'].replace(0, np.nan),
+        'watch_count': watched['rating_count'].astype(np.float64),
+        'avg_duration': watched['duration_sum'] / watched['duration_count'].replace(0, np.nan),
+        'total_duration': watched['duration_sum']
+    })
+
+def aggregate_watch_history_duckdb(users_df, chunk_size=DEFAULT_CHUNK_SIZE, watermark=None,
+                                   build_interactions=True):
+    """Kullanıcı toplamlarını analitik (DuckDB) anlık görüntüde tek GROUP BY ile hesapla
+    
+    Tarama ve toplama sütunsal ve süreç içinde paralel yapılır; ham kayıtlar
+    yalnızca etkileşim matrisi istendiğinde akış halinde okunur.
+    """
+    try:
+        condition, params = duckdb_condition(watermark)
+        condition = ' AND ' + condition if condition else ''
+        aggregated = analytics.read_frame(
+            WATCH_HISTORY_AGGREGATE_QUERY.format(condition=condition), params
+        ).set_index('user_id')
+        user_ids = np.unique(users_df['user_id'].to_numpy(dtype=np.int64))
+        aggregated = aggregated.reindex(user_ids).fillna(0)
+        watch_stats = pd.DataFrame({
+            'user_id': user_ids,
+            'event_count': aggregated['event_count'].to_numpy(dtype=np.int64),
+            'rating_sum': aggregated['rating_sum'].to_numpy(dtype=np.float64),
+            'rating_count': aggregated['rating_count'].to_numpy(dtype=np.int64),
+            'duration_sum': aggregated['duration_sum'].to_numpy(dtype=np.float64),
+            'duration_count': aggregated['duration_count'].to_numpy(dtype=np.int64)
+        })
+        
+        max_history_id, max_watch_date = analytics.read_frame(
+            WATCH_HISTORY_WATERMARK_QUERY.format(condition=condition), params
+        ).iloc[0]
+        seen = {
+            'history_id': 0 if pd.isna(max_history_id) else int(max_history_id),
+            'watch_date': None if pd.isna(max_watch_date) else pd.Timestamp(max_watch_date).isoformat()
+        }
+        
+        accumulator = None
+        if build_interactions:
+            accumulator = InteractionAccumulator()
+            for chunk in clean_watch_history(stream_watch_history_duckdb(chunk_size, watermark)):
+                accumulator.add(chunk)
+        
+        logging.info(f"İzleme geçmişi DuckDB'de toplandı: {int(watch_stats['event_count'].sum())} kayıt")
+        return watch_stats, accumulator, seen
+    
+    except Exception as e:
+        logging.error(f"DuckDB toplama hatası: {str(e)}")
+        raise
+
+def user_id_ranges(user_ids, n_shards):
+    """Kullanıcı kimliklerini eşit kullanıcı sayılı, bitişik (alt, üst) aralıklara böl
+
+    İlk aralığın alt, son aralığın üst sınırı açıktır (None); böylece
+    kullanıcı tablosunda olmayan kimliklerin kayıtları da bir parçaya düşer.
+    """
+    user_ids = np.unique(np.asarray(user_ids, dtype=np.int64))
+    parts = [part for part in np.array_split(user_ids, n_shards) if len(part)]
+    bounds = [None] + [int(part[0]) for part in parts[1:]] + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def in_range(user_ids, shard):
+    user_lo, user_hi = shard
+    mask = pd.Series(True, index=user_ids.index)
+    if user_lo is not None:
+        mask &= user_ids >= user_lo
+    if user_hi is not None:
+        mask &= user_ids < user_hi
+    return mask
+
+def aggregate_shard(db_url, shard, users_df, chunk_size=DEFAULT_CHUNK_SIZE, watermark=None,
+                    build_interactions=True):
+    """Tek bir user_id aralığının izleme geçmişini kendi bağlantısıyla temizle ve topla"""
+    shard_engine = create_engine(db_url)
+    try:
+        chunks = clean_watch_history(
+            stream_watch_history(chunk_size, watermark, shard=shard, bind=shard_engine)
+        )
+        return aggregate_watch_history(chunks, users_df, build_interactions)
+    finally:
+        shard_engine.dispose()
+
+def aggregate_watch_history_sharded(users_df, n_workers, chunk_size=DEFAULT_CHUNK_SIZE, watermark=None,
+                                    build_interactions=True, db_url=None):
+    """İzleme geçmişini bitişik user_id aralıklarına bölüp süreç havuzunda topla
+    
+    Her parça kendi sorgusuyla yalnızca kendi aralığındaki kayıtları okur;
+    aralık koşulu okunan sütunları içeren user_id indeksinden taranır, tabloyu
+    her işçi baştan sona taramaz. Kullanıcı kümeleri ayrık olduğu için parça
+    sonuçları kayıtlar yeniden dağıtılmadan uç uca eklenir.
+    """
+    try:
+        db_url = db_url or engine.url.render_as_string(hide_password=False)
+        shards = user_id_ranges(users_df['user_id'], n_workers)
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [
+                executor.submit(
+                    aggregate_shard, db_url, shard, users_df.loc[in_range(users_df['user_id'], shard), ['user_id']],
+                    chunk_size, watermark, build_interactions
+                )
+                for shard in shards
+            ]
+            results = [future.result() for future in futures]
+        
+        watch_stats = pd.concat([result[0] for result in results], ignore_index=True)
+        watch_stats = watch_stats.sort_values('user_id', kind='stable').reset_index(drop=True)
+        accumulator = None
+        if build_interactions:
+            accumulator = InteractionAccumulator()
+            for result in results:
+                accumulator.extend(result[1])
+        watermark = reduce(advance_watermark, [result[2] for result in results])
+        logging.info(f"İzleme geçmişi {len(shards)} user_id aralığında toplandı")
+        return watch_stats, accumulator, watermark
+    
+    except Exception as e:
+        logging.error(f"Parçalı toplama hatası: {str(e)}")
+        raise
+
+def feature_engineering(users_df, movies_df, watch_stats, preferences_df, genres_df):
     """Özellik mühendisliği yap"""
     try:
         # Kullanıcı özellikleri
         user_features = pd.DataFrame()
         user_features['user_id'] = users_df['user_id']
         
-        # İzleme istatistikleri
-        watch_stats = watch_history_df.groupby('user_id').agg({
-            'rating': ['mean', 'count'],
-            'watch_duration': ['mean', 'sum']
-        }).reset_index()
-        watch_stats.columns = ['user_id', 'avg_rating', 'watch_count', 'avg_duration', 'total_duration']
-        
         # Kullanıcı özelliklerini birleştir
-        user_features = user_features.merge(watch_stats, on='user_id', how='left')
+        user_features = user_features.merge(watch_features(watch_stats), on='user_id', how='left')
         
         # Film özellikleri
         movie_features = pd.DataFrame()
@@ -100,9 +432,13 @@ def feature_engineering(users_df, movies_df, watch_history_df, preferences_df):
         movie_features['release_year'] = movies_df['release_year']
         movie_features['rating'] = movies_df['rating']
         
-        # Tür özellikleri
-        genre_dummies = movies_df['genre'].str.get_dummies(sep=',')
-        movie_features = pd.concat([movie_features, genre_dummies], axis=1)
+        # Tür özellikleri: bit maskesinden metin ayrıştırmadan tek vektörel işlemle
+        flags = pd.DataFrame(
+            genre_flags(movies_df['genre_mask'].to_numpy(), genres_df['genre_id'].to_numpy()),
+            columns=genres_df['name'].tolist(),
+            index=movie_features.index
+        )
+        movie_features = pd.concat([movie_features, flags], axis=1)
         
         logging.info("Özellik mühendisliği tamamlandı")
         return user_features, movie_features
@@ -111,13 +447,21 @@ def feature_engineering(users_df, movies_df, watch_history_df, preferences_df):
         logging.error(f"Özellik mühendisliği hatası: {str(e)}")
         raise
 
-def normalize_features(user_features, movie_features):
-    """Özellikleri normalizasyon yap"""
+def normalize_features(user_features, movie_features, user_scaler=None):
+    """Özellikleri normalizasyon yap
+    
+    `user_scaler` verilirse kullanıcı özellikleri yeniden uydurulmadan bu ölçekleyiciyle dönüştürülür.
+    """
     try:
         # Kullanıcı özelliklerini normalizasyon
-        user_scaler = StandardScaler()
-        user_numeric_cols = ['avg_rating', 'watch_count', 'avg_duration', 'total_duration']
-        user_features[user_numeric_cols] = user_scaler.fit_transform(user_features[user_numeric_cols])
+        user_numeric_cols = USER_NUMERIC_COLUMNS
+        if user_scaler is None:
+            user_scaler = StandardScaler()
+            user_features[user_numeric_cols] = user_scaler.fit_transform(user_features[user_numeric_cols])
+        else:
+            user_features[user_numeric_cols] = (
+                (user_features[user_numeric_cols] - user_scaler.mean_) / user_scaler.scale_
+            )
         
         # Film özelliklerini normalizasyon
         movie_scaler = StandardScaler()
@@ -125,21 +469,32 @@ def normalize_features(user_features, movie_features):
         movie_features[movie_numeric_cols] = movie_scaler.fit_transform(movie_features[movie_numeric_cols])
         
         logging.info("Özellik normalizasyonu tamamlandı")
-        return user_features, movie_features
+        return user_features, movie_features, user_scaler
     
     except Exception as e:
         logging.error(f"Özellik normalizasyonu hatası: {str(e)}")
         raise
 
-def save_processed_data(user_features, movie_features):
+def save_processed_data(user_features, movie_features, user_scaler=None, export_csv=False):
     """İşlenmiş verileri kaydet"""
     try:
         # processed_data klasörünü oluştur
         os.makedirs('processed_data', exist_ok=True)
         
-        # İşlenmiş verileri CSV olarak kaydet
-        user_features.to_csv('processed_data/user_features.csv', index=False)
-        movie_features.to_csv('processed_data/movie_features.csv', index=False)
+        # Sütun tipleri sabitlenir: kimlikler int64, özellikler float64, tür bayrakları int8
+        user_features = user_features.astype({'user_id': 'int64'})
+        genre_columns = movie_features.columns.drop(['movie_id', 'release_year', 'rating'])
+        movie_features = movie_features.astype(
+            {'movie_id': 'int64', **{column: 'int8' for column in genre_columns}}
+        )
+        
+        # İşlenmiş verileri Parquet olarak kaydet (CSV yalnızca dışa aktarım için)
+        write_table(user_features, 'processed_data/user_features.parquet', export_csv)
+        write_table(movie_features, 'processed_data/movie_features.parquet', export_csv)
+        
+        # Kullanıcı ölçekleyicisi, API'de yeni puanları aynı ölçeğe taşımak için saklanır
+        if user_scaler is not None:
+            joblib.dump(user_scaler, 'processed_data/user_scaler.pkl')
         
         logging.info("İşlenmiş veriler kaydedildi")
     
@@ -147,34 +502,186 @@ def save_processed_data(user_features, movie_features):
         logging.error(f"Veri kaydetme hatası: {str(e)}")
         raise
 
+def save_interaction_matrix(accumulator, users_df, movies_df, previous=None):
+    """Biriktirilen izleme kayıtlarından etkileşim matrisini oluştur ve kaydet
+    
+    `previous` verilirse yeniden okunan kullanıcıların satırları mevcut matriste değiştirilir.
+    """
+    try:
+        os.makedirs('processed_data', exist_ok=True)
+        
+        if previous is None:
+            interactions = build_interaction_matrix(
+                accumulator.to_frame(), users_df['user_id'], movies_df['movie_id']
+            )
+        else:
+            interactions = merge_interactions(
+                previous, accumulator.to_frame(), users_df['user_id'], movies_df['movie_id']
+            )
+        save_interactions(interactions)
+        
+        logging.info(
+            f"Etkileşim matrisi kaydedildi: {interactions['rating'].shape}, "
+            f"{interactions['rating'].nnz} kayıt"
+        )
+        return interactions
+    
+    except Exception as e:
+        logging.error(f"Etkileşim matrisi hatası: {str(e)}")
+        raise
+
+def update_user_scaler(state, user_features):
+    """Ölçekleyici toplamlarını yalnızca özellikleri değişen kullanıcılar için güncelle
+    
+    Önceki özellikler kaydedilmiş toplamlardan yeniden hesaplanır; çıkan veya
+    değişen satırların katkısı düşülür, yeni veya değişen satırlarınki eklenir.
+    """
+    previous = state['stats'][['user_id']].merge(
+        watch_features(state['stats']), on='user_id', how='left'
+    ).set_index('user_id')[USER_NUMERIC_COLUMNS]
+    current = user_features.set_index('user_id')[USER_NUMERIC_COLUMNS]
+    
+    common = previous.index.intersection(current.index)
+    old_values = previous.loc[common].to_numpy(dtype=np.float64)
+    new_values = current.loc[common].to_numpy(dtype=np.float64)
+    same = ((old_values == new_values) | (np.isnan(old_values) & np.isnan(new_values))).all(axis=1)
+    changed = common[~same]
+    
+    removed = previous.loc[previous.index.difference(current.index).union(changed)]
+    added = current.loc[current.index.difference(previous.index).union(changed)]
+    scaler_sums = update_column_sums(state['scaler'], removed, added)
+    logging.info(f"Ölçekleyici güncellendi: {len(removed)} satır çıkarıldı, {len(added)} satır eklendi")
+    return scaler_from_sums(scaler_sums), scaler_sums
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ham verileri işleyip özellik yapıtlarını üret")
+    parser.add_argument('--export-csv', action='store_true',
+                        help="Parquet yapıtlarının yanına CSV kopyalarını da yaz")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="İzleme geçmişinin parça boyutu (satır)")
+    parser.add_argument('--skip-interactions', action='store_true',
+                        help="Kullanıcı×film etkileşim matrisini üretme")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="İzleme geçmişini user_id'ye göre bu kadar parçada paralel işle")
+    parser.add_argument('--full', action='store_true',
+                        help="Su seviyesini yok say ve tüm izleme geçmişini yeniden işle (geri doldurma)")
+    parser.add_argument('--report-dir', default=REPORT_DIR,
+                        help="Aşama süresi/belleği/satır sayılarını içeren JSON raporun klasörü")
+    parser.add_argument('--no-memory-profile', action='store_true',
+                        help="Aşamaların tepe belleğini ölçme (tracemalloc ek yükünü kaldırır)")
+    return parser.parse_args()
+
 def main():
     """Ana işlem fonksiyonu"""
+    args = parse_args()
+    profiler = RunProfiler('process_data', trace_memory=not args.no_memory_profile).start()
     try:
         logging.info("Veri işleme başlıyor...")
         
-        # Verileri yükle
-        users_df, movies_df, watch_history_df, preferences_df = load_data()
+        # Analitik arka uçta önce anlık görüntü OLTP veritabanıyla eşitlenir
+        if analytics.use_duckdb():
+            with profiler.stage('sync_snapshot') as record:
+                record['rows_out'] = analytics.sync_snapshot(engine, chunk_size=args.chunk_size)
+        
+        # Önceki çalıştırmanın durumu varsa yalnızca su seviyesinden sonra kaydı
+        # eklenen ya da güncellenen kullanıcılar yeniden işlenir
+        state = None if args.full else load_feature_state()
+        watermark = state['watermark'] if state else None
+        if state:
+            logging.info(
+                f"Artımlı çalıştırma: history_id > {watermark['history_id']} "
+                f"veya watch_date > {watermark['watch_date']}"
+            )
+        else:
+            logging.info("Tam çalıştırma: tüm izleme geçmişi işleniyor")
+        
+        # Verileri yükle; izleme geçmişi akış olduğu için satırları toplama aşamasında sayılır
+        with profiler.stage('load_data') as record:
+            users_df, movies_df, watch_history_chunks, preferences_df, genres_df = load_data(
+                args.chunk_size, watermark
+            )
+            record['rows_out'] = frame_rows(
+                users=users_df, movies=movies_df, preferences=preferences_df, genres=genres_df
+            )
         
         # Verileri temizle
-        users_df, movies_df, watch_history_df, preferences_df = clean_data(
-            users_df, movies_df, watch_history_df, preferences_df
-        )
+        with profiler.stage('clean_data', record['rows_out']) as record:
+            users_df, movies_df, watch_history_chunks, preferences_df = clean_data(
+                users_df, movies_df, watch_history_chunks, preferences_df
+            )
+            record['rows_out'] = frame_rows(users=users_df, movies=movies_df, preferences=preferences_df)
+        
+        # Yeni etkileşim matrisi ancak önceki matris de güncelse artımlı oluşturulabilir
+        build_interactions = not args.skip_interactions
+        previous_interactions = None
+        if state and build_interactions:
+            if state.get('has_interactions') and os.path.exists(INTERACTIONS_PATH):
+                previous_interactions = load_interactions()
+            else:
+                logging.warning("Önceki etkileşim matrisi eksik; matris için --full ile çalıştırın")
+                build_interactions = False
+        
+        # İzleme geçmişini tek geçişte kullanıcı toplamlarına katla
+        with profiler.stage('aggregate_watch_history') as record:
+            if analytics.use_duckdb():
+                if args.workers > 1:
+                    logging.info("DuckDB sorguyu kendi içinde paralel çalıştırır; --workers yok sayılıyor")
+                watch_stats, accumulator, watermark = aggregate_watch_history_duckdb(
+                    users_df, args.chunk_size, watermark, build_interactions
+                )
+            elif args.workers > 1:
+                watch_stats, accumulator, watermark = aggregate_watch_history_sharded(
+                    users_df, args.workers, args.chunk_size, watermark, build_interactions
+                )
+            else:
+                watch_stats, accumulator, watermark = aggregate_watch_history(
+                    watch_history_chunks, users_df, build_interactions=build_interactions
+                )
+            record['rows_in'] = {'watch_history': int(watch_stats['event_count'].sum())}
+            record['rows_out'] = frame_rows(watch_stats=watch_stats)
+        if state:
+            watch_stats = merge_watch_stats(state['stats'], watch_stats)
+            watermark = advance_watermark(state['watermark'], watermark)
+        
+        # Kullanıcı×film etkileşim matrisini kaydet
+        if accumulator is not None:
+            with profiler.stage('save_interaction_matrix'):
+                save_interaction_matrix(accumulator, users_df, movies_df, previous_interactions)
         
         # Özellik mühendisliği
-        user_features, movie_features = feature_engineering(
-            users_df, movies_df, watch_history_df, preferences_df
-        )
+        with profiler.stage('feature_engineering', frame_rows(
+            users=users_df, movies=movies_df, watch_stats=watch_stats, preferences=preferences_df
+        )) as record:
+            user_features, movie_features = feature_engineering(
+                users_df, movies_df, watch_stats, preferences_df, genres_df
+            )
+            record['rows_out'] = frame_rows(user_features=user_features, movie_features=movie_features)
         
-        # Özellikleri normalizasyon
-        user_features, movie_features = normalize_features(user_features, movie_features)
+        # Özellikleri normalizasyon; artımlı çalıştırmada ölçekleyici toplamları güncellenir
+        with profiler.stage('normalize_features', record['rows_out']) as record:
+            if state:
+                user_scaler, scaler_sums = update_user_scaler(state, user_features)
+            else:
+                user_scaler, scaler_sums = None, column_sums(user_features[USER_NUMERIC_COLUMNS])
+            user_features, movie_features, user_scaler = normalize_features(
+                user_features, movie_features, user_scaler
+            )
+            record['rows_out'] = frame_rows(user_features=user_features, movie_features=movie_features)
         
         # İşlenmiş verileri kaydet
-        save_processed_data(user_features, movie_features)
+        with profiler.stage('save_processed_data', record['rows_out']) as record:
+            save_processed_data(user_features, movie_features, user_scaler, export_csv=args.export_csv)
+            record['rows_out'] = record['rows_in']
+        
+        # Durum en son yazılır; yarıda kalan çalıştırma su seviyesini ilerletmez
+        save_feature_state(watch_stats, watermark, scaler_sums, has_interactions=accumulator is not None)
         
         logging.info("Veri işleme tamamlandı!")
+        profiler.write('success', report_dir=args.report_dir, args=vars(args), incremental=bool(state))
     
     except Exception as e:
         logging.error(f"Veri işleme hatası: {str(e)}")
+        profiler.write('failed', str(e), report_dir=args.report_dir, args=vars(args))
         raise
 
 if __name__ == "__main__":
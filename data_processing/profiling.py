@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# Çalıştırma raporlarının yazıldığı klasör
+REPORT_DIR = os.getenv('RUN_REPORT_DIR', 'run_reports')
+
+
+class RunProfiler:
+    """Hat aşamalarının süresini, tepe belleğini ve satır sayılarını kaydeder.
+
+    Her aşama `stage()` bloğunda çalışır; tepe bellek tracemalloc ile aşama
+    başında sıfırlanarak ölçülür, iç içe aşamaların tepesi dış aşamaya da
+    yansıtılır. Alt süreçlerde ölçülen aşamalar `add()` ile eklenir. Rapor
+    çalıştırma başarısız olsa da yazılır; hata veren aşama `failed` durumuyla
+    görünür.
+    """
+
+    def __init__(self, pipeline, trace_memory=True):
+        self.pipeline = pipeline
+        self.trace_memory = trace_memory
+        self.stages = []
+        self._open = []
+        self._started = None
+        self._started_at = None
+        self._own_tracing = False
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._started_at = datetime.utcnow()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracing = True
+        return self
+
+    def _peak(self):
+        return tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+
+    def _reset_peak(self):
+        # reset_peak Python 3.9+; öncesinde tepe değer çalıştırmanın başından itibaren ölçülür
+        if self.trace_memory and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Bloğu ölç; çağıran çıkış satır sayısını `record['rows_out']` ile verir"""
+        record = {'stage': name, 'status': 'success', 'rows_in': rows_in, 'rows_out': None}
+        if self._open:
+            # Dış aşamanın şimdiye kadarki tepesi sıfırlamadan önce saklanır
+            parent = self._open[-1]
+            parent['peak_memory_bytes'] = max(parent.get('peak_memory_bytes') or 0, self._peak() or 0)
+        self._reset_peak()
+        self._open.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record['status'] = 'failed'
+            record['error'] = str(e)
+            raise
+        finally:
+            record['seconds'] = time.perf_counter() - started
+            self._open.pop()
+            if self.trace_memory:
+                record['peak_memory_bytes'] = max(record.get('peak_memory_bytes') or 0, self._peak())
+                if self._open:
+                    parent = self._open[-1]
+                    parent['peak_memory_bytes'] = max(
+                        parent.get('peak_memory_bytes') or 0, record['peak_memory_bytes']
+                    )
+            else:
+                record['peak_memory_bytes'] = None
+            self.stages.append(record)
+            self._log(record)
+
+    def add(self, name, seconds, peak_memory_bytes=None, rows_in=None, rows_out=None):
+        """Başka bir süreçte ölçülmüş aşamayı rapora ekle"""
+        record = {
+            'stage': name,
+            'status': 'success',
+            'rows_in': rows_in,
+            'rows_out': rows_out,
+            'seconds': seconds,
+            'peak_memory_bytes': peak_memory_bytes,
+        }
+        self.stages.append(record)
+        self._log(record)
+
+    @staticmethod
+    def _log(record):
+        memory = record.get('peak_memory_bytes')
+        memory = f"{memory / 2 ** 20:.1f} MB" if memory is not None else "-"
+        logging.info(
+            f"Aşama {record['stage']}: {record['seconds']:.3f} sn, tepe bellek {memory}, "
+            f"satır {record['rows_in']} -> {record['rows_out']}"
+        )
+
+    def report(self, status, error=None, **extra):
+        """Makine tarafından okunabilir çalıştırma raporu"""
+        peaks = [stage['peak_memory_bytes'] for stage in self.stages if stage['peak_memory_bytes'] is not None]
+        return {
+            'pipeline': self.pipeline,
+            'status': status,
+            'error': error,
+            'started_at': self._started_at.isoformat(),
+            'finished_at': datetime.utcnow().isoformat(),
+            'total_seconds': time.perf_counter() - self._started,
+            'peak_memory_bytes': max(peaks) if peaks else None,
+            'memory_traced': self.trace_memory,
+            **extra,
+            'stages': self.stages,
+        }
+
+    def write(self, status, error=None, report_dir=REPORT_DIR, **extra):
+        """Raporu `<klasör>/<hat>-<zaman>.json` olarak yaz ve izlemeyi durdur"""
+        report = self.report(status, error, **extra)
+        if self._own_tracing:
+            tracemalloc.stop()
+            self._own_tracing = False
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(
+            report_dir, f"{self.pipeline}-{self._started_at.strftime('%Y%m%dT%H%M%S_%f')}.json"
+        )
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+        logging.info(f"Çalıştırma raporu yazıldı: {path}")
+        return path
+
+
+def frame_rows(**frames):
+    """Tablo adı → satır sayısı"""
+    return {name: int(len(frame)) for name, frame in frames.items() if frame is not None}
+
+
+def trace_peak(function, *args):
+    """Fonksiyonu çalıştırıp tepe belleğini ölç; (sonuç, tepe bayt). Alt süreçlerde kullanılır"""
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        if not tracing:
+            tracemalloc.stop()
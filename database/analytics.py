@@ -0,0 +1,153 @@
+import argparse
+import logging
+import os
+
+import pandas as pd
+from sqlalchemy import DateTime, bindparam, text
+
+# Toplu özellik/eğitim yolunun okuduğu arka uç: "oltp" (DATABASE_URL) veya "duckdb"
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "oltp")
+ANALYTICS_DATABASE_PATH = os.getenv("ANALYTICS_DATABASE_PATH", "analytics.duckdb")
+
+# Anlık görüntüye yalnızca analitik yolun kullandığı sütunlar kopyalanır
+DIMENSION_TABLES = {
+    'users': ('SELECT user_id, created_at, is_active FROM users', ['created_at']),
+    'movies': ('SELECT movie_id, genre_mask, release_year, rating FROM movies', None),
+    'genres': ('SELECT genre_id, name FROM genres', None),
+    'user_preferences': (
+        'SELECT user_id, favorite_genres, preferred_actors, watch_time_preference FROM user_preferences',
+        None
+    ),
+}
+WATCH_HISTORY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS watch_history (
+        history_id BIGINT,
+        user_id BIGINT,
+        movie_id BIGINT,
+        watch_date TIMESTAMP,
+        rating DOUBLE,
+        watch_duration DOUBLE
+    )
+"""
+WATCH_HISTORY_QUERY = (
+    'SELECT history_id, user_id, movie_id, watch_date, rating, watch_duration '
+    'FROM watch_history WHERE history_id > :after_history_id'
+)
+# Puanı güncellenen kayıtların watch_date'i ilerler; bunlar da yeniden kopyalanır
+CHANGED_WATCH_HISTORY_QUERY = WATCH_HISTORY_QUERY + ' OR watch_date > :after_watch_date'
+
+
+def use_duckdb():
+    return ANALYTICS_BACKEND == "duckdb"
+
+
+def connect(path=ANALYTICS_DATABASE_PATH, read_only=False):
+    """Gömülü DuckDB analitik veritabanına bağlan"""
+    import duckdb
+    return duckdb.connect(path, read_only=read_only)
+
+
+def read_frame(sql, params=None, path=ANALYTICS_DATABASE_PATH):
+    """Analitik veritabanında sorguyu çalıştırıp sonucu DataFrame olarak döndür"""
+    con = connect(path, read_only=True)
+    try:
+        return con.execute(sql, params or []).df()
+    finally:
+        con.close()
+
+
+def iter_frames(sql, params=None, chunk_size=100000, path=ANALYTICS_DATABASE_PATH):
+    """Sorgu sonucunu sütunsal olarak parça parça DataFrame'ler halinde oku"""
+    con = connect(path, read_only=True)
+    try:
+        con.execute(sql, params or [])
+        # DuckDB parçaları 2048 satırlık vektörler halinde üretir
+        vectors = max(1, chunk_size // 2048)
+        while True:
+            chunk = con.fetch_df_chunk(vectors)
+            if len(chunk) == 0:
+                break
+            yield chunk
+    finally:
+        con.close()
+
+
+def sync_snapshot(source_engine, path=ANALYTICS_DATABASE_PATH, chunk_size=100000, full=False):
+    """OLTP veritabanından analitik anlık görüntüyü güncelle
+
+    Küçük boyut tabloları her seferinde yeniden kopyalanır. İzleme geçmişine
+    yalnızca eklenen (history_id su seviyesi) ve güncellenen (watch_date su
+    seviyesi) kayıtlar akış halinde yazılır; güncellenenlerin eski kopyası
+    silinir. OLTP'de silinen kayıtlar için `full` ile baştan oluşturulmalıdır.
+    """
+    con = connect(path)
+    try:
+        counts = {}
+        for table, (query, parse_dates) in DIMENSION_TABLES.items():
+            frame = pd.read_sql_query(query, source_engine, parse_dates=parse_dates)
+            con.register('snapshot_frame', frame)
+            con.execute(f'DROP TABLE IF EXISTS {table}')
+            con.execute(f'CREATE TABLE {table} AS SELECT * FROM snapshot_frame')
+            con.unregister('snapshot_frame')
+            counts[table] = len(frame)
+
+        if full:
+            con.execute('DROP TABLE IF EXISTS watch_history')
+        con.execute(WATCH_HISTORY_SCHEMA)
+        mark, date_mark = con.execute(
+            'SELECT COALESCE(MAX(history_id), 0), MAX(watch_date) FROM watch_history'
+        ).fetchone()
+        params = {'after_history_id': int(mark)}
+        if date_mark is None:
+            query = text(WATCH_HISTORY_QUERY)
+        else:
+            query = text(CHANGED_WATCH_HISTORY_QUERY).bindparams(
+                bindparam('after_watch_date', type_=DateTime)
+            )
+            params['after_watch_date'] = pd.Timestamp(date_mark).to_pydatetime()
+
+        added = 0
+        with source_engine.connect() as connection:
+            connection = connection.execution_options(stream_results=True)
+            for chunk in pd.read_sql_query(
+                query,
+                connection,
+                params=params,
+                chunksize=chunk_size,
+                parse_dates=['watch_date']
+            ):
+                chunk = chunk.astype({'rating': 'float64', 'watch_duration': 'float64'})
+                con.register('snapshot_frame', chunk)
+                con.execute(
+                    'DELETE FROM watch_history WHERE history_id IN (SELECT history_id FROM snapshot_frame)'
+                )
+                con.execute('INSERT INTO watch_history SELECT * FROM snapshot_frame')
+                con.unregister('snapshot_frame')
+                added += len(chunk)
+        counts['watch_history'] = added
+
+        logging.info(
+            f"Analitik anlık görüntü güncellendi (history_id > {mark} veya watch_date > {date_mark}): {counts}"
+        )
+        return counts
+    finally:
+        con.close()
+
+
+def main():
+    """OLTP veritabanından DuckDB analitik anlık görüntüsünü oluştur/güncelle"""
+    from database.database import engine
+
+    parser = argparse.ArgumentParser(description="Analitik (DuckDB) anlık görüntüsünü güncelle")
+    parser.add_argument('--path', default=ANALYTICS_DATABASE_PATH)
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--full', action='store_true', help="İzleme geçmişini baştan kopyala")
+    args = parser.parse_args()
+
+    counts = sync_snapshot(engine, args.path, args.chunk_size, args.full)
+    for table, rows in counts.items():
+        print(f"{table:>17}: {rows:,} satır")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import logging
+import re
+import sys
+
+from sqlalchemy import and_, create_engine, func, or_, select, text
+from sqlalchemy.orm import Session, aliased
+
+from database.database import SQLALCHEMY_DATABASE_URL, Genre, Movie, WatchHistory, movie_genres
+
+# Sıralı tarama yapılmaması gereken büyük tablolar
+HOT_TABLES = ('watch_history', 'movies')
+
+# Planda tam tablo taraması işaretleri (SQLite: "SCAN tablo", PostgreSQL: "Seq Scan on tablo")
+SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(%s)(?:_\d+)?\b' % '|'.join(HOT_TABLES)),
+    'postgresql': re.compile(r'Seq Scan on (%s)\b' % '|'.join(HOT_TABLES)),
+}
+
+SAMPLE_USER_ID = 1
+SAMPLE_MOVIE_ID = 1
+SAMPLE_GENRE_IDS = [1, 2, 3]
+SAMPLE_NEIGHBORS = [2, 3, 4, 5]
+
+
+def hot_queries(db):
+    """API uçlarının ve toplu işlerin sık çalışan sorguları (ad, sorgu)"""
+    watched = db.query(WatchHistory.history_id).filter(
+        WatchHistory.user_id == SAMPLE_USER_ID,
+        WatchHistory.movie_id == Movie.movie_id
+    ).exists()
+    own = aliased(WatchHistory)
+    neighbor_watched = db.query(own.history_id).filter(
+        own.user_id == SAMPLE_USER_ID,
+        own.movie_id == WatchHistory.movie_id
+    ).exists()
+    return [
+        # /api/history, izlenen film elemesi, öneri yollarındaki kullanıcı geçmişi
+        ('kullanıcı geçmişi', db.query(WatchHistory).filter(
+            WatchHistory.user_id == SAMPLE_USER_ID
+        )),
+        # /api/history: (watch_date, history_id) imlecinden sonraki sayfa
+        ('geçmiş sayfası', db.query(WatchHistory).filter(
+            WatchHistory.user_id == SAMPLE_USER_ID,
+            or_(
+                WatchHistory.watch_date > text("'2024-01-01'"),
+                and_(WatchHistory.watch_date == text("'2024-01-01'"), WatchHistory.history_id > 0),
+                WatchHistory.watch_date.is_(None)
+            )
+        ).order_by(WatchHistory.watch_date.asc().nulls_last(), WatchHistory.history_id).limit(100)),
+        # /api/movies: movie_id imlecinden sonraki sayfa
+        ('film sayfası', db.query(Movie).filter(
+            Movie.movie_id > SAMPLE_MOVIE_ID
+        ).order_by(Movie.movie_id).limit(10)),
+        # /api/movies/rate: kullanıcı+film kaydı
+        ('kullanıcı+film kaydı', db.query(WatchHistory).filter(
+            WatchHistory.user_id == SAMPLE_USER_ID,
+            WatchHistory.movie_id == SAMPLE_MOVIE_ID
+        )),
+        # Özellik toplamlarının geçmişten ilk kez oluşturulması
+        ('kullanıcı toplamları', db.query(
+            func.sum(WatchHistory.rating), func.count(WatchHistory.rating)
+        ).filter(WatchHistory.user_id == SAMPLE_USER_ID)),
+        # /api/movies?genre=...: tür adından filmlere
+        ('tür filtresi', db.query(Movie).join(
+            movie_genres, movie_genres.c.movie_id == Movie.movie_id
+        ).join(Genre, Genre.genre_id == movie_genres.c.genre_id).filter(
+            Genre.name == 'Drama'
+        ).limit(10)),
+        # Tür önerileri: türlerdeki izlenmemiş filmler ORDER BY rating DESC, movie_id LIMIT
+        ('tür adayları', db.query(Movie).filter(
+            Movie.movie_id.in_(select(movie_genres.c.movie_id).where(
+                movie_genres.c.genre_id.in_(SAMPLE_GENRE_IDS)
+            )),
+            ~watched
+        ).order_by(Movie.rating.desc(), Movie.movie_id).limit(10)),
+        # Komşu önerileri
+        ('komşu filmleri', db.query(WatchHistory.movie_id).filter(
+            WatchHistory.user_id.in_(SAMPLE_NEIGHBORS),
+            WatchHistory.rating >= 4,
+            ~neighbor_watched
+        ).group_by(WatchHistory.movie_id).order_by(
+            func.count(WatchHistory.history_id).desc()
+        ).limit(10)),
+        # Film kimliklerinden satırlar
+        ('film satırları', db.query(Movie).filter(Movie.movie_id.in_([SAMPLE_MOVIE_ID]))),
+        # Aday indeksi yenilemesi: yeni ya da su seviyesinden sonra değişen filmler
+        ('değişen filmler', db.query(Movie).filter(or_(
+            Movie.movie_id > SAMPLE_MOVIE_ID,
+            Movie.updated_at >= text("'2100-01-01'")
+        ))),
+        # Artımlı özellik hattı: su seviyesinden sonra değişen kullanıcılar
+        ('değişen kullanıcılar', db.query(WatchHistory.user_id).filter(or_(
+            WatchHistory.history_id > 0,
+            WatchHistory.watch_date > text("'2100-01-01'")
+        ))),
+    ]
+
+
+def explain(connection, sql):
+    """Sorgunun planını satır listesi olarak döndür"""
+    if connection.dialect.name == 'sqlite':
+        return [row[-1] for row in connection.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+    return [row[0] for row in connection.execute(text(f'EXPLAIN {sql}'))]
+
+
+def check_query_plans(engine):
+    """Sık sorguların planlarını kontrol et; sıralı tarama yapanların adlarını döndür"""
+    dialect = engine.dialect.name
+    if dialect not in SCAN_PATTERNS:
+        raise ValueError(f"Desteklenmeyen veritabanı: {dialect}")
+    pattern = SCAN_PATTERNS[dialect]
+
+    failures = []
+    with engine.connect() as connection:
+        if dialect == 'postgresql':
+            # Küçük tablolarda planlayıcı zaten sıralı taramayı seçer; kapatıldığında
+            # yine de sıralı tarama görülüyorsa kullanılabilir indeks yoktur
+            connection.execute(text('SET enable_seqscan = off'))
+        db = Session(bind=connection)
+        for name, query in hot_queries(db):
+            sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+            plan = explain(connection, sql)
+            scans = sorted({match.group(1) for line in plan for match in pattern.finditer(line)})
+            status = 'TARAMA: ' + ', '.join(scans) if scans else 'indeks'
+            print(f"{name:>22}: {status}")
+            if scans:
+                failures.append(name)
+                for line in plan:
+                    print(f"{'':>24}{line}")
+        db.close()
+    return failures
+
+
+def main():
+    """Sık sorgular sıralı taramaya düşerse sıfırdan farklı kodla çık"""
+    parser = argparse.ArgumentParser(description="Sık sorguların indeks kullandığını doğrula")
+    parser.add_argument('--db-url', default=SQLALCHEMY_DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url)
+    try:
+        failures = check_query_plans(engine)
+    finally:
+        engine.dispose()
+    if failures:
+        logging.error(f"Sıralı taramaya düşen sorgular: {failures}")
+        sys.exit(1)
+    print("Tüm sık sorgular indeks kullanıyor")
+
+
+if __name__ == "__main__":
+    main()
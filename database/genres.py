@@ -0,0 +1,77 @@
+import numpy as np
+from sqlalchemy import func
+
+from database.database import Genre
+
+# genre_mask işaretli 64 bitlik tamsayıdır; en fazla 63 tür kodlanabilir
+MAX_GENRES = 63
+
+
+def genre_bit(genre_id):
+    """Türün movies.genre_mask içindeki biti"""
+    return 1 << (genre_id - 1)
+
+
+def genre_mask(genre_ids):
+    """Tür kimliklerinden bit maskesi"""
+    return sum(genre_bit(genre_id) for genre_id in set(genre_ids))
+
+
+def genre_ids_of(mask):
+    """Bit maskesindeki tür kimlikleri"""
+    return [bit + 1 for bit in range(MAX_GENRES) if (mask or 0) >> bit & 1]
+
+
+def split_genres(label):
+    """Virgülle ayrılmış tür etiketini sırası korunmuş benzersiz adlara ayır"""
+    names = [name.strip() for name in (label or '').split(',')]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def top_genres(genre_stats, limit=3):
+    """(genre_id, ad, beğeni) satırlarından en çok beğenilen türler
+
+    Tüm öneri yolları aynı kuralı kullanır: beğenisi olmayan ve türü
+    bilinmeyen satırlar atlanır, beğeni sayısı azalan, eşitlikte genre_id
+    artan sırada ilk `limit` tür seçilir.
+    """
+    liked = [(genre_id, name, likes) for genre_id, name, likes in genre_stats if genre_id and likes]
+    return sorted(liked, key=lambda x: (-x[2], x[0]))[:limit]
+
+
+def genre_flags(masks, genre_ids):
+    """Bit maskelerinden (film × tür) 0/1 matrisi; sütunlar `genre_ids` sırasındadır"""
+    masks = np.asarray(masks, dtype=np.int64)
+    bits = np.asarray(genre_ids, dtype=np.int64) - 1
+    return ((masks[:, None] >> bits[None, :]) & 1).astype(np.int8)
+
+
+def get_or_create_genres(db, names):
+    """Adları verilen türleri döndür; olmayanları sıradaki bit ile oluştur"""
+    existing = {genre.name: genre for genre in db.query(Genre).filter(Genre.name.in_(names))}
+    next_id = (db.query(func.max(Genre.genre_id)).scalar() or 0) + 1
+    genres, created = [], False
+    for name in names:
+        genre = existing.get(name)
+        if genre is None:
+            if next_id > MAX_GENRES:
+                raise ValueError(f"En fazla {MAX_GENRES} tür tanımlanabilir: {name}")
+            genre = Genre(genre_id=next_id, name=name)
+            db.add(genre)
+            existing[name] = genre
+            next_id += 1
+            created = True
+        genres.append(genre)
+    if created:
+        # Oturum autoflush kullanmadığı için sonraki aramalar yeni türleri görsün
+        db.flush()
+    return genres
+
+
+def set_movie_genres(db, movie, names):
+    """Filmin türlerini ilişki tablosuna, bit maskesine ve görüntüleme etiketine yaz"""
+    genres = get_or_create_genres(db, split_genres(','.join(names)))
+    movie.genres = genres
+    movie.genre_mask = genre_mask(genre.genre_id for genre in genres)
+    movie.genre = ','.join(genre.name for genre in genres) or None
+    return genres
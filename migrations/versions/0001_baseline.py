@@ -0,0 +1,73 @@
+"""Başlangıç şeması
+
+create_all ile oluşturulmuş mevcut veritabanları bu sürüme
+`alembic stamp 0001` ile işaretlenir; ardından `alembic upgrade head` çalıştırılır.
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-06-01 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# Alembic kimlikleri
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('user_id', sa.Integer(), primary_key=True),
+        sa.Column('username', sa.String(50), nullable=False),
+        sa.Column('email', sa.String(100), nullable=False),
+        sa.Column('password_hash', sa.String(255), nullable=False),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('is_active', sa.Boolean()),
+    )
+    op.create_index('ix_users_user_id', 'users', ['user_id'])
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    op.create_table(
+        'movies',
+        sa.Column('movie_id', sa.Integer(), primary_key=True),
+        sa.Column('title', sa.String(100), nullable=False),
+        sa.Column('genre', sa.String(100)),
+        sa.Column('release_year', sa.Integer()),
+        sa.Column('rating', sa.Float()),
+        sa.Column('description', sa.String(500)),
+        sa.Column('created_at', sa.DateTime()),
+    )
+    op.create_index('ix_movies_movie_id', 'movies', ['movie_id'])
+
+    op.create_table(
+        'watch_history',
+        sa.Column('history_id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.user_id')),
+        sa.Column('movie_id', sa.Integer(), sa.ForeignKey('movies.movie_id')),
+        sa.Column('watch_date', sa.DateTime()),
+        sa.Column('rating', sa.Integer()),
+        sa.Column('watch_duration', sa.Integer()),
+    )
+    op.create_index('ix_watch_history_history_id', 'watch_history', ['history_id'])
+
+    op.create_table(
+        'user_preferences',
+        sa.Column('preference_id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.user_id')),
+        sa.Column('favorite_genres', sa.String(200)),
+        sa.Column('preferred_actors', sa.String(200)),
+        sa.Column('watch_time_preference', sa.String(20)),
+    )
+    op.create_index('ix_user_preferences_preference_id', 'user_preferences', ['preference_id'])
+
+
+def downgrade():
+    op.drop_table('user_preferences')
+    op.drop_table('watch_history')
+    op.drop_table('movies')
+    op.drop_table('users')
@@ -0,0 +1,82 @@
+"""watch_history ve movies erişim desenleri için bileşik indeksler
+
+(user_id, movie_id) benzersiz indeksinden önce yinelenen izleme kayıtları
+birleştirilir: en son kayıt (en büyük history_id) kalır, izleme süreleri
+toplanır, en son izleme tarihi alınır. Bu kullanıcıların özellik toplamları
+silinir; API ilk puanlamada toplamları birleştirilmiş geçmişten yeniden kurar.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-06-15 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# Alembic kimlikleri
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+DUPLICATE_PAIRS = """
+    SELECT {columns} FROM watch_history
+    WHERE user_id IS NOT NULL AND movie_id IS NOT NULL
+    GROUP BY user_id, movie_id
+    HAVING COUNT(*) > 1
+"""
+
+
+def create_index(name, table, columns, **kwargs):
+    """PostgreSQL'de indeksi tabloyu yazmaya kilitlemeden (CONCURRENTLY) oluştur"""
+    if op.get_context().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, columns, postgresql_concurrently=True, **kwargs)
+    else:
+        op.create_index(name, table, columns, **kwargs)
+
+
+def upgrade():
+    # Başlangıç şemasından gelen veritabanlarında özellik toplamları tablosu henüz yoktur (bkz. 0006)
+    if sa.inspect(op.get_bind()).has_table('user_feature_stats'):
+        op.execute(
+            "DELETE FROM user_feature_stats WHERE user_id IN ("
+            + DUPLICATE_PAIRS.format(columns='user_id') + ")"
+        )
+    op.execute(
+        """
+        UPDATE watch_history SET
+            watch_duration = (
+                SELECT SUM(w.watch_duration) FROM watch_history w
+                WHERE w.user_id = watch_history.user_id AND w.movie_id = watch_history.movie_id
+            ),
+            watch_date = (
+                SELECT MAX(w.watch_date) FROM watch_history w
+                WHERE w.user_id = watch_history.user_id AND w.movie_id = watch_history.movie_id
+            )
+        WHERE history_id IN (""" + DUPLICATE_PAIRS.format(columns='MAX(history_id)') + ")"
+    )
+    op.execute(
+        """
+        DELETE FROM watch_history
+        WHERE user_id IS NOT NULL AND movie_id IS NOT NULL
+          AND history_id NOT IN (
+              SELECT MAX(history_id) FROM watch_history
+              WHERE user_id IS NOT NULL AND movie_id IS NOT NULL
+              GROUP BY user_id, movie_id
+          )
+        """
+    )
+
+    create_index('ix_watch_history_user_id_watch_date', 'watch_history', ['user_id', 'watch_date'])
+    create_index('ix_watch_history_watch_date', 'watch_history', ['watch_date'])
+    create_index('uq_watch_history_user_id_movie_id', 'watch_history', ['user_id', 'movie_id'], unique=True)
+    create_index('ix_movies_genre_rating', 'movies', ['genre', sa.text('rating DESC')])
+
+
+def downgrade():
+    # Birleştirilen yinelenen kayıtlar geri getirilmez
+    op.drop_index('ix_movies_genre_rating', table_name='movies')
+    op.drop_index('uq_watch_history_user_id_movie_id', table_name='watch_history')
+    op.drop_index('ix_watch_history_watch_date', table_name='watch_history')
+    op.drop_index('ix_watch_history_user_id_watch_date', table_name='watch_history')
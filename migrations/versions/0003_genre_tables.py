@@ -0,0 +1,93 @@
+"""Normalize tür saklama: genres, movie_genres ve movies.genre_mask
+
+Mevcut movies.genre etiketleri virgülle ayrılarak tür tablosuna (ada göre
+sıralı kimliklerle), film-tür ilişkisine ve bit maskesine taşınır. genre
+sütunu görüntüleme etiketi olarak kalır. Tür filtresi artık movie_genres
+üzerinden yapıldığı için (genre, rating) indeksi yerine rating indeksi kullanılır.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-07-01 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# Alembic kimlikleri
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# genre_mask işaretli 64 bitlik tamsayıdır
+MAX_GENRES = 63
+
+
+# database.genres.split_genres'in dondurulmuş kopyası; göç, uygulama kodu değişse de aynı sonucu vermelidir
+def split_genres(label):
+    names = [name.strip() for name in (label or '').split(',')]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def upgrade():
+    op.create_table(
+        'genres',
+        sa.Column('genre_id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(50), nullable=False, unique=True),
+    )
+    op.create_table(
+        'movie_genres',
+        sa.Column('movie_id', sa.Integer(), sa.ForeignKey('movies.movie_id'), primary_key=True),
+        sa.Column('genre_id', sa.Integer(), sa.ForeignKey('genres.genre_id'), primary_key=True),
+    )
+    op.create_index('ix_movie_genres_genre_id_movie_id', 'movie_genres', ['genre_id', 'movie_id'])
+    op.add_column('movies', sa.Column('genre_mask', sa.BigInteger(), nullable=False, server_default='0'))
+
+    # Ayrık etiket sayısı küçüktür; ayrıştırma Python'da, eşleme kümesel SQL ile yapılır
+    bind = op.get_bind()
+    labels = [label for label, in bind.execute(
+        sa.text('SELECT DISTINCT genre FROM movies WHERE genre IS NOT NULL')
+    )]
+    names = sorted({name for label in labels for name in split_genres(label)})
+    if len(names) > MAX_GENRES:
+        raise ValueError(f"En fazla {MAX_GENRES} tür taşınabilir, bulunan: {len(names)}")
+    genre_ids = {name: index + 1 for index, name in enumerate(names)}
+    if names:
+        bind.execute(
+            sa.text('INSERT INTO genres (genre_id, name) VALUES (:genre_id, :name)'),
+            [{'genre_id': genre_id, 'name': name} for name, genre_id in genre_ids.items()]
+        )
+    for label in labels:
+        for name in split_genres(label):
+            bind.execute(
+                sa.text(
+                    'INSERT INTO movie_genres (movie_id, genre_id) '
+                    'SELECT movie_id, :genre_id FROM movies WHERE genre = :label'
+                ),
+                {'genre_id': genre_ids[name], 'label': label}
+            )
+    # Türler farklı bitlerde olduğu için toplam, bit düzeyinde VEYA ile aynıdır
+    op.execute(
+        """
+        UPDATE movies SET genre_mask = COALESCE((
+            SELECT SUM(CAST(1 AS BIGINT) << (movie_genres.genre_id - 1))
+            FROM movie_genres WHERE movie_genres.movie_id = movies.movie_id
+        ), 0)
+        """
+    )
+    if bind.dialect.name == 'postgresql':
+        # Yeni türler uygulamada açık kimlikle eklenir; dizi yine de ileri alınır
+        op.execute("SELECT setval(pg_get_serial_sequence('genres', 'genre_id'), COALESCE(MAX(genre_id), 1)) FROM genres")
+
+    op.drop_index('ix_movies_genre_rating', table_name='movies')
+    op.create_index('ix_movies_rating', 'movies', [sa.text('rating DESC')])
+
+
+def downgrade():
+    op.drop_index('ix_movies_rating', table_name='movies')
+    op.create_index('ix_movies_genre_rating', 'movies', ['genre', sa.text('rating DESC')])
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.drop_column('genre_mask')
+    op.drop_index('ix_movie_genres_genre_id_movie_id', table_name='movie_genres')
+    op.drop_table('movie_genres')
+    op.drop_table('genres')
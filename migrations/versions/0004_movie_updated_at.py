@@ -0,0 +1,32 @@
+"""movies.updated_at: aday indeksinin değişen filmleri yenileyebilmesi için
+
+Mevcut filmlerin su seviyesi oluşturulma zamanından (yoksa göç anından)
+başlatılır. Uygulama ORM ile yaptığı her film güncellemesinde sütunu
+yeniler; filmleri doğrudan SQL ile güncelleyen işler updated_at'i de yazmalıdır.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-07-15 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# Alembic kimlikleri
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite sabit olmayan varsayılanla sütun ekleyemez; değer ayrıca doldurulur
+    op.add_column('movies', sa.Column('updated_at', sa.DateTime()))
+    op.execute("UPDATE movies SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+    op.create_index('ix_movies_updated_at', 'movies', ['updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_movies_updated_at', table_name='movies')
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,53 @@
+"""(user_id, watch_date) indeksini özellik hattının okuduğu sütunlarla genişlet
+
+Parçalı özellik toplama izleme geçmişini bitişik user_id aralıklarında
+okur. Kayıtlar tabloda user_id sırasında durmadığı için dar indeksle her
+aralık tablonun neredeyse tüm sayfalarına dokunur; sütunları içeren indeks
+aralığı yalnızca indeksten (PostgreSQL'de index-only scan) okutur. Öndeki
+sütunlar aynı kaldığı için eski indeksi kullanan sorgular bu indeksi kullanır.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-07-20 00:00:00
+"""
+from alembic import op
+
+
+# Alembic kimlikleri
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+COVERING_COLUMNS = ['user_id', 'watch_date', 'history_id', 'movie_id', 'rating', 'watch_duration']
+
+
+def concurrently():
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def create_index(name, columns):
+    """PostgreSQL'de indeksi tabloyu yazmaya kilitlemeden (CONCURRENTLY) oluştur"""
+    if concurrently():
+        with op.get_context().autocommit_block():
+            op.create_index(name, 'watch_history', columns, postgresql_concurrently=True)
+    else:
+        op.create_index(name, 'watch_history', columns)
+
+
+def drop_index(name):
+    if concurrently():
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name='watch_history', postgresql_concurrently=True)
+    else:
+        op.drop_index(name, table_name='watch_history')
+
+
+def upgrade():
+    create_index('ix_watch_history_user_id_watch_date_cover', COVERING_COLUMNS)
+    drop_index('ix_watch_history_user_id_watch_date')
+
+
+def downgrade():
+    create_index('ix_watch_history_user_id_watch_date', ['user_id', 'watch_date'])
+    drop_index('ix_watch_history_user_id_watch_date_cover')
@@ -0,0 +1,38 @@
+"""Artımlı küme ataması için kullanıcı özellik toplamları: user_feature_stats
+
+Tablo başlangıç şemasında yoktur. Bu göçün yazılmasından önce `0001`'den
+kurulan veritabanlarında tablo zaten vardır; orada göç bir şey yapmaz.
+Satırlar API'de kullanıcının ilk puanlamasında geçmişten oluşturulur.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-07-25 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# Alembic kimlikleri
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('user_feature_stats'):
+        return
+    op.create_table(
+        'user_feature_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.user_id'), primary_key=True),
+        sa.Column('rating_sum', sa.Float(), nullable=False),
+        sa.Column('rating_count', sa.Integer(), nullable=False),
+        sa.Column('duration_sum', sa.Float(), nullable=False),
+        sa.Column('duration_count', sa.Integer(), nullable=False),
+        sa.Column('cluster', sa.Integer()),
+        sa.Column('updated_at', sa.DateTime()),
+    )
+
+
+def downgrade():
+    op.drop_table('user_feature_stats')
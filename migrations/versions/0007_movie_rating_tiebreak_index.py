@@ -0,0 +1,51 @@
+"""Puan indeksine movie_id eşitlik bozucusunu ekle
+
+Öneri yolları filmleri puan azalan, eşitlikte movie_id artan sırada
+döndürür. Tek sütunlu (rating DESC) indeks bu sırayı vermediği için
+geçmişi olmayan kullanıcıların ilk N sorgusu eşit puanlı filmleri
+sıralamak zorunda kalır; iki sütunlu indeks sırayı doğrudan verir.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-08-05 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# Alembic kimlikleri
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def concurrently():
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def create_index(name, columns):
+    """PostgreSQL'de indeksi tabloyu yazmaya kilitlemeden (CONCURRENTLY) oluştur"""
+    if concurrently():
+        with op.get_context().autocommit_block():
+            op.create_index(name, 'movies', columns, postgresql_concurrently=True)
+    else:
+        op.create_index(name, 'movies', columns)
+
+
+def drop_index(name):
+    if concurrently():
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name='movies', postgresql_concurrently=True)
+    else:
+        op.drop_index(name, table_name='movies')
+
+
+def upgrade():
+    create_index('ix_movies_rating_movie_id', [sa.text('rating DESC'), 'movie_id'])
+    drop_index('ix_movies_rating')
+
+
+def downgrade():
+    create_index('ix_movies_rating', [sa.text('rating DESC')])
+    drop_index('ix_movies_rating_movie_id')
@@ -0,0 +1,139 @@
+import argparse
+import time
+
+import joblib
+import numpy as np
+
+from data_processing.artifacts import read_table
+
+USER_FEATURES_PATH = 'processed_data/user_features.parquet'
+MODEL_PATH = 'model_results/kmeans_model.pkl'
+
+
+class IVFIndex:
+    """KMeans merkezlerini kaba niceleyici olarak kullanan ters dosya (IVF) indeksi
+
+    Her vektör en yakın merkezin listesine atanır ve listeler bellekte
+    ardışık tutulur. Arama, sorguya en yakın `n_probe` listenin vektörleriyle
+    sınırlı tam uzaklık hesabıdır.
+    """
+
+    def __init__(self, centroids, n_probe=2):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.n_probe = n_probe
+        self.ids = None
+        self.vectors = None
+        self.offsets = None
+        self._positions = {}
+
+    @property
+    def loaded(self):
+        return self.vectors is not None
+
+    def _nearest_centroids(self, vectors, count):
+        distances = (
+            (vectors ** 2).sum(axis=1)[:, None]
+            - 2 * vectors @ self.centroids.T
+            + (self.centroids ** 2).sum(axis=1)[None, :]
+        )
+        count = min(count, len(self.centroids))
+        nearest = np.argpartition(distances, count - 1, axis=1)[:, :count]
+        order = np.take_along_axis(distances, nearest, axis=1).argsort(axis=1)
+        return np.take_along_axis(nearest, order, axis=1)
+
+    def build(self, ids, vectors):
+        """Vektörleri en yakın merkezin listesine ata"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        lists = self._nearest_centroids(vectors, 1)[:, 0]
+        order = np.argsort(lists, kind='stable')
+        self.ids = ids[order]
+        self.vectors = vectors[order]
+        counts = np.bincount(lists, minlength=len(self.centroids))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._positions = {user_id: i for i, user_id in enumerate(self.ids.tolist())}
+
+    def vector(self, user_id):
+        position = self._positions.get(user_id)
+        return None if position is None else self.vectors[position]
+
+    def search(self, query, k=10, n_probe=None, exclude=None):
+        """Sorgu vektörüne en yakın K kimliği ve uzaklıklarını döndür"""
+        query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+        probes = self._nearest_centroids(query, n_probe or self.n_probe)[0]
+        segments = [np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes]
+        candidates = np.concatenate(segments) if segments else np.empty(0, dtype=np.int64)
+        return self._top_k(query[0], candidates, k, exclude)
+
+    def brute_force(self, query, k=10, exclude=None):
+        """Karşılaştırma için tüm vektörler üzerinde tam arama"""
+        query = np.asarray(query, dtype=np.float32)
+        return self._top_k(query, np.arange(len(self.ids)), k, exclude)
+
+    def _top_k(self, query, candidates, k, exclude):
+        if exclude is not None:
+            candidates = candidates[self.ids[candidates] != exclude]
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        diff = self.vectors[candidates] - query
+        distances = np.einsum('ij,ij->i', diff, diff)
+        k = min(k, len(candidates))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind='stable')]
+        return self.ids[candidates[top]], distances[top]
+
+
+def load_ann_index(features_path=USER_FEATURES_PATH, model_path=MODEL_PATH, n_probe=2):
+    """Kullanıcı özellikleri ve KMeans merkezlerinden IVF indeksini oluştur"""
+    user_features = read_table(features_path)
+    vectors = user_features.drop(['user_id'], axis=1).fillna(0).to_numpy(dtype=np.float32)
+    kmeans = joblib.load(model_path)
+    index = IVFIndex(kmeans.cluster_centers_, n_probe=n_probe)
+    index.build(user_features['user_id'].to_numpy(), vectors)
+    return index
+
+
+def measure_recall(index, k=10, n_probe=None, queries=1000, seed=42):
+    """IVF aramasının tam aramaya göre recall@K değerini ve gecikmesini ölç"""
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(index.ids), size=min(queries, len(index.ids)), replace=False)
+    recalls, ivf_latencies, exact_latencies = [], [], []
+    for position in sample:
+        user_id, query = index.ids[position], index.vectors[position]
+
+        started = time.perf_counter()
+        approximate, _ = index.search(query, k, n_probe=n_probe, exclude=user_id)
+        ivf_latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        exact, _ = index.brute_force(query, k, exclude=user_id)
+        exact_latencies.append(time.perf_counter() - started)
+
+        if len(exact):
+            recalls.append(len(np.intersect1d(approximate, exact)) / len(exact))
+    return {
+        'n_probe': n_probe or index.n_probe,
+        'recall': float(np.mean(recalls)) if recalls else 0.0,
+        'ivf_p50_us': float(np.median(ivf_latencies) * 1e6),
+        'exact_p50_us': float(np.median(exact_latencies) * 1e6),
+    }
+
+
+def main():
+    """IVF indeksinin recall/gecikme dengesini farklı probe sayıları için ölç"""
+    parser = argparse.ArgumentParser(description="Kullanıcı ANN indeksi recall/gecikme ölçümü")
+    parser.add_argument('--features', default=USER_FEATURES_PATH)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+
+    index = load_ann_index(args.features, args.model)
+    print(f"{'n_probe':>8} {'recall@' + str(args.k):>10} {'IVF p50 (µs)':>13} {'tam p50 (µs)':>13}")
+    for n_probe in range(1, len(index.centroids) + 1):
+        result = measure_recall(index, k=args.k, n_probe=n_probe, queries=args.queries)
+        print(f"{n_probe:>8} {result['recall']:>10.3f} {result['ivf_p50_us']:>13.1f} {result['exact_p50_us']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sqlalchemy import select
+
+from database.database import Movie, User, WatchHistory, engine
+from database.genres import genre_flags, genre_ids_of
+from data_processing.interactions import load_interactions, interactions_to_history
+
+# Tek sorguda gönderilecek en fazla kullanıcı kimliği (IN listesi sınırı)
+QUERY_CHUNK_SIZE = 500
+
+
+def load_catalog(bind):
+    """Film kataloğunu (kimlik, tür bit maskesi, puan) yükle"""
+    movies = pd.read_sql(select(Movie.movie_id, Movie.genre_mask, Movie.rating), bind)
+    movies['genre_mask'] = movies['genre_mask'].fillna(0).astype(np.int64)
+    return movies
+
+
+def load_histories(bind, user_ids):
+    """Verilen kullanıcıların izleme geçmişini parçalar halinde yükle"""
+    frames = []
+    for start in range(0, len(user_ids), QUERY_CHUNK_SIZE):
+        chunk = user_ids[start:start + QUERY_CHUNK_SIZE]
+        frames.append(pd.read_sql(
+            select(WatchHistory.user_id, WatchHistory.movie_id, WatchHistory.rating).where(
+                WatchHistory.user_id.in_(chunk)
+            ),
+            bind
+        ))
+    if not frames:
+        return pd.DataFrame(columns=['user_id', 'movie_id', 'rating'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def recommend_batch(user_ids, movies, history, top_n=10, top_genres=3, user_chunk=1024):
+    """Bir kullanıcı listesi için önerileri matris işlemleriyle hesapla
+
+    Kullanıcı×tür beğeni matrisi, tür×film matrisiyle çarpılır; izlenen
+    filmler seyrek izleme matrisiyle maskelenir ve en iyi N film
+    argpartition ile seçilir. Tek kullanıcılık uç noktayla aynı kuralı
+    uygular: beğeni azalan, eşitlikte genre_id artan ilk 3 türdeki
+    izlenmemiş filmler puan azalan, eşitlikte movie_id artan sırada.
+    """
+    if top_n < 1:
+        raise ValueError(f"top_n en az 1 olmalı: {top_n}")
+    user_ids = pd.unique(np.asarray(user_ids, dtype=np.int64))
+    n_users = len(user_ids)
+    if n_users == 0 or movies.empty:
+        return {int(user_id): [] for user_id in user_ids}
+
+    movie_ids = movies['movie_id'].to_numpy(dtype=np.int64)
+    ratings = movies['rating'].to_numpy(dtype=np.float64)
+    ratings = np.where(np.isnan(ratings), -np.inf, ratings)
+    masks = movies['genre_mask'].to_numpy(dtype=np.int64)
+    genre_ids = genre_ids_of(int(np.bitwise_or.reduce(masks)))
+    n_movies, n_genres = len(movie_ids), len(genre_ids)
+
+    # Film×tür matrisi bit maskelerinden kurulur; birden fazla türü olan
+    # film her türüne katkı verir, türü olmayan film hiçbirine
+    movie_genre = sparse.csr_matrix(genre_flags(masks, genre_ids).astype(np.float32))
+    genre_movie = movie_genre.T.tocsr()
+
+    # Geçmiş satırlarını matris indekslerine çevir
+    user_pos = pd.Index(user_ids).get_indexer(history['user_id'])
+    movie_pos = pd.Index(movie_ids).get_indexer(history['movie_id'])
+    has_history = np.zeros(n_users, dtype=bool)
+    has_history[user_pos[user_pos >= 0]] = True
+    valid = (user_pos >= 0) & (movie_pos >= 0)
+    user_pos, movie_pos = user_pos[valid], movie_pos[valid]
+    history_ratings = history['rating'].to_numpy(dtype=np.float32)[valid]
+
+    # Seyrek izleme matrisi
+    watched = sparse.csr_matrix(
+        (np.ones(len(user_pos), dtype=np.int8), (user_pos, movie_pos)),
+        shape=(n_users, n_movies)
+    )
+
+    # Kullanıcı×tür beğeni matrisi (4 ve üzeri puanlar)
+    liked = history_ratings >= 4
+    affinity = (sparse.csr_matrix(
+        (np.ones(liked.sum(), dtype=np.float32), (user_pos[liked], movie_pos[liked])),
+        shape=(n_users, n_movies)
+    ) @ movie_genre).toarray()
+
+    # Her kullanıcı için en çok beğenilen türleri 1, diğerlerini 0 yap; sütunlar
+    # genre_id sırasında olduğundan kararlı sıralama eşitlikte küçük genre_id'yi seçer
+    genre_mask = np.zeros_like(affinity)
+    k = min(top_genres, n_genres)
+    if k > 0:
+        top = np.argsort(-affinity, axis=1, kind='stable')[:, :k]
+        np.put_along_axis(genre_mask, top, 1.0, axis=1)
+        genre_mask *= affinity > 0
+
+    # Katalogdaki sıra: puan azalan, eşitlikte movie_id artan (puanı olmayanlar sonda).
+    # Her film tekil bir sıra numarası alır; seçim bu numaralar üzerinden yapılır
+    rank = np.empty(n_movies, dtype=np.int64)
+    rank[np.lexsort((movie_ids, -ratings))] = np.arange(n_movies)
+
+    results = {}
+    k = min(top_n, n_movies)
+    for start in range(0, n_users, user_chunk):
+        end = min(start + user_chunk, n_users)
+        in_genres = sparse.csr_matrix(genre_mask[start:end]) @ genre_movie
+        eligible = in_genres.toarray() > 0
+        # Geçmişi olmayan kullanıcılara en yüksek puanlı filmler önerilir
+        eligible[~has_history[start:end]] = True
+
+        rows, cols = watched[start:end].nonzero()
+        eligible[rows, cols] = False
+
+        # Uygun olmayan filmler katalog dışı sıra numarası (n_movies) alır
+        keys = np.where(eligible, rank, n_movies)
+        candidates = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        candidate_keys = np.take_along_axis(keys, candidates, axis=1)
+        order = np.argsort(candidate_keys, axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_keys = np.take_along_axis(candidate_keys, order, axis=1)
+
+        for offset, user_id in enumerate(user_ids[start:end]):
+            valid = candidate_keys[offset] < n_movies
+            results[int(user_id)] = movie_ids[candidates[offset][valid]].tolist()
+
+    return results
+
+
+def score_users(bind, user_ids, top_n=10):
+    """Veritabanından gerekli verileri okuyup toplu önerileri hesapla"""
+    movies = load_catalog(bind)
+    history = load_histories(bind, user_ids)
+    return recommend_batch(user_ids, movies, history, top_n=top_n)
+
+
+def main():
+    """Toplu öneri hesaplama komut satırı aracı"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='model_training.log'
+    )
+    parser = argparse.ArgumentParser(description="Toplu film önerisi hesapla")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--user-ids', help="Virgülle ayrılmış kullanıcı kimlikleri")
+    source.add_argument('--user-ids-file', help="Her satırda bir kullanıcı kimliği içeren dosya")
+    source.add_argument('--all-users', action='store_true', help="Tüm kullanıcılar için hesapla")
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--output', default='model_results/batch_recommendations.csv')
+    parser.add_argument('--interactions', help="Geçmişi veritabanı yerine bu etkileşim matrisinden oku "
+                                               "(ör. processed_data/interactions.npz)")
+    args = parser.parse_args()
+    if args.top_n < 1:
+        parser.error("--top-n en az 1 olmalı")
+
+    try:
+        if args.user_ids:
+            user_ids = [int(x) for x in args.user_ids.split(',') if x.strip()]
+        elif args.user_ids_file:
+            with open(args.user_ids_file) as f:
+                user_ids = [int(line) for line in f if line.strip()]
+        elif args.interactions:
+            user_ids = None
+        else:
+            user_ids = pd.read_sql(select(User.user_id), engine)['user_id'].tolist()
+
+        interactions = load_interactions(args.interactions) if args.interactions else None
+        if user_ids is None:
+            user_ids = interactions['user_ids'].tolist()
+
+        started = time.perf_counter()
+        movies = load_catalog(engine)
+        rows = []
+        for start in range(0, len(user_ids), args.batch_size):
+            batch = user_ids[start:start + args.batch_size]
+            if interactions is not None:
+                history = interactions_to_history(interactions, batch)
+            else:
+                history = load_histories(engine, batch)
+            results = recommend_batch(batch, movies, history, top_n=args.top_n)
+            for user_id, movie_ids in results.items():
+                rows.extend((user_id, rank, movie_id) for rank, movie_id in enumerate(movie_ids, 1))
+
+        pd.DataFrame(rows, columns=['user_id', 'rank', 'movie_id']).to_csv(args.output, index=False)
+        elapsed = time.perf_counter() - started
+        logging.info(f"{len(user_ids)} kullanıcı için toplu öneri hesaplandı ({elapsed:.2f} sn)")
+        print(f"{len(user_ids)} kullanıcı için öneriler {args.output} dosyasına yazıldı ({elapsed:.2f} sn)")
+
+    except Exception as e:
+        logging.error(f"Toplu öneri hatası: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import time
+
+import numpy as np
+from scipy import sparse
+
+from ml_model.item_similarity import ItemNeighborIndex, build_neighbor_table
+
+
+def synthetic_ratings(n_users, n_movies, per_user, seed=42):
+    """Popülerliği Zipf dağılımına uyan sentetik kullanıcı×film puan matrisi üret"""
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_movies + 1) ** 0.8
+    popularity /= popularity.sum()
+    rows = np.repeat(np.arange(n_users), per_user)
+    cols = rng.choice(n_movies, size=n_users * per_user, p=popularity)
+    ratings = rng.integers(1, 6, size=len(rows)).astype(np.float32)
+    matrix = sparse.csr_matrix((ratings, (rows, cols)), shape=(n_users, n_movies))
+    # Aynı filmin tekrarları toplandığı için puanlar 1-5 aralığına kırpılır
+    matrix.data = np.minimum(matrix.data, 5)
+    return matrix
+
+
+def benchmark(n_movies, n_users, per_user, k, chunk_size, queries):
+    ratings = synthetic_ratings(n_users, n_movies, per_user)
+
+    started = time.perf_counter()
+    neighbors, similarities = build_neighbor_table(ratings, k=k, chunk_size=chunk_size)
+    build_seconds = time.perf_counter() - started
+
+    index = ItemNeighborIndex()
+    index.movie_ids = np.arange(n_movies, dtype=np.int64)
+    index.neighbors = neighbors
+    index.similarities = similarities
+
+    rng = np.random.default_rng(0)
+    latencies = []
+    for user in rng.integers(0, n_users, size=queries):
+        row = ratings[user]
+        started = time.perf_counter()
+        index.recommend(row.indices, row.data, n=10)
+        latencies.append(time.perf_counter() - started)
+    latencies = np.array(latencies) * 1e6
+
+    table_bytes = neighbors.nbytes + similarities.astype(np.float16).nbytes
+    return build_seconds, np.median(latencies), np.percentile(latencies, 99), table_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Film komşu tablosu oluşturma ve sunum süresi ölçümü")
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help="Virgülle ayrılmış film sayıları")
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--per-user', type=int, default=20)
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--chunk-size', type=int, default=2048)
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'filmler':>10} {'oluşturma (sn)':>15} {'p50 (µs)':>10} {'p99 (µs)':>10} {'tablo (MB)':>11}")
+    for n_movies in [int(size) for size in args.sizes.split(',')]:
+        build_seconds, p50, p99, table_bytes = benchmark(
+            n_movies, args.users, args.per_user, args.k, args.chunk_size, args.queries
+        )
+        print(f"{n_movies:>10} {build_seconds:>15.2f} {p50:>10.1f} {p99:>10.1f} {table_bytes / 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
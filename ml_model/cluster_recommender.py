@@ -0,0 +1,239 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from sqlalchemy import select
+
+from database.database import UserFeatureStats, WatchHistory
+from data_processing.artifacts import read_table
+
+MODEL_PATH = 'model_results/kmeans_model.pkl'
+ANALYSIS_PATH = 'model_results/cluster_analysis.parquet'
+SCALER_PATH = 'model_results/user_scaler.pkl'
+
+# Küme film listeleri kurulurken izleme geçmişi bu kadar satırlık parçalarla okunur
+HISTORY_CHUNK_SIZE = 100000
+
+
+class ClusterModel(NamedTuple):
+    """Tek bir model dosyasından kurulan, sunuma hazır küme yapıtları"""
+    model: object
+    scaler: object
+    centroids: np.ndarray
+    user_clusters: dict
+    cluster_movies: dict
+    version: float
+
+
+class ClusterRecommender:
+    """Eğitilmiş KMeans modelinden küme bazlı öneri listeleri üretir.
+
+    Her küme için, küme üyelerinin izleme geçmişinden sıralı bir film listesi
+    önceden hesaplanır. İstek anında kullanıcının kümesi bulunur, izlediği
+    filmler atlanarak listenin başındaki N film döndürülür.
+
+    Yeni model dosyası istek yolunda yüklenmez: `maybe_reload` yükleme
+    başlatır ve döner. Yapıtlar arka plan iş parçacığında, kendi oturumuyla
+    ayrı bir `ClusterModel` olarak kurulur ve tek bir atamayla devreye alınır;
+    o ana kadar istekler eski modelden sunulur. Aynı anda tek yükleme çalışır.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, analysis_path=ANALYSIS_PATH, scaler_path=SCALER_PATH,
+                 reload_interval=30, max_candidates=500, min_rating=4, on_reload=None,
+                 chunk_size=HISTORY_CHUNK_SIZE):
+        self.model_path = model_path
+        self.analysis_path = analysis_path
+        self.scaler_path = scaler_path
+        self.reload_interval = reload_interval
+        self.max_candidates = max_candidates
+        self.min_rating = min_rating
+        self.on_reload = on_reload
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._reloading = False
+        self._reassigned = {}
+        self._state = None
+        self.reloads = 0
+
+    @property
+    def loaded(self):
+        return self._state is not None
+
+    @property
+    def model_version(self):
+        return self._state.version if self._state is not None else None
+
+    @property
+    def reloading(self):
+        return self._reloading
+
+    def load(self, db):
+        """Model ve küme atamalarını yükleyip küme listelerini hesapla (başlangıçta, eşzamanlı)"""
+        self._swap(self._build(db))
+
+    def _build(self, db):
+        """Model dosyasından yeni yapıtları kur; sunulan duruma dokunmaz"""
+        version = os.path.getmtime(self.model_path)
+        model = joblib.load(self.model_path)
+        assignments = read_table(self.analysis_path, columns=['user_id', 'cluster'])
+        user_clusters = dict(zip(
+            assignments['user_id'].astype(int).tolist(),
+            assignments['cluster'].astype(int).tolist()
+        ))
+        scaler = joblib.load(self.scaler_path) if os.path.exists(self.scaler_path) else None
+
+        # Model eğitildikten sonra API'de yeniden atanan kullanıcılar korunur
+        trained_at = datetime.utcfromtimestamp(version)
+        reassigned = db.query(UserFeatureStats.user_id, UserFeatureStats.cluster).filter(
+            UserFeatureStats.cluster.isnot(None),
+            UserFeatureStats.updated_at > trained_at
+        ).all()
+        user_clusters.update(dict(reassigned))
+
+        return ClusterModel(
+            model=model,
+            scaler=scaler,
+            centroids=np.asarray(model.cluster_centers_, dtype=np.float64),
+            user_clusters=user_clusters,
+            cluster_movies=self._rank_cluster_movies(self._history_chunks(db), assignments),
+            version=version,
+        )
+
+    def _history_chunks(self, db):
+        """İzleme geçmişini sunucu taraflı imleçle parça parça oku"""
+        query = select(WatchHistory.user_id, WatchHistory.movie_id, WatchHistory.rating)
+        with db.bind.connect() as connection:
+            connection = connection.execution_options(stream_results=True)
+            for chunk in pd.read_sql(query, connection, chunksize=self.chunk_size):
+                yield chunk
+
+    def _swap(self, state):
+        with self._lock:
+            # Yükleme sürerken yeniden atanan kullanıcılar yeni modelin merkezlerine atanır
+            if state.scaler is not None:
+                for user_id, features in self._reassigned.items():
+                    state.user_clusters[user_id] = self._nearest(state, features)
+            self._reassigned = {}
+            # Okuyucular kilitsiz çalıştığı için durum tek seferde değiştirilir
+            self._state = state
+            self._last_check = time.monotonic()
+        logging.info(
+            f"Küme modeli yüklendi: {len(state.cluster_movies)} küme, {len(state.user_clusters)} kullanıcı"
+        )
+
+    def _rank_cluster_movies(self, chunks, assignments):
+        """Her küme için filmleri beğeni sayısı ve ortalama puana göre sırala
+
+        Geçmiş parçalar halinde gelir; her parça (küme, film) toplamlarına
+        indirgenip birikene eklenir. Bellek kullanımı tüm geçmişle değil,
+        parça boyutu ve küme × film sayısıyla sınırlıdır.
+        """
+        totals = None
+        for history in chunks:
+            history = history.merge(assignments, on='user_id', how='inner')
+            history['liked'] = (history['rating'] >= self.min_rating).astype(np.int32)
+            partial = history.groupby(['cluster', 'movie_id']).agg(
+                likes=('liked', 'sum'),
+                rating_sum=('rating', 'sum'),
+                rating_count=('rating', 'count'),
+                views=('rating', 'size')
+            )
+            totals = partial if totals is None else totals.add(partial, fill_value=0)
+        if totals is None:
+            return {}
+        stats = totals.reset_index()
+        # Puanı olmayan filmlerin ortalaması NaN kalır ve sıralamada sona düşer
+        stats['avg_rating'] = stats['rating_sum'] / stats['rating_count'].where(stats['rating_count'] > 0)
+        stats = stats.sort_values(
+            ['cluster', 'likes', 'avg_rating', 'views', 'movie_id'],
+            ascending=[True, False, False, False, True]
+        )
+        cluster_movies = {}
+        for cluster, group in stats.groupby('cluster', sort=False):
+            ranked = group['movie_id'].to_numpy(dtype=np.int32)[:self.max_candidates]
+            cluster_movies[int(cluster)] = ranked
+        return cluster_movies
+
+    def maybe_reload(self, session_factory):
+        """Model dosyası değiştiyse arka planda yeniden yüklemeyi başlat; başlatıldıysa True"""
+        if time.monotonic() - self._last_check < self.reload_interval:
+            return False
+        with self._lock:
+            if self._reloading:
+                return False
+            self._last_check = time.monotonic()
+            try:
+                version = os.path.getmtime(self.model_path)
+            except OSError:
+                return False
+            if version == self.model_version:
+                return False
+            self._reloading = True
+        logging.info("Yeni model dosyası bulundu, küme yapıtları arka planda yeniden yükleniyor")
+        threading.Thread(target=self._reload, args=(session_factory,), daemon=True).start()
+        return True
+
+    def _reload(self, session_factory):
+        db = session_factory()
+        try:
+            self._swap(self._build(db))
+            self.reloads += 1
+            if self.on_reload is not None:
+                self.on_reload()
+        except Exception as e:
+            # Yüklenemeyen model bir sonraki kontrolde yeniden denenir; eski model sunulmaya devam eder
+            logging.error(f"Küme modeli yeniden yükleme hatası: {str(e)}")
+        finally:
+            db.close()
+            with self._lock:
+                self._reloading = False
+                self._reassigned = {}
+
+    @property
+    def can_assign(self):
+        state = self._state
+        return state is not None and state.scaler is not None
+
+    @staticmethod
+    def _nearest(state, features):
+        scaled = (np.asarray(features, dtype=np.float64) - state.scaler.mean_) / state.scaler.scale_
+        distances = ((state.centroids - scaled) ** 2).sum(axis=1)
+        return int(np.argmin(distances))
+
+    def assign(self, user_id, features):
+        """Ham özellikleri ölçekleyip kullanıcıyı en yakın mevcut merkeze ata"""
+        with self._lock:
+            state = self._state
+            cluster = self._nearest(state, features)
+            state.user_clusters[user_id] = cluster
+            if self._reloading:
+                self._reassigned[user_id] = features
+        return cluster
+
+    def cluster_of(self, user_id):
+        state = self._state
+        return state.user_clusters.get(user_id) if state is not None else None
+
+    def recommend(self, user_id, exclude=(), n=10):
+        """Kullanıcının kümesinden izlemediği ilk N filmi döndür; küme yoksa None"""
+        state = self._state
+        cluster = state.user_clusters.get(user_id) if state is not None else None
+        if cluster is None:
+            return None
+        exclude = set(exclude)
+        result = []
+        for movie_id in state.cluster_movies.get(cluster, np.empty(0, dtype=np.int32)).tolist():
+            if movie_id in exclude:
+                continue
+            result.append(movie_id)
+            if len(result) == n:
+                break
+        return result
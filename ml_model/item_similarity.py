@@ -0,0 +1,155 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+from scipy import sparse
+
+from data_processing.interactions import INTERACTIONS_PATH, load_interactions
+
+NEIGHBORS_PATH = 'model_results/item_neighbors.npz'
+
+
+def build_neighbor_table(ratings, k=50, chunk_size=1024):
+    """Her film için kosinüs benzerliğine göre en yakın K komşuyu hesapla
+
+    `ratings` kullanıcı×film CSR matrisidir. Benzerlik, sütunları normalize
+    edilmiş matrisin kendi transpozuyla seyrek çarpımıdır; çarpım film
+    satırları üzerinde parçalar halinde yapılır, böylece bellek kullanımı
+    parça boyutuyla sınırlı kalır. Sonuç (film × K) boyutlu komşu ve
+    benzerlik dizileridir; eksik komşular -1 ile doldurulur.
+    """
+    ratings = sparse.csr_matrix(ratings, dtype=np.float32)
+    n_movies = ratings.shape[1]
+
+    norms = np.sqrt(np.asarray(ratings.multiply(ratings).sum(axis=0)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = (ratings @ sparse.diags(inverse.astype(np.float32))).tocsc()
+    item_rows = normalized.T.tocsr()
+
+    neighbors = np.full((n_movies, k), -1, dtype=np.int32)
+    similarities = np.zeros((n_movies, k), dtype=np.float32)
+
+    for start in range(0, n_movies, chunk_size):
+        end = min(start + chunk_size, n_movies)
+        block = (item_rows[start:end] @ normalized).tocsr()
+
+        for offset in range(end - start):
+            row_start, row_end = block.indptr[offset], block.indptr[offset + 1]
+            cols = block.indices[row_start:row_end]
+            values = block.data[row_start:row_end]
+            # Filmin kendisiyle benzerliği komşu sayılmaz
+            keep = (cols != start + offset) & (values > 0)
+            cols, values = cols[keep], values[keep]
+            if len(values) == 0:
+                continue
+            if len(values) > k:
+                top = np.argpartition(-values, k - 1)[:k]
+                cols, values = cols[top], values[top]
+            order = np.argsort(-values, kind='stable')
+            count = len(order)
+            neighbors[start + offset, :count] = cols[order]
+            similarities[start + offset, :count] = values[order]
+
+    return neighbors, similarities
+
+
+def save_neighbor_table(movie_ids, neighbors, similarities, path=NEIGHBORS_PATH):
+    """Komşu tablosunu kaydet (benzerlikler float16 olarak saklanır)"""
+    np.savez(
+        path,
+        movie_ids=np.asarray(movie_ids, dtype=np.int64),
+        neighbors=neighbors,
+        similarities=similarities.astype(np.float16),
+    )
+
+
+class ItemNeighborIndex:
+    """Önceden hesaplanmış film komşu tablosundan öneri üretir"""
+
+    def __init__(self, path=NEIGHBORS_PATH):
+        self.path = path
+        self.movie_ids = None
+        self.neighbors = None
+        self.similarities = None
+
+    @property
+    def loaded(self):
+        return self.neighbors is not None
+
+    def load(self):
+        with np.load(self.path) as data:
+            movie_ids = data['movie_ids']
+            neighbors = data['neighbors']
+            similarities = data['similarities'].astype(np.float32)
+        self.movie_ids, self.neighbors, self.similarities = movie_ids, neighbors, similarities
+        logging.info(f"Film komşu tablosu yüklendi: {neighbors.shape[0]} film, K={neighbors.shape[1]}")
+
+    def positions(self, movie_ids):
+        """Film kimliklerini tablo satırlarına çevir; tabloda olmayanlar -1"""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        positions = np.searchsorted(self.movie_ids, movie_ids)
+        positions[positions >= len(self.movie_ids)] = 0
+        positions[self.movie_ids[positions] != movie_ids] = -1
+        return positions
+
+    def recommend(self, movie_ids, ratings, n=10):
+        """İzlenen filmlerin komşularına puan ağırlıklı benzerlik toplayarak ilk N filmi seç"""
+        positions = self.positions(movie_ids)
+        ratings = np.asarray(ratings, dtype=np.float32)
+        known = positions >= 0
+        positions, ratings = positions[known], np.nan_to_num(ratings[known])
+        if len(positions) == 0:
+            return []
+
+        candidates = self.neighbors[positions].ravel()
+        weights = (self.similarities[positions] * ratings[:, None]).ravel()
+        valid = candidates >= 0
+        candidates, weights = candidates[valid], weights[valid]
+
+        unique, inverse = np.unique(candidates, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        # İzlenen filmler elenir
+        scores[np.isin(unique, positions)] = -np.inf
+
+        k = min(n, len(unique))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        top = top[np.isfinite(scores[top])]
+        return self.movie_ids[unique[top]].tolist()
+
+
+def main():
+    """Etkileşim matrisinden film komşu tablosunu oluştur"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='model_training.log'
+    )
+    parser = argparse.ArgumentParser(description="Film-film benzerlik komşu tablosunu oluştur")
+    parser.add_argument('--interactions', default=INTERACTIONS_PATH)
+    parser.add_argument('--output', default=NEIGHBORS_PATH)
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    args = parser.parse_args()
+
+    try:
+        interactions = load_interactions(args.interactions)
+        started = time.perf_counter()
+        neighbors, similarities = build_neighbor_table(
+            interactions['rating'], k=args.k, chunk_size=args.chunk_size
+        )
+        elapsed = time.perf_counter() - started
+        save_neighbor_table(interactions['movie_ids'], neighbors, similarities, args.output)
+        logging.info(f"Film komşu tablosu oluşturuldu: {neighbors.shape} ({elapsed:.2f} sn)")
+        print(f"Film komşu tablosu {args.output} dosyasına yazıldı ({elapsed:.2f} sn)")
+
+    except Exception as e:
+        logging.error(f"Komşu tablosu hatası: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,22 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.metrics import silhouette_score
 import matplotlib.pyplot as plt
 import seaborn as sns
+import argparse
 import logging
 import joblib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from sklearn.preprocessing import StandardScaler
+from sqlalchemy import create_engine
+from database import analytics
+from database.database import SQLALCHEMY_DATABASE_URL
+from data_processing.artifacts import TableWriter, read_table, write_table
+from data_processing.profiling import REPORT_DIR, RunProfiler, frame_rows, trace_peak
 
 # Logging ayarları
 logging.basicConfig(
@@ -18,24 +28,98 @@ logging.basicConfig(
 def load_data():
     """İşlenmiş verileri yükle"""
     try:
-        user_features = pd.read_csv('processed_data/user_features.csv')
-        movie_features = pd.read_csv('processed_data/movie_features.csv')
+        user_features = read_table('processed_data/user_features.parquet')
+        movie_features = read_table('processed_data/movie_features.parquet')
         logging.info("Veriler başarıyla yüklendi")
         return user_features, movie_features
     except Exception as e:
         logging.error(f"Veri yükleme hatası: {str(e)}")
         raise
 
-def find_optimal_clusters(X, max_clusters=10):
-    """Optimal küme sayısını bul"""
+# Bu kullanıcı sayısının üzerinde varsayılan olarak MiniBatchKMeans kullanılır
+MINIBATCH_THRESHOLD = 100000
+
+def stratified_sample(labels, sample_size, random_state=42):
+    """Küme etiketlerine göre orantılı tabakalı örnek indeksleri seç"""
+    n_samples = len(labels)
+    if sample_size is None or sample_size >= n_samples:
+        return np.arange(n_samples)
+    
+    rng = np.random.default_rng(random_state)
+    indices = []
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        # Her küme en az bir örnekle temsil edilir
+        take = max(1, int(round(len(members) * sample_size / n_samples)))
+        indices.append(rng.choice(members, size=min(take, len(members)), replace=False))
+    return np.sort(np.concatenate(indices))
+
+def score_clusters(X, n_clusters, sample_size=None, use_minibatch=False):
+    """Tek bir küme sayısı için model eğit ve örneklem üzerinde silhouette hesapla"""
+    if use_minibatch:
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=4096)
+    else:
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+    cluster_labels = kmeans.fit_predict(X)
+    sample = stratified_sample(cluster_labels, sample_size)
+    return silhouette_score(X[sample], cluster_labels[sample])
+
+def evaluate_clusters(X, n_clusters, sample_size=None, use_minibatch=False, trace_memory=False):
+    """score_clusters'ı süre ve (istenirse) tepe bellekle birlikte çalıştır
+    
+    Alt süreçte çalıştığı için bellek ölçümü burada, o sürecin içinde yapılır.
+    """
+    started = time.perf_counter()
+    if trace_memory:
+        silhouette_avg, peak = trace_peak(score_clusters, X, n_clusters, sample_size, use_minibatch)
+    else:
+        silhouette_avg, peak = score_clusters(X, n_clusters, sample_size, use_minibatch), None
+    return n_clusters, silhouette_avg, time.perf_counter() - started, peak
+
+def find_optimal_clusters(X, max_clusters=10, n_jobs=None, sample_size=10000, use_minibatch=None,
+                          profiler=None):
+    """Optimal küme sayısını bul
+    
+    Her küme sayısı ayrı bir süreçte değerlendirilir; silhouette skoru tüm
+    veri yerine tabakalı bir örneklem üzerinde hesaplanır. `profiler`
+    verilirse her küme sayısı ayrı bir aşama olarak rapora eklenir.
+    """
     try:
+        X = np.asarray(X, dtype=np.float64)
+        if use_minibatch is None:
+            use_minibatch = len(X) > MINIBATCH_THRESHOLD
+        cluster_range = list(range(2, max_clusters + 1))
+        n_jobs = min(n_jobs or os.cpu_count() or 1, len(cluster_range))
+        trace_memory = profiler is not None and profiler.trace_memory
+        
+        if n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                results = list(executor.map(
+                    evaluate_clusters,
+                    [X] * len(cluster_range),
+                    cluster_range,
+                    [sample_size] * len(cluster_range),
+                    [use_minibatch] * len(cluster_range),
+                    [trace_memory] * len(cluster_range)
+                ))
+        else:
+            results = [
+                evaluate_clusters(X, n_clusters, sample_size, use_minibatch, trace_memory)
+                for n_clusters in cluster_range
+            ]
+        
         silhouette_scores = []
-        for n_clusters in range(2, max_clusters + 1):
-            kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-            cluster_labels = kmeans.fit_predict(X)
-            silhouette_avg = silhouette_score(X, cluster_labels)
+        for n_clusters, silhouette_avg, elapsed, peak in results:
             silhouette_scores.append(silhouette_avg)
-            logging.info(f"Küme sayısı: {n_clusters}, Silhouette skoru: {silhouette_avg:.4f}")
+            logging.info(
+                f"Küme sayısı: {n_clusters}, Silhouette skoru: {silhouette_avg:.4f}, "
+                f"Süre: {elapsed:.3f} sn"
+            )
+            if profiler is not None:
+                profiler.add(
+                    f"find_optimal_clusters[k={n_clusters}]", elapsed, peak,
+                    rows_in={'users': len(X)}, rows_out={'users': len(X)}
+                )
         
         # En iyi küme sayısını bul
         optimal_clusters = np.argmax(silhouette_scores) + 2
@@ -104,14 +188,19 @@ def analyze_clusters(X, kmeans, user_features):
         logging.error(f"Küme analizi hatası: {str(e)}")
         raise
 
-def save_model(model, cluster_analysis):
+def save_model(model, cluster_analysis, export_csv=False):
     """Modeli ve analiz sonuçlarını kaydet"""
     try:
         # Modeli kaydet
         joblib.dump(model, 'model_results/kmeans_model.pkl')
         
         # Küme analizini kaydet
-        cluster_analysis.to_csv('model_results/cluster_analysis.csv', index=False)
+        cluster_analysis.columns = cluster_analysis.columns.astype(str)
+        write_table(cluster_analysis, 'model_results/cluster_analysis.parquet', export_csv)
+        
+        # Model, eğitildiği özellik ölçeğiyle birlikte sunulur
+        if Path('processed_data/user_scaler.pkl').exists():
+            joblib.dump(joblib.load('processed_data/user_scaler.pkl'), 'model_results/user_scaler.pkl')
         
         logging.info("Model ve analiz sonuçları kaydedildi")
     
@@ -119,36 +208,233 @@ def save_model(model, cluster_analysis):
         logging.error(f"Model kaydetme hatası: {str(e)}")
         raise
 
+# Akış modunda kullanıcı özelliklerinin veritabanında toplandığı sorgu
+USER_FEATURES_QUERY = """
+    SELECT u.user_id,
+           AVG(w.rating) AS avg_rating,
+           COUNT(w.rating) AS watch_count,
+           AVG(w.watch_duration) AS avg_duration,
+           SUM(w.watch_duration) AS total_duration
+    FROM users u
+    LEFT JOIN watch_history w ON w.user_id = u.user_id
+    GROUP BY u.user_id
+    ORDER BY u.user_id
+"""
+
+def iter_feature_chunks(source, chunk_size, db_url=SQLALCHEMY_DATABASE_URL):
+    """Kullanıcı özelliklerini parça parça oku (CSV, Parquet, veritabanı veya DuckDB anlık görüntüsü)"""
+    if source == 'duckdb':
+        for chunk in analytics.iter_frames(USER_FEATURES_QUERY, chunk_size=chunk_size):
+            yield chunk
+    elif source == 'db':
+        engine = create_engine(db_url)
+        with engine.connect() as connection:
+            connection = connection.execution_options(stream_results=True)
+            for chunk in pd.read_sql(USER_FEATURES_QUERY, connection, chunksize=chunk_size):
+                yield chunk
+    elif source.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(source, chunksize=chunk_size):
+            yield chunk
+
+def prepare_chunk(chunk, scaler=None):
+    """Parçadaki özellikleri model girdisine çevir"""
+    X = chunk.drop(['user_id'], axis=1).to_numpy(dtype=np.float64)
+    if scaler is not None:
+        X = scaler.transform(X)
+    # Geçmişi olmayan kullanıcılar ortalamaya (0) yerleştirilir
+    return np.nan_to_num(X)
+
+def train_streaming(source, n_clusters, chunk_size=10000, db_url=SQLALCHEMY_DATABASE_URL):
+    """MiniBatchKMeans modelini parçalar üzerinde partial_fit ile eğit
+    
+    Bellek kullanımı kullanıcı sayısıyla değil parça boyutuyla sınırlıdır.
+    Veritabanından okunan ham özellikler önce ayrı bir geçişte
+    StandardScaler.partial_fit ile ölçeklenir.
+    """
+    try:
+        scaler = None
+        if source in ('db', 'duckdb'):
+            scaler = StandardScaler()
+            for chunk in iter_feature_chunks(source, chunk_size, db_url):
+                scaler.partial_fit(chunk.drop(['user_id'], axis=1).to_numpy(dtype=np.float64))
+        
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=chunk_size)
+        pending = []
+        n_users = 0
+        for chunk in iter_feature_chunks(source, chunk_size, db_url):
+            pending.append(prepare_chunk(chunk, scaler))
+            # İlk partial_fit çağrısı en az küme sayısı kadar örnek gerektirir
+            if sum(len(X) for X in pending) < n_clusters:
+                continue
+            X = np.vstack(pending)
+            pending = []
+            kmeans.partial_fit(X)
+            n_users += len(X)
+        if pending:
+            X = np.vstack(pending)
+            if hasattr(kmeans, 'cluster_centers_') or len(X) >= n_clusters:
+                kmeans.partial_fit(X)
+                n_users += len(X)
+        
+        logging.info(f"MiniBatchKMeans modeli akış modunda eğitildi: {n_users} kullanıcı")
+        return kmeans, scaler
+    
+    except Exception as e:
+        logging.error(f"Akış modunda model eğitimi hatası: {str(e)}")
+        raise
+
+def predict_streaming(source, kmeans, scaler=None, chunk_size=10000,
+                      output_path='model_results/cluster_analysis.parquet',
+                      db_url=SQLALCHEMY_DATABASE_URL, export_csv=False):
+    """Tüm kullanıcıların küme etiketlerini parça parça hesaplayıp dosyaya ekle"""
+    try:
+        cluster_sums = None
+        cluster_counts = np.zeros(kmeans.n_clusters, dtype=np.int64)
+        columns = None
+        with TableWriter(output_path, export_csv) as writer:
+            for chunk in iter_feature_chunks(source, chunk_size, db_url):
+                X = prepare_chunk(chunk, scaler)
+                labels = kmeans.predict(X)
+                
+                result = pd.DataFrame(X, columns=chunk.columns.drop('user_id'))
+                result['cluster'] = labels.astype(np.int32)
+                result['user_id'] = chunk['user_id'].to_numpy(dtype=np.int64)
+                writer.write(result)
+                
+                # Küme ortalamaları için yalnızca toplamlar tutulur
+                if cluster_sums is None:
+                    columns = list(result.columns.drop(['cluster', 'user_id']))
+                    cluster_sums = np.zeros((kmeans.n_clusters, len(columns)))
+                np.add.at(cluster_sums, labels, X)
+                cluster_counts += np.bincount(labels, minlength=kmeans.n_clusters)
+        
+        cluster_stats = pd.DataFrame(
+            cluster_sums / np.maximum(cluster_counts, 1)[:, None], columns=columns
+        )
+        plt.figure(figsize=(12, 8))
+        sns.heatmap(cluster_stats, annot=True, cmap='YlGnBu')
+        plt.title('Küme Özellikleri')
+        plt.savefig('model_results/cluster_features.png')
+        plt.close()
+        
+        logging.info(f"Küme etiketleri akış modunda yazıldı: {cluster_counts.sum()} kullanıcı")
+        return cluster_stats
+    
+    except Exception as e:
+        logging.error(f"Akış modunda küme tahmini hatası: {str(e)}")
+        raise
+
+def source_scaler(source):
+    """Dosya kaynağındaki özellikleri ölçekleyen, veri işlemenin yazdığı ölçekleyici"""
+    path = Path(source).parent / 'user_scaler.pkl'
+    if not path.exists():
+        # Model eski ya da başka bir çalıştırmanın ölçekleyicisiyle sunulmamalı
+        raise FileNotFoundError(
+            f"{source} için ölçekleyici bulunamadı: {path}; önce data_processing/process_data.py çalıştırılmalı"
+        )
+    return joblib.load(path)
+
+def main_streaming(args, profiler):
+    """Tüm kullanıcıları belleğe almadan eğitim ve tahmin yap"""
+    # Dosyadaki özellikler önceden ölçeklenmiştir; artımlı küme ataması aynı ölçekleyiciyi kullanır
+    served_scaler = None if args.source in ('db', 'duckdb') else source_scaler(args.source)
+    with profiler.stage('train_streaming'):
+        kmeans, scaler = train_streaming(args.source, args.n_clusters, args.chunk_size, args.db_url)
+    joblib.dump(kmeans, 'model_results/kmeans_model.pkl')
+    joblib.dump(scaler if scaler is not None else served_scaler, 'model_results/user_scaler.pkl')
+    with profiler.stage('predict_streaming') as record:
+        cluster_stats = predict_streaming(args.source, kmeans, scaler, args.chunk_size, db_url=args.db_url,
+                                          export_csv=args.export_csv)
+        record['rows_out'] = frame_rows(clusters=cluster_stats)
+    logging.info("Model ve analiz sonuçları kaydedildi")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="KMeans kullanıcı kümeleme modelini eğit")
+    parser.add_argument('--max-clusters', type=int, default=10)
+    parser.add_argument('--n-jobs', type=int, default=None,
+                        help="Küme sayılarını paralel değerlendiren süreç sayısı (varsayılan: CPU sayısı)")
+    parser.add_argument('--silhouette-sample', type=int, default=10000,
+                        help="Silhouette skorunun hesaplandığı tabakalı örneklem boyutu")
+    parser.add_argument('--minibatch', dest='use_minibatch', action='store_true', default=None,
+                        help="Model seçiminde MiniBatchKMeans kullan")
+    parser.add_argument('--no-minibatch', dest='use_minibatch', action='store_false')
+    parser.add_argument('--streaming', action='store_true',
+                        help="Kullanıcıları parça parça okuyarak MiniBatchKMeans ile eğit")
+    parser.add_argument('--source', default='processed_data/user_features.parquet',
+                        help="Akış modunda özellik kaynağı: CSV/Parquet dosyası, 'db' ya da 'duckdb'")
+    parser.add_argument('--db-url', default=SQLALCHEMY_DATABASE_URL)
+    parser.add_argument('--n-clusters', type=int, default=5,
+                        help="Akış modunda küme sayısı")
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--export-csv', action='store_true',
+                        help="Parquet yapıtlarının yanına CSV kopyalarını da yaz")
+    parser.add_argument('--report-dir', default=REPORT_DIR,
+                        help="Aşama süresi/belleği/satır sayılarını içeren JSON raporun klasörü")
+    parser.add_argument('--no-memory-profile', action='store_true',
+                        help="Aşamaların tepe belleğini ölçme (tracemalloc ek yükünü kaldırır)")
+    return parser.parse_args()
+
 def main():
     """Ana işlem fonksiyonu"""
+    args = parse_args()
+    profiler = RunProfiler('train_model', trace_memory=not args.no_memory_profile).start()
     try:
         # Gerekli klasörleri oluştur
         Path('model_results').mkdir(exist_ok=True)
         
         logging.info("Model eğitimi başlıyor...")
         
+        if args.streaming:
+            main_streaming(args, profiler)
+            logging.info("Model eğitimi tamamlandı!")
+            profiler.write('success', report_dir=args.report_dir, args=vars(args))
+            return
+        
         # Verileri yükle
-        user_features, movie_features = load_data()
+        with profiler.stage('load_data') as record:
+            user_features, movie_features = load_data()
+            record['rows_out'] = frame_rows(user_features=user_features, movie_features=movie_features)
         
-        # Kullanıcı özelliklerini hazırla
-        X = user_features.drop(['user_id'], axis=1)
+        # Kullanıcı özelliklerini hazırla; geçmişi olmayanlar akış modundaki gibi ortalamaya (0) yerleşir
+        X = user_features.drop(['user_id'], axis=1).fillna(0)
         
         # Optimal küme sayısını bul
-        optimal_clusters = find_optimal_clusters(X)
+        with profiler.stage('find_optimal_clusters', frame_rows(users=X)) as record:
+            optimal_clusters = find_optimal_clusters(
+                X,
+                max_clusters=args.max_clusters,
+                n_jobs=args.n_jobs,
+                sample_size=args.silhouette_sample,
+                use_minibatch=args.use_minibatch,
+                profiler=profiler
+            )
+            record['rows_out'] = {'clusters': int(optimal_clusters)}
         
         # Modeli eğit
-        kmeans = train_kmeans(X, optimal_clusters)
+        with profiler.stage('train_kmeans', frame_rows(users=X)) as record:
+            kmeans = train_kmeans(X, optimal_clusters)
+            record['rows_out'] = {'clusters': int(kmeans.n_clusters)}
         
         # Kümeleri analiz et
-        cluster_analysis = analyze_clusters(X, kmeans, user_features)
+        with profiler.stage('analyze_clusters', frame_rows(users=X)) as record:
+            cluster_analysis = analyze_clusters(X, kmeans, user_features)
+            record['rows_out'] = frame_rows(cluster_analysis=cluster_analysis)
         
         # Modeli ve analiz sonuçlarını kaydet
-        save_model(kmeans, cluster_analysis)
+        with profiler.stage('save_model', record['rows_out']) as record:
+            save_model(kmeans, cluster_analysis, export_csv=args.export_csv)
+            record['rows_out'] = record['rows_in']
         
         logging.info("Model eğitimi tamamlandı!")
+        profiler.write('success', report_dir=args.report_dir, args=vars(args), optimal_clusters=int(optimal_clusters))
     
     except Exception as e:
         logging.error(f"Model eğitimi hatası: {str(e)}")
+        profiler.write('failed', str(e), report_dir=args.report_dir, args=vars(args))
         raise
 
 if __name__ == "__main__":